@@ -1,43 +1,200 @@
+import asyncio
+import base64
 import json
 import uuid
+from datetime import datetime
 from typing import List, Optional
 from pathlib import Path
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import FileResponse
+from urllib.parse import quote
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+)
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+from sqlalchemy import func, select, tuple_
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from ..core.config import get_settings
 from ..core.db import get_db
-from ..models.document import Document, Entity, Keyword, ProcessingLog
+from ..core.metrics import UPLOAD_BYTES
+from ..models.document import (
+    Document,
+    DocumentPage,
+    DocumentRow,
+    Entity,
+    Keyword,
+    ProcessingLog,
+)
 from ..schemas.documents import (
+    BBox,
     DocumentCreateResponse,
     DocumentDetailResponse,
     DocumentInsightsResponse,
+    DocumentListResponse,
+    DocumentRowResponse,
+    DocumentRowsResponse,
+    DocumentSummary,
+    DocumentTimingsResponse,
     EntityResponse,
+    ExtractedFieldResponse,
     KeywordResponse,
+    SearchHit,
+    SearchResponse,
+    SearchResult,
+    SpanTiming,
     TextBlock,
 )
-from ..services.storage import save_upload
-from ..services.processing import process_document_sync, DEMO_HTML_MAPPING
+from ..services.cache import get_insights_cache
+from ..services.compression import is_compressed_path, unpack_json, unpack_text
+from ..services.events import TERMINAL_STAGES, broker, is_terminal, status_event
+from ..services.knowledge import get_knowledge_base
+from ..services.layout import unpack_layout
+from ..services.render import RenderUnavailable, render_page
+from ..services.scheduler import (
+    BATCH,
+    INTERACTIVE,
+    PRIORITIES,
+    Job,
+    claim,
+    enqueue,
+    get_scheduler,
+)
+from ..services.search import get_search_backend, search_documents
+from ..services.storage import LocalStorage, save_upload, storage_for
+from ..services.tables import table_format
+from .routes_fields import document_fields
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 200
+# Además de estos, planillas .xlsx/.csv (ver services/tables.py)
+UPLOAD_MIMES = {"image/jpeg", "image/png", "application/pdf", "text/html"}
+ALREADY_PENDING = "El documento ya está en cola o procesándose"
+
+# Campo de la respuesta -> columna; `html_preview` queda fuera a propósito
+LIST_FIELDS = {
+    "filename": Document.filename,
+    "mime": Document.mime,
+    "size": Document.size,
+    "status": Document.status,
+    "docType": Document.doc_type,
+    "languageDetected": Document.language_detected,
+    "shipmentId": Document.shipment_id,
+    "updatedAt": Document.updated_at,
+}
+DEFAULT_LIST_FIELDS = ("filename", "status", "docType", "languageDetected")
+
+
+def _encode_cursor(created_at: datetime, doc_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), doc_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), str(doc_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+@router.get(
+    "/", response_model=DocumentListResponse, response_model_exclude_unset=True
+)
+def list_documents(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    doc_type: Optional[str] = None,
+    status: Optional[str] = None,
+    language: Optional[str] = None,
+    shipment_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    fields: Optional[str] = Query(
+        None, description="campos separados por coma, p. ej. filename,status"
+    ),
+    db: Session = Depends(get_db),
+):
+    """Listado paginado por cursor sobre `(created_at, id)`, del más nuevo al más viejo.
+
+    A diferencia de OFFSET, el costo de cada página no crece con la profundidad:
+    el cursor es la última fila devuelta y la consulta usa el índice compuesto.
+    """
+    requested = (
+        [f.strip() for f in fields.split(",") if f.strip()]
+        if fields
+        else list(DEFAULT_LIST_FIELDS)
+    )
+    unknown = [f for f in requested if f not in LIST_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=422, detail=f"Campos no disponibles: {', '.join(unknown)}"
+        )
+
+    columns = [LIST_FIELDS[f] for f in requested]
+    query = select(Document.id, Document.created_at, *columns)
+    if doc_type:
+        query = query.where(Document.doc_type == doc_type)
+    if status:
+        query = query.where(Document.status == status)
+    if language:
+        query = query.where(Document.language_detected == language)
+    if shipment_id:
+        query = query.where(Document.shipment_id == shipment_id)
+    if created_from:
+        query = query.where(Document.created_at >= created_from)
+    if created_to:
+        query = query.where(Document.created_at < created_to)
+    if cursor:
+        query = query.where(
+            tuple_(Document.created_at, Document.id) < _decode_cursor(cursor)
+        )
+
+    rows = db.execute(
+        query.order_by(Document.created_at.desc(), Document.id.desc()).limit(limit + 1)
+    ).all()
+    page = rows[:limit]
+    items = [
+        DocumentSummary(
+            id=row[0],
+            createdAt=row[1],
+            **{name: value for name, value in zip(requested, row[2:])},
+        )
+        for row in page
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = _encode_cursor(last[1], last[0])
+    return DocumentListResponse(items=items, nextCursor=next_cursor)
+
 
 @router.post("/", response_model=DocumentCreateResponse)
 async def create_document(
     file: UploadFile = File(...),
     doc_type: Optional[str] = None,
     language_hint: Optional[str] = None,
+    shipment_id: Optional[str] = None,
     db: Session = Depends(get_db),
 ):
-    if file.content_type not in {
-        "image/jpeg",
-        "image/png",
-        "application/pdf",
-        "text/html",
-    }:
+    """Guarda el archivo y encola el procesamiento; responde sin esperarlo.
+
+    El progreso se sigue por `GET /documents/{id}/events` (SSE) o por el
+    WebSocket del embarque, en vez de consultar el detalle en bucle.
+    """
+    if file.content_type not in UPLOAD_MIMES and not table_format(
+        file.content_type, file.filename
+    ):
         raise HTTPException(status_code=415, detail="Tipo de archivo no soportado")
 
     storage_path, size = await save_upload(file)
+    UPLOAD_BYTES.inc(size, mime=file.content_type)
 
     doc = Document(
         id=str(uuid.uuid4()),
@@ -45,28 +202,54 @@ async def create_document(
         mime=file.content_type,
         size=size,
         doc_type=doc_type,
-        status="processing",
+        status="queued",
         storage_path=storage_path,
         language_detected=language_hint,
+        shipment_id=shipment_id,
     )
+    claim(doc)
     db.add(doc)
     db.commit()
 
-    # Para la PoC inicial, procesamos en línea (sin Celery)
-    try:
-        process_document_sync(db, doc)
-        status = "done"
-    except Exception as e:
-        status = "failed"
-        doc.status = status
-        db.commit()
-        raise HTTPException(status_code=500, detail=f"Error de procesamiento: {e}")
-
-    doc.status = status
-    db.commit()
+    # Contar páginas para estimar el costo lee el PDF: fuera del event loop
+    job = await run_in_threadpool(enqueue, doc, INTERACTIVE)
+    return _queued_response(doc, job)
+
 
+def _queued_response(doc: Document, job: Optional[Job]) -> DocumentCreateResponse:
     return DocumentCreateResponse(
-        id=doc.id, status=doc.status, createdAt=doc.created_at
+        id=doc.id,
+        status=doc.status,
+        createdAt=doc.created_at,
+        shipmentId=doc.shipment_id,
+        eventsUrl=f"/documents/{doc.id}/events",
+        priority=job.priority if job else None,
+        estimatedPages=job.cost if job else None,
+    )
+
+
+# Declarada antes de /{doc_id} para que "search" no se tome como id
+@router.get("/search", response_model=SearchResponse)
+def search(
+    q: str = Query(..., min_length=1, description='términos; entre comillas = frase'),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    results = search_documents(db, q, limit=limit, offset=offset)
+    return SearchResponse(
+        query=q,
+        backend=get_search_backend(db).name,
+        results=[
+            SearchResult(
+                documentId=r["document_id"],
+                filename=r.get("filename"),
+                docType=r.get("doc_type"),
+                score=r["score"],
+                hits=[SearchHit(**hit) for hit in r["hits"]],
+            )
+            for r in results
+        ],
     )
 
 
@@ -80,7 +263,8 @@ async def get_document(doc_id: str, db: Session = Depends(get_db)):
         status=doc.status,
         docType=doc.doc_type,
         languageDetected=doc.language_detected,
-        htmlPreview=doc.html_preview,
+        htmlPreview=unpack_text(doc.html_preview, doc.html_preview_blob),
+        shipmentId=doc.shipment_id,
         createdAt=doc.created_at,
         updatedAt=doc.updated_at,
     )
@@ -109,40 +293,123 @@ async def list_entities(doc_id: str, db: Session = Depends(get_db)):
     ]
 
 
-@router.get("/{doc_id}/keywords", response_model=List[KeywordResponse])
-async def list_keywords(doc_id: str, db: Session = Depends(get_db)):
+@router.get("/{doc_id}/fields", response_model=List[ExtractedFieldResponse])
+async def list_fields(doc_id: str, db: Session = Depends(get_db)):
     doc = db.get(Document, doc_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Documento no encontrado")
-    kws = db.query(Keyword).filter(Keyword.document_id == doc_id).all()
-    return [KeywordResponse(keyword=k.keyword, score=k.score) for k in kws]
+    return document_fields(db, doc_id)
 
 
-@router.get("/{doc_id}/text", response_model=List[TextBlock])
-async def get_text(doc_id: str, db: Session = Depends(get_db)):
+@router.get("/{doc_id}/rows", response_model=DocumentRowsResponse)
+async def list_rows(doc_id: str, db: Session = Depends(get_db)):
+    """Filas de las tablas del documento con los totales calculados en SQL."""
     doc = db.get(Document, doc_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Documento no encontrado")
-    # Para PoC: devolvemos un único bloque de texto plano si existe en logs
-    from ..models.document import ProcessingLog
+    rows = db.execute(
+        select(DocumentRow)
+        .where(DocumentRow.document_id == doc_id)
+        .order_by(DocumentRow.row_number)
+    ).scalars().all()
+    count, boxes, net_kg, gross_kg = db.execute(
+        select(
+            func.count(DocumentRow.id),
+            func.sum(DocumentRow.boxes),
+            func.sum(DocumentRow.net_kg),
+            func.sum(DocumentRow.gross_kg),
+        ).where(DocumentRow.document_id == doc_id)
+    ).one()
+    totals = {
+        name: round(value, 3)
+        for name, value in (("boxes", boxes), ("netKg", net_kg), ("grossKg", gross_kg))
+        if value is not None
+    }
+    return DocumentRowsResponse(
+        documentId=doc_id,
+        count=count,
+        totals=totals,
+        items=[
+            DocumentRowResponse(
+                source=row.source,
+                rowNumber=row.row_number,
+                pallet=row.pallet,
+                boxes=row.boxes,
+                variety=row.variety,
+                size=row.size,
+                category=row.category,
+                container=row.container,
+                netKg=row.net_kg,
+                grossKg=row.gross_kg,
+                data=json.loads(row.data) if row.data else {},
+            )
+            for row in rows
+        ],
+    )
 
+
+@router.get("/{doc_id}/keywords", response_model=List[KeywordResponse])
+async def list_keywords(doc_id: str, db: Session = Depends(get_db)):
+    doc = db.get(Document, doc_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    kws = db.query(Keyword).filter(Keyword.document_id == doc_id).all()
+    return [KeywordResponse(keyword=k.keyword, score=k.score) for k in kws]
+
+
+def _latest_payload(db: Session, doc_id: str, step: str) -> dict:
+    """Payload JSON del último log de `step` (comprimido o no); `{}` si no hay."""
     log = (
         db.query(ProcessingLog)
-        .filter(ProcessingLog.document_id == doc_id, ProcessingLog.step == "ocr")
+        .filter(ProcessingLog.document_id == doc_id, ProcessingLog.step == step)
         .order_by(ProcessingLog.created_at.desc())
         .first()
     )
-    text = ""
-    conf = 0.0
-    if log and log.payload:
-        try:
-            data = __import__("json").loads(log.payload)
-            text = data.get("text", "")
-            conf = data.get("confidence", 0.0)
-        except Exception:
-            text = ""
-            conf = 0.0
-    return [TextBlock(page=1, text=text, bbox=None, confidence=conf)]
+    if not log:
+        return {}
+    return unpack_json(log.payload, log.payload_blob)
+
+
+@router.get("/{doc_id}/text", response_model=List[TextBlock])
+async def get_text(doc_id: str, db: Session = Depends(get_db)):
+    doc = db.get(Document, doc_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    layouts = db.execute(
+        select(DocumentPage.page, DocumentPage.layout_blob)
+        .where(DocumentPage.document_id == doc_id, DocumentPage.layout_blob.is_not(None))
+        .order_by(DocumentPage.page)
+    ).all()
+    if layouts:
+        # Un bloque por renglón, con su caja relativa a la página (0-1)
+        return [
+            TextBlock(
+                page=page,
+                text=text,
+                bbox=BBox(x=x, y=y, w=w, h=h),
+                confidence=max(0.0, confidence) / 100,
+            )
+            for page, blob in layouts
+            for x, y, w, h, confidence, text in unpack_layout(blob)
+        ]
+    data = _latest_payload(db, doc_id, "ocr")
+    text = data.get("text", "") if isinstance(data, dict) else ""
+    conf = data.get("confidence", 0.0) if isinstance(data, dict) else 0.0
+    pages = data.get("pages") or [] if isinstance(data, dict) else []
+    page_texts = [page_text.strip() for page_text in text.split("\f")]
+    if not pages or len(pages) != len(page_texts):
+        # Texto nativo o logs anteriores al OCR por página: un único bloque
+        return [TextBlock(page=1, text=text, bbox=None, confidence=conf)]
+    # Un bloque por página con la confianza que informó tesseract (0-100 -> 0-1)
+    return [
+        TextBlock(
+            page=page["page"],
+            text=page_text,
+            bbox=None,
+            confidence=max(0.0, page.get("confidence", 0.0)) / 100,
+        )
+        for page, page_text in zip(pages, page_texts)
+    ]
 
 
 @router.get("/{doc_id}/insights", response_model=DocumentInsightsResponse)
@@ -151,37 +418,100 @@ async def get_insights(doc_id: str, db: Session = Depends(get_db)):
     if not doc:
         raise HTTPException(status_code=404, detail="Documento no encontrado")
 
-    log = (
-        db.query(ProcessingLog)
-        .filter(ProcessingLog.document_id == doc_id, ProcessingLog.step == "insights")
-        .order_by(ProcessingLog.created_at.desc())
-        .first()
-    )
-    if not log or not log.payload:
-        return DocumentInsightsResponse()
+    # Cada procesamiento cambia `updated_at`; la versión de la KB decide `stale`
+    current_kb = get_knowledge_base().version
+    version = f"{doc.updated_at.isoformat() if doc.updated_at else ''}|{current_kb}"
+    cache = get_insights_cache()
+    cached = cache.get(doc_id, version)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
 
-    try:
-        payload = json.loads(log.payload)
-    except ValueError:
-        payload = {}
+    payload = _latest_payload(db, doc_id, "insights")
+    if not payload:
+        response = DocumentInsightsResponse()
+    else:
+        kb_version = payload.get("kb_version")
+        response = DocumentInsightsResponse(
+            compliance=payload.get("compliance") or [],
+            spellcheck=payload.get("spellcheck") or [],
+            recommendations=payload.get("recommendations") or [],
+            kbVersion=kb_version,
+            # Las guías cambiaron desde que se generaron estos insights
+            stale=kb_version != current_kb,
+        )
+    content = response.model_dump_json().encode("utf-8")
+    cache.put(doc_id, version, content)
+    return Response(content=content, media_type="application/json")
+
+
+@router.get("/{doc_id}/timings", response_model=DocumentTimingsResponse)
+async def get_timings(doc_id: str, db: Session = Depends(get_db)):
+    doc = db.get(Document, doc_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
 
-    return DocumentInsightsResponse(
-        compliance=payload.get("compliance") or [],
-        spellcheck=payload.get("spellcheck") or [],
-        recommendations=payload.get("recommendations") or [],
+    payload = _latest_payload(db, doc_id, "timings")
+    if not payload:
+        return DocumentTimingsResponse()
+
+    return DocumentTimingsResponse(
+        traceId=payload.get("trace_id"),
+        totalMs=payload.get("total_ms") or 0.0,
+        stages=payload.get("stages") or {},
+        spans=[
+            SpanTiming(
+                name=item.get("name", ""),
+                durationMs=item.get("duration_ms", 0.0),
+                parentId=item.get("parent_id"),
+                spanId=item.get("span_id", ""),
+                attributes=item.get("attributes") or {},
+                error=item.get("error"),
+            )
+            for item in payload.get("spans") or []
+        ],
     )
 
 
+@router.post("/{doc_id}/reprocess", response_model=DocumentCreateResponse)
+async def reprocess_document(
+    doc_id: str,
+    priority: str = Query(BATCH, description="interactive | batch"),
+    db: Session = Depends(get_db),
+):
+    """Vuelve a correr el pipeline (p. ej. tras cambiar las guías).
+
+    Por defecto entra como `batch`, detrás de los uploads interactivos.
+    """
+    if priority not in PRIORITIES:
+        raise HTTPException(
+            status_code=422, detail=f"Prioridad no soportada; usa una de: {', '.join(PRIORITIES)}"
+        )
+    doc = db.get(Document, doc_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    # Antes de tocar la fila: si está procesándose, el worker es dueño del estado
+    if get_scheduler().is_pending(doc_id):
+        raise HTTPException(status_code=409, detail=ALREADY_PENDING)
+    # El estado se marca antes de encolar: el worker puede tomarlo al instante
+    doc.status = "queued"
+    claim(doc)
+    db.commit()
+    get_insights_cache().invalidate(doc_id)
+    job = await run_in_threadpool(enqueue, doc, priority)
+    if job is None:
+        # Otro reproceso lo encoló entre medio; su estado ya es `queued`
+        raise HTTPException(status_code=409, detail=ALREADY_PENDING)
+    return _queued_response(doc, job)
+
+
 @router.get("/{doc_id}/download")
 async def download_document(doc_id: str, db: Session = Depends(get_db)):
     doc = db.get(Document, doc_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Documento no encontrado")
 
-    # Default to stored file
-    file_path = Path(doc.storage_path)
-    filename = doc.filename
-    media_type = doc.mime
+    # El pipeline completo se importa recién aquí, no al cargar el router
+    from ..services.processing import DEMO_HTML_MAPPING
 
     # Check if it's a demo HTML that maps to a real PDF
     # Reverse lookup: find key (PDF name) where value == doc.filename
@@ -193,11 +523,128 @@ async def download_document(doc_id: str, db: Session = Depends(get_db)):
         # Look for the PDF in the docs/ folder (relative to app root)
         potential_path = Path("docs") / real_pdf_name
         if potential_path.exists():
-            file_path = potential_path
-            filename = real_pdf_name
-            media_type = "application/pdf"
+            return FileResponse(
+                path=potential_path, filename=real_pdf_name, media_type="application/pdf"
+            )
 
-    if not file_path.exists():
+    # Default to stored file
+    location = doc.storage_path
+    filename = doc.filename
+    media_type = doc.mime
+    storage = storage_for(location)
+    # En S3 es un HEAD al bucket: fuera del event loop
+    if not await run_in_threadpool(storage.exists, location):
         raise HTTPException(status_code=404, detail="Archivo físico no encontrado")
 
-    return FileResponse(path=file_path, filename=filename, media_type=media_type)
+    compressed = is_compressed_path(location)
+    if isinstance(storage, LocalStorage) and not compressed:
+        return FileResponse(path=location, filename=filename, media_type=media_type)
+
+    if not compressed and get_settings().s3_presign_downloads:
+        # El cliente descarga directo del bucket; la API no mueve los bytes
+        url = storage.presigned_url(location, filename=filename)
+        if url:
+            return RedirectResponse(url, status_code=307)
+
+    # Se descomprime/lee por bloques mientras se envía, sin temporales
+    return StreamingResponse(
+        storage.iter_bytes(location),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}"},
+    )
+
+
+@router.get("/{doc_id}/pages/{page}.png")
+async def get_page_image(
+    doc_id: str,
+    page: int,
+    size: str = Query("preview", pattern="^(thumb|preview)$"),
+    db: Session = Depends(get_db),
+):
+    """Miniatura o preview PNG de una página (desde 1) para el visor."""
+    doc = db.get(Document, doc_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    if page < 1:
+        raise HTTPException(status_code=404, detail="Página no encontrada")
+    if not doc.storage_path or not await run_in_threadpool(
+        storage_for(doc.storage_path).exists, doc.storage_path
+    ):
+        raise HTTPException(status_code=404, detail="Archivo físico no encontrado")
+
+    # Rasterizar bloquea: se hace en el threadpool y solo ante un miss de caché
+    try:
+        path = await run_in_threadpool(render_page, doc, page, size)
+    except RenderUnavailable as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    if path is None:
+        raise HTTPException(status_code=404, detail="Página no encontrada")
+    return FileResponse(
+        path=path,
+        media_type="image/png",
+        headers={"Cache-Control": "private, max-age=86400"},
+    )
+
+
+# Segundos sin eventos tras los que se envía un comentario para mantener viva la conexión
+SSE_HEARTBEAT_SECONDS = 15.0
+
+
+def sse_format(event: dict) -> str:
+    return f"id: {event['id']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def _document_event_stream(
+    request: Request, doc_id: str, status: str, shipment_id: Optional[str], last_id: int
+):
+    channel = f"doc:{doc_id}"
+    # Suscribirse antes de leer el historial: ningún evento queda entre ambos
+    subscription = broker.subscribe(channel)
+    try:
+        history = [e for e in broker.history(doc_id) if e["id"] > last_id]
+        if not history:
+            # Sin historial en memoria (p. ej. tras un reinicio): estado persistido
+            event = status_event(doc_id, status, shipment_id)
+            yield sse_format(event)
+            if status in TERMINAL_STAGES:
+                return
+        for event in history:
+            last_id = event["id"]
+            yield sse_format(event)
+            if is_terminal(event):
+                return
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.queue.get(), SSE_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": ping\n\n"
+                continue
+            if event["id"] <= last_id:
+                continue
+            last_id = event["id"]
+            yield sse_format(event)
+            if is_terminal(event):
+                return
+    finally:
+        broker.unsubscribe(channel, subscription)
+
+
+@router.get("/{doc_id}/events")
+async def document_events(doc_id: str, request: Request, db: Session = Depends(get_db)):
+    """Progreso del procesamiento como Server-Sent Events; se cierra en done/failed."""
+    doc = db.get(Document, doc_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    try:
+        last_id = int(request.headers.get("last-event-id") or 0)
+    except ValueError:
+        last_id = 0
+    return StreamingResponse(
+        _document_event_stream(request, doc.id, doc.status, doc.shipment_id, last_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,79 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..core.db import get_db
+from ..models.document import Document, Entity
+from ..schemas.documents import EntityLookupResponse, LinkedDocument
+from ..services.entities import (
+    LOOKUP_TYPES,
+    canonical_type,
+    is_valid_container,
+    normalize_entity_value,
+)
+
+router = APIRouter()
+
+
+@router.get("/lookup", response_model=EntityLookupResponse)
+def lookup_entity(
+    type: str = Query(..., description="container | bl_number | booking_number | dus_number"),
+    value: str = Query(..., min_length=1),
+    limit: int = Query(200, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """Documentos que comparten un contenedor, BL, booking o DUS.
+
+    Se resuelve con el índice `(type, normalized_value)`, así que el formato en
+    que venga el valor ("MSCU 123456-7") no importa.
+    """
+    entity_type = canonical_type(type)
+    if entity_type not in LOOKUP_TYPES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Tipo no soportado; usa uno de: {', '.join(LOOKUP_TYPES)}",
+        )
+    normalized = normalize_entity_value(entity_type, value)
+    if not normalized:
+        raise HTTPException(status_code=422, detail="Valor vacío tras normalizar")
+
+    rows = db.execute(
+        select(
+            Document.id,
+            Document.filename,
+            Document.doc_type,
+            Document.status,
+            Document.created_at,
+            Entity.value,
+            Entity.confidence,
+        )
+        .join(Entity, Entity.document_id == Document.id)
+        .where(Entity.type == entity_type, Entity.normalized_value == normalized)
+        .order_by(Document.created_at.desc())
+        .limit(limit)
+    ).all()
+
+    documents = {}
+    for doc_id, filename, doc_type, status, created_at, raw, confidence in rows:
+        # Un documento puede repetir la entidad; se reporta una vez
+        documents.setdefault(
+            doc_id,
+            LinkedDocument(
+                documentId=doc_id,
+                filename=filename,
+                docType=doc_type,
+                status=status,
+                createdAt=created_at,
+                value=raw,
+                confidence=confidence or 0.0,
+            ),
+        )
+    return EntityLookupResponse(
+        type=entity_type,
+        value=value,
+        normalizedValue=normalized,
+        checkDigitValid=is_valid_container(normalized)
+        if entity_type == "container"
+        else None,
+        documents=list(documents.values()),
+    )
@@ -0,0 +1,116 @@
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..core.db import get_db
+from ..models.document import ExtractedField
+from ..schemas.documents import ExtractedFieldPage, ExtractedFieldResponse
+
+router = APIRouter()
+
+MAX_PAGE_SIZE = 500
+
+
+def field_response(row: ExtractedField) -> ExtractedFieldResponse:
+    if row.value_type in ("number", "weight"):
+        value = row.value_number
+    elif row.value_type == "date":
+        value = row.value_date
+    elif row.value_type == "code":
+        value = row.value_code
+    else:
+        value = row.value_text
+    return ExtractedFieldResponse(
+        documentId=row.document_id,
+        docType=row.doc_type,
+        field=row.field,
+        type=row.value_type,
+        value=value,
+        unit=row.unit,
+        raw=row.raw,
+        confidence=row.confidence or 0.0,
+        kbVersion=row.kb_version,
+    )
+
+
+@router.get("/", response_model=ExtractedFieldPage)
+def query_fields(
+    field: Optional[str] = None,
+    doc_type: Optional[str] = None,
+    document_id: Optional[str] = None,
+    code: Optional[str] = Query(None, description="valor exacto de un campo código"),
+    min_value: Optional[float] = None,
+    max_value: Optional[float] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    min_confidence: Optional[float] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    """Filtra valores extraídos en SQL (p. ej. peso_bruto > 20000, un contenedor).
+
+    Los filtros por valor requieren `field` para aprovechar los índices
+    compuestos `(field, value_*)`.
+    """
+    has_value_filter = any(
+        v is not None for v in (code, min_value, max_value, date_from, date_to)
+    )
+    if has_value_filter and not field:
+        raise HTTPException(
+            status_code=422, detail="Los filtros por valor requieren `field`"
+        )
+
+    query = select(ExtractedField)
+    if field:
+        query = query.where(ExtractedField.field == field)
+    if doc_type:
+        query = query.where(ExtractedField.doc_type == doc_type)
+    if document_id:
+        query = query.where(ExtractedField.document_id == document_id)
+    if code is not None:
+        query = query.where(ExtractedField.value_code == code.strip().upper())
+    if min_value is not None:
+        query = query.where(ExtractedField.value_number >= min_value)
+    if max_value is not None:
+        query = query.where(ExtractedField.value_number <= max_value)
+    if date_from is not None:
+        query = query.where(ExtractedField.value_date >= date_from)
+    if date_to is not None:
+        query = query.where(ExtractedField.value_date <= date_to)
+    if min_confidence is not None:
+        query = query.where(ExtractedField.confidence >= min_confidence)
+
+    # Se pide una fila extra para saber si hay otra página sin hacer COUNT(*)
+    rows = (
+        db.execute(
+            query.order_by(ExtractedField.created_at.desc(), ExtractedField.id)
+            .limit(limit + 1)
+            .offset(offset)
+        )
+        .scalars()
+        .all()
+    )
+    has_more = len(rows) > limit
+    return ExtractedFieldPage(
+        items=[field_response(row) for row in rows[:limit]],
+        limit=limit,
+        offset=offset,
+        nextOffset=offset + limit if has_more else None,
+    )
+
+
+def document_fields(db: Session, doc_id: str) -> List[ExtractedFieldResponse]:
+    rows = (
+        db.execute(
+            select(ExtractedField)
+            .where(ExtractedField.document_id == doc_id)
+            .order_by(ExtractedField.field)
+        )
+        .scalars()
+        .all()
+    )
+    return [field_response(row) for row in rows]
@@ -0,0 +1,116 @@
+import time
+from typing import Dict
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, select, text
+
+from ..core.config import get_settings
+from ..core.db import session_scope
+from ..core.metrics import DOCUMENTS_PENDING, PROCESSING_IN_FLIGHT
+from ..models.document import Document
+from ..services.scheduler import INTERACTIVE, get_scheduler
+from ..services.storage import get_storage
+
+router = APIRouter()
+
+
+def pending_documents() -> Dict[str, int]:
+    """Cantidad de documentos en cola o procesándose, por estado."""
+    with session_scope() as session:
+        rows = session.execute(
+            select(Document.status, func.count())
+            .where(Document.status.in_(("queued", "processing")))
+            .group_by(Document.status)
+        ).all()
+    return {status: count for status, count in rows}
+
+
+DOCUMENTS_PENDING.set_function(
+    lambda: {(status,): count for status, count in pending_documents().items()}
+)
+
+
+def _check_ocr(settings) -> dict:
+    from ..services.processing import check_system_dependencies
+
+    deps = check_system_dependencies()
+    ok = bool(deps.get("tesseract_available") and deps.get("poppler_available"))
+    return {
+        "ok": ok or not settings.readiness_require_ocr,
+        "required": settings.readiness_require_ocr,
+        "ocr_available": ok,
+        **deps,
+    }
+
+
+def _check_workers(settings) -> dict:
+    in_flight = int(PROCESSING_IN_FLIGHT.value())
+    capacity = max(1, settings.max_concurrent_processing)
+    utilization = in_flight / capacity
+    queue = get_scheduler().snapshot()
+    # Con el pool lleno los uploads esperan en cola; el nodo deja de estar listo
+    # recién cuando la cola interactiva crece más allá del umbral
+    waiting = queue["queued"].get(INTERACTIVE, 0)
+    return {
+        "ok": waiting <= settings.readiness_max_queue_depth,
+        "in_flight": in_flight,
+        "capacity": capacity,
+        "utilization": round(utilization, 3),
+        "queued": queue["queued"],
+        "queued_pages": queue["queued_cost"],
+        "max_queue_depth": settings.readiness_max_queue_depth,
+    }
+
+
+def _check_database(settings) -> dict:
+    start = time.perf_counter()
+    try:
+        with session_scope() as session:
+            session.execute(text("SELECT 1"))
+        backlog = pending_documents()
+    except Exception as exc:
+        return {"ok": False, "error": str(exc)}
+    latency_ms = (time.perf_counter() - start) * 1000
+    return {
+        "ok": latency_ms <= settings.readiness_max_db_latency_ms,
+        "latency_ms": round(latency_ms, 3),
+        "backlog": backlog,
+    }
+
+
+def _check_backlog(settings, database: dict) -> dict:
+    backlog = sum((database.get("backlog") or {}).values())
+    return {
+        "ok": database.get("ok", False) and backlog <= settings.readiness_max_backlog,
+        "pending": backlog,
+        "max": settings.readiness_max_backlog,
+    }
+
+
+def _check_storage(settings) -> dict:
+    return get_storage().check()
+
+
+@router.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@router.get("/health/ready")
+def readiness():
+    """Readiness profunda: 503 si el nodo no debería recibir uploads."""
+    settings = get_settings()
+    database = _check_database(settings)
+    checks = {
+        "ocr": _check_ocr(settings),
+        "workers": _check_workers(settings),
+        "database": database,
+        "backlog": _check_backlog(settings, database),
+        "storage": _check_storage(settings),
+    }
+    ready = all(check["ok"] for check in checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "degraded", "checks": checks},
+    )
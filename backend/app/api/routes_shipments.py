@@ -0,0 +1,146 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..core.db import get_db, session_scope
+from ..models.document import Document
+from ..schemas.documents import (
+    LineDiscrepancy,
+    LineQuantity,
+    LineReconciliation,
+    QuantityDiscrepancy,
+    QuantityReference,
+    ReconciledDocument,
+    ShipmentReconciliationResponse,
+)
+from ..services.events import broker, status_event
+from ..services.reconcile import ReconciliationUnavailable, reconcile_shipment
+
+router = APIRouter()
+
+# Magnitudes de services/reconcile.py con el nombre de las respuestas
+METRIC_NAMES = {"net_kg": "netKg", "gross_kg": "grossKg", "boxes": "boxes", "value": "value"}
+
+
+@router.get("/{shipment_id}/reconciliation", response_model=ShipmentReconciliationResponse)
+def shipment_reconciliation(shipment_id: str, db: Session = Depends(get_db)):
+    """Pesos, cajas y montos de los documentos del embarque contra el packing list.
+
+    Cada documento aporta la suma de sus filas y/o el total declarado; las
+    diferencias se clasifican con las tolerancias `reconcile_*`.
+    """
+    exists = db.execute(
+        select(Document.id).where(Document.shipment_id == shipment_id).limit(1)
+    ).first()
+    if exists is None:
+        raise HTTPException(status_code=404, detail="Embarque no encontrado")
+    try:
+        result = reconcile_shipment(db, shipment_id)
+    except ReconciliationUnavailable as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    return ShipmentReconciliationResponse(
+        shipmentId=shipment_id,
+        status=result["status"],
+        documents=[
+            ReconciledDocument(
+                documentId=item["document_id"],
+                docType=item["doc_type"],
+                filename=item["filename"],
+                rows=item["rows"],
+                totals={METRIC_NAMES[name]: value for name, value in item["totals"].items()},
+            )
+            for item in result["documents"]
+        ],
+        references={
+            METRIC_NAMES[name]: QuantityReference(
+                documentId=ref["document_id"],
+                docType=ref["doc_type"],
+                source=ref["source"],
+                value=ref["value"],
+            )
+            for name, ref in result["references"].items()
+        },
+        discrepancies=[
+            QuantityDiscrepancy(
+                metric=METRIC_NAMES[item["metric"]],
+                documentId=item["document_id"],
+                docType=item["doc_type"],
+                source=item["source"],
+                value=item["value"],
+                reference=item["reference"],
+                difference=item["difference"],
+                ratio=item["ratio"],
+                severity=item["severity"],
+            )
+            for item in result["discrepancies"]
+        ],
+        lines=[
+            LineReconciliation(
+                referenceId=report["reference_id"],
+                documentId=report["document_id"],
+                key=report["key"],
+                matched=report["matched"],
+                lines=[
+                    LineDiscrepancy(
+                        key=line["key"],
+                        severity=line["severity"],
+                        boxes=LineQuantity(**line["boxes"]),
+                        netKg=LineQuantity(**line["net_kg"]),
+                    )
+                    for line in report["lines"]
+                ],
+            )
+            for report in result["lines"]
+        ],
+    )
+
+
+def _shipment_snapshot(shipment_id: str):
+    with session_scope() as db:
+        return db.execute(
+            select(Document.id, Document.status)
+            .where(Document.shipment_id == shipment_id)
+            .order_by(Document.created_at)
+        ).all()
+
+
+async def _drain_client(websocket: WebSocket) -> None:
+    # El canal es solo de salida; leer sirve para enterarse del cierre
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        return
+
+
+@router.websocket("/{shipment_id}/events")
+async def shipment_events(websocket: WebSocket, shipment_id: str):
+    """Progreso de todos los documentos de un embarque por un único WebSocket.
+
+    Al conectar envía el estado actual de cada documento y luego los eventos
+    del pipeline a medida que ocurren; no se cierra al terminar un documento.
+    """
+    await websocket.accept()
+    channel = f"shipment:{shipment_id}"
+    subscription = broker.subscribe(channel)
+    receiver = asyncio.create_task(_drain_client(websocket))
+    try:
+        for doc_id, status in await run_in_threadpool(_shipment_snapshot, shipment_id):
+            await websocket.send_json(status_event(doc_id, status, shipment_id))
+        while True:
+            getter = asyncio.create_task(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                {getter, receiver}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if receiver in done:
+                getter.cancel()
+                return
+            await websocket.send_json(getter.result())
+    except WebSocketDisconnect:
+        return
+    finally:
+        receiver.cancel()
+        broker.unsubscribe(channel, subscription)
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
 import os
+from functools import lru_cache
 
 
 class Settings(BaseSettings):
@@ -12,11 +13,94 @@ class Settings(BaseSettings):
     )
     storage_dir: str = Field(default_factory=lambda: os.path.abspath("backend/storage"))
 
+    # Segundos entre verificaciones de cambios en guides/ (negativo = sin hot reload)
+    knowledge_reload_interval: float = 2.0
+
+    # Readiness (/health/ready): umbrales para sacar el nodo del balanceador
+    max_concurrent_processing: int = 4
+    # Páginas en OCR a la vez (tesseract usa un core por página)
+    max_concurrent_ocr: int = 2
+    # OCR adaptativo: resolución inicial, máxima para reintentos y confianza media
+    # (0-100, por palabra) bajo la cual una página se vuelve a reconocer
+    ocr_initial_dpi: int = 150
+    ocr_max_dpi: int = 300
+    ocr_min_confidence: float = 70.0
+    # Motor OCR: "auto" (tesserocr si está instalado, si no CLI por lotes),
+    # "tesserocr", "cli" o "pytesseract" (un proceso por página)
+    ocr_backend: str = "auto"
+    # Páginas por llamada al motor; con el CLI, un proceso de tesseract por lote
+    ocr_batch_pages: int = 8
+    # Memoria para páginas rasterizadas entre todos los workers; al agotarse,
+    # el siguiente lote espera. Los PDF se rasterizan por lotes a disco temporal
+    raster_budget_mb: int = 256
+    # Segundos que un reproceso batch espera antes de adelantarse a los uploads
+    scheduler_batch_max_wait: float = 300.0
+    # Segundos sin latido tras los que otro worker puede reclamar un documento
+    # en cola o procesándose (el latido se renueva cada tercio)
+    scheduler_lease_seconds: float = 120.0
+    # Uploads esperando worker por sobre los cuales el nodo deja de estar listo
+    readiness_max_queue_depth: int = 20
+    # Sin Tesseract/Poppler el nodo igual procesa PDFs con texto nativo: la
+    # falta de OCR se informa en /health/ready pero no lo saca del balanceador
+    readiness_require_ocr: bool = False
+    readiness_max_backlog: int = 50
+    readiness_max_db_latency_ms: float = 250.0
+    readiness_min_free_storage_mb: int = 512
+
+    # Conciliación entre documentos (validation_rules.md): diferencia relativa de
+    # pesos y montos que se informa como warning y como error, y cajas de más o
+    # de menos toleradas. Los totales declarados que el schema extrajo con menos
+    # confianza que `reconcile_min_confidence` no se concilian
+    reconcile_ratio_warning: float = 0.01
+    reconcile_ratio_tolerance: float = 0.02
+    reconcile_count_tolerance: float = 1.0
+    reconcile_min_confidence: float = 0.7
+
+    # Almacenamiento de archivos originales: "local" (storage_dir) o "s3"
+    # (S3 o compatible como MinIO vía s3_endpoint_url; requiere boto3)
+    storage_backend: str = "local"
+    s3_bucket: str = ""
+    s3_prefix: str = "documents"
+    s3_endpoint_url: str = ""
+    s3_region: str = ""
+    s3_access_key: str = ""
+    s3_secret_key: str = ""
+    s3_max_pool_connections: int = 20
+    s3_multipart_chunk_mb: int = 8
+    s3_presign_expiry: int = 900
+    # Descargas por redirect a URL prefirmada en vez de pasar por la API
+    s3_presign_downloads: bool = True
+
+    # Compresión de uploads en disco: "none", "text" (HTML/JSON/XML) o "all"
+    upload_compression: str = "text"
+
+    # Retención de processing_logs: resultados que se conservan por documento y
+    # paso, archivo frío para el resto y cada cuántos segundos corre (<= 0 = nunca)
+    log_retention_keep: int = 1
+    log_retention_interval: float = 3600.0
+    log_archive_dir: str = Field(default_factory=lambda: os.path.abspath("backend/archive"))
+
+    # Caché de respuestas de insights: entradas del LRU en memoria (0 = sin
+    # caché) y, opcional, una caché compartida entre réplicas (redis://...)
+    insights_cache_entries: int = 2048
+    insights_cache_url: str = ""
+    insights_cache_ttl: int = 86400
+
+    # Export analítico a Parquet (tools/export_parquet.py): carpeta destino y mes
+    # en que empieza la temporada exportadora (particiones season=2024-2025)
+    export_dir: str = Field(default_factory=lambda: os.path.abspath("backend/export"))
+    export_season_start_month: int = 9
+
+    # Caché de imágenes de página (miniaturas y previews del visor) con LRU
+    render_cache_dir: str = Field(default_factory=lambda: os.path.abspath("backend/cache/pages"))
+    render_cache_max_mb: int = 512
+
     class Config:
         env_file = ".env"
         extra = "ignore"
 
 
+@lru_cache()
 def get_settings() -> Settings:
     settings = Settings()
     os.makedirs(settings.storage_dir, exist_ok=True)
@@ -1,6 +1,9 @@
-from sqlalchemy import create_engine
+import threading
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from contextlib import contextmanager
+from typing import Optional
 from .config import get_settings
 
 
@@ -8,19 +11,62 @@ class Base(DeclarativeBase):
     pass
 
 
-settings = get_settings()
-engine = create_engine(settings.database_url, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+# El engine se crea en el primer uso (no al importar) para que importar modelos
+# o herramientas no toque el disco ni lea la configuración.
+SessionLocal = sessionmaker(autoflush=False, autocommit=False, future=True)
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_engine(get_settings().database_url, future=True)
+                SessionLocal.configure(bind=engine)
+                _engine = engine
+    return _engine
 
 
 def init_db():
     from ..models import document  # noqa: F401
 
+    engine = get_engine()
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns(engine)
+    # create_all no agrega índices nuevos a tablas que ya existían
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    from ..services.entities import backfill_normalized_values, renormalize_values
+    from ..services.search import ensure_search_index
+
+    ensure_search_index(engine)
+    with session_scope() as session:
+        backfill_normalized_values(session)
+        renormalize_values(session)
+
+
+def _add_missing_columns(engine: Engine) -> None:
+    """Agrega columnas nuevas (nullable) a tablas existentes, sin migraciones."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.exec_driver_sql(
+                    f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'
+                )
 
 
 @contextmanager
 def session_scope():
+    get_engine()
     session = SessionLocal()
     try:
         yield session
@@ -0,0 +1,311 @@
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .tracing import Span, collector
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        return "\n".join(header + list(self.samples()))
+
+
+class _ValueMetric(_Metric):
+    """Un valor por combinación de etiquetas, guardado o calculado al hacer scrape."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], Dict[LabelValues, float]]] = None
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def set_function(self, function: Callable[[], Dict[LabelValues, float]]) -> None:
+        """Calcula los valores en el momento del scrape (p. ej. consultas a la BD)."""
+        self._function = function
+
+    def samples(self) -> Iterable[str]:
+        if self._function is not None:
+            try:
+                items = list(self._function().items())
+            except Exception:
+                items = []
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Counter(_ValueMetric):
+    kind = "counter"
+
+
+class Gauge(_ValueMetric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * len(self.buckets))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(k, list(v), self._sums[k]) for k, v in self._counts.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield (
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} "
+                    f"{cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Registra `metric`; si el nombre ya existe devuelve la métrica registrada.
+
+        Volver a registrar un nombre con otro tipo o con otras etiquetas es un
+        error: se perderían las etiquetas nuevas en silencio.
+        """
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if existing.kind != metric.kind or existing.labelnames != metric.labelnames:
+                    raise ValueError(
+                        f"La métrica {metric.name} ya está registrada como {existing.kind} "
+                        f"con etiquetas {existing.labelnames}"
+                    )
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return registry.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return registry.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+) -> Histogram:
+    return registry.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# --- Métricas de la API -----------------------------------------------------
+
+HTTP_REQUEST_DURATION = histogram(
+    "inova_http_request_duration_seconds",
+    "Latencia de requests HTTP por ruta.",
+    ("method", "route", "status"),
+)
+UPLOAD_BYTES = counter(
+    "inova_upload_bytes_total", "Bytes recibidos en uploads.", ("mime",)
+)
+DOCUMENTS_PROCESSED = counter(
+    "inova_documents_processed_total",
+    "Documentos procesados por tipo y estado final.",
+    ("doc_type", "status"),
+)
+PROCESSING_IN_FLIGHT = gauge(
+    "inova_processing_in_flight", "Documentos procesándose en este momento."
+)
+# El valor lo calcula una consulta a la BD que registra `api/routes_health`
+DOCUMENTS_PENDING = gauge(
+    "inova_documents_pending",
+    "Documentos en cola o procesándose según la base de datos.",
+    ("status",),
+)
+STAGE_DURATION = histogram(
+    "inova_stage_duration_seconds",
+    "Duración de cada etapa del pipeline (spans).",
+    ("stage",),
+)
+OCR_PAGES = counter(
+    "inova_ocr_pages_total", "Páginas procesadas por OCR, contando reintentos."
+)
+OCR_SECONDS = counter(
+    "inova_ocr_seconds_total",
+    "Segundos (reloj de pared) gastados en OCR de páginas; "
+    "páginas/s = rate(pages)/rate(seconds).",
+)
+DB_QUERY_DURATION = histogram(
+    "inova_db_query_duration_seconds",
+    "Duración de consultas SQL por operación.",
+    ("operation",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+# Contadores acumulados que lleva cada caché; se leen en el scrape
+CACHE_HITS = counter("inova_cache_hits_total", "Aciertos por caché.", ("cache",))
+CACHE_MISSES = counter("inova_cache_misses_total", "Fallos por caché.", ("cache",))
+
+_cache_sources: Dict[str, Callable[[], Tuple[int, int]]] = {}
+
+
+def register_cache(name: str, stats: Callable[[], Tuple[int, int]]) -> None:
+    """Registra una caché cuyo `stats()` devuelve `(hits, misses)`."""
+    _cache_sources[name] = stats
+
+
+def _cache_values(index: int) -> Dict[LabelValues, float]:
+    values: Dict[LabelValues, float] = {}
+    for name, stats in list(_cache_sources.items()):
+        try:
+            values[(name,)] = float(stats()[index])
+        except Exception:
+            continue
+    return values
+
+
+CACHE_HITS.set_function(lambda: _cache_values(0))
+CACHE_MISSES.set_function(lambda: _cache_values(1))
+
+
+def _observe_span(span: Span) -> None:
+    seconds = span.duration_ms / 1000
+    STAGE_DURATION.observe(seconds, stage=span.name)
+    if span.name == "ocr.batch":
+        # Un span por lote de páginas; reintentos a más resolución cuentan de nuevo
+        OCR_PAGES.inc(span.attributes.get("pages", 1))
+        OCR_SECONDS.inc(seconds)
+
+
+collector.add_exporter(_observe_span)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    operation = (statement.lstrip().split(None, 1) or ["OTHER"])[0].upper()
+    DB_QUERY_DURATION.observe(elapsed, operation=operation)
+
+
+def render_metrics() -> str:
+    return registry.render()
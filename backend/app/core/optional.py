@@ -0,0 +1,24 @@
+import importlib
+import importlib.util
+from functools import lru_cache
+from typing import Optional
+
+
+# Las dependencias opcionales (PDF/OCR, numpy, pyarrow, redis, openpyxl) se
+# importan recién cuando se usan: el API y las réplicas de solo lectura arrancan
+# sin cargarlas. Si falta la dependencia el loader devuelve None y quien llama
+# decide el respaldo (otro motor, 503, caché solo local).
+@lru_cache(maxsize=None)
+def optional_import(module_name: str, attribute: Optional[str] = None):
+    try:
+        module = importlib.import_module(module_name)
+    except Exception:
+        return None
+    return getattr(module, attribute, None) if attribute else module
+
+
+def module_installed(module_name: str) -> bool:
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
@@ -0,0 +1,211 @@
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# OpenTelemetry es opcional: si está instalado los spans también se emiten por su API
+try:
+    from opentelemetry import trace as otel_trace
+except Exception:
+    otel_trace = None
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """Intervalo medido con `time.perf_counter_ns` (monótono, alta resolución)."""
+
+    __slots__ = (
+        "name",
+        "span_id",
+        "parent_id",
+        "trace_id",
+        "attributes",
+        "start_ns",
+        "end_ns",
+        "error",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: Optional[str],
+        parent_id: Optional[str],
+        attributes: Dict[str, Any],
+    ):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.trace_id = trace_id
+        self.attributes = attributes
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end - self.start_ns) / 1_000_000
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "trace_id": self.trace_id,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """Agrupa los spans de una ejecución (p. ej. un documento procesado)."""
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attributes = attributes
+        self.spans: List[Span] = []
+        self.start_ns = time.perf_counter_ns()
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter_ns() - self.start_ns) / 1_000_000
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Suma de duraciones por nombre de span (ms)."""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+        return {name: round(value, 3) for name, value in totals.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "attributes": self.attributes,
+            "total_ms": round(self.elapsed_ms, 3),
+            "stages": self.stage_totals(),
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+class SpanCollector:
+    """Colector en proceso: buffer circular de spans terminados + exportadores."""
+
+    def __init__(self, max_spans: int = 5000):
+        self._spans: deque = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self._exporters: List[Callable[[Span], None]] = []
+
+    def add_exporter(self, exporter: Callable[[Span], None]) -> None:
+        self._exporters.append(exporter)
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+        for exporter in self._exporters:
+            try:
+                exporter(span)
+            except Exception:
+                logger.exception("Exportador de spans falló")
+
+    def spans(self, name: Optional[str] = None, limit: int = 500) -> List[Span]:
+        with self._lock:
+            items = list(self._spans)
+        if name:
+            items = [s for s in items if s.name == name]
+        return items[-limit:]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Percentiles por etapa sobre los spans retenidos en el buffer."""
+        grouped: Dict[str, List[float]] = {}
+        for span in self.spans(limit=len(self._spans) or 1):
+            grouped.setdefault(span.name, []).append(span.duration_ms)
+        result: Dict[str, Dict[str, float]] = {}
+        for name, values in grouped.items():
+            values.sort()
+            result[name] = {
+                "count": len(values),
+                "p50_ms": round(values[int((len(values) - 1) * 0.5)], 3),
+                "p95_ms": round(values[int((len(values) - 1) * 0.95)], 3),
+                "max_ms": round(values[-1], 3),
+            }
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+collector = SpanCollector()
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Trace]:
+    trace = Trace(name, attributes)
+    token = _current_trace.set(trace)
+    try:
+        with span(name, **attributes):
+            yield trace
+    finally:
+        _current_trace.reset(token)
+        logger.info(
+            "trace %s %.1fms %s",
+            name,
+            trace.elapsed_ms,
+            " ".join(f"{k}={v:.1f}" for k, v in trace.stage_totals().items()),
+        )
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    current = Span(
+        name,
+        trace.trace_id if trace else None,
+        parent.span_id if parent else None,
+        dict(attributes),
+    )
+    token = _current_span.set(current)
+    otel_cm = (
+        otel_trace.get_tracer(__name__).start_as_current_span(
+            name, attributes=attributes or None
+        )
+        if otel_trace is not None
+        else None
+    )
+    if otel_cm is not None:
+        otel_cm.__enter__()
+    exc_info = (None, None, None)
+    try:
+        yield current
+    except Exception as exc:
+        current.error = repr(exc)
+        exc_info = (type(exc), exc, exc.__traceback__)
+        raise
+    finally:
+        current.end_ns = time.perf_counter_ns()
+        _current_span.reset(token)
+        if otel_cm is not None:
+            otel_cm.__exit__(*exc_info)
+        if trace is not None:
+            trace.spans.append(current)
+        collector.record(current)
+        logger.debug("span %s %.3fms %s", name, current.duration_ms, current.attributes)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
@@ -1,7 +1,22 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+
 from .api.routes_documents import router as documents_router
-from .core.db import init_db
+from .api.routes_entities import router as entities_router
+from .api.routes_fields import router as fields_router
+from .api.routes_health import router as health_router
+from .api.routes_shipments import router as shipments_router
+from .core.config import get_settings
+from .core.db import get_engine, init_db
+from .core.metrics import CONTENT_TYPE_LATEST, HTTP_REQUEST_DURATION, render_metrics
+from .services.retention import run_retention
+from .services.scheduler import get_scheduler, recover_pending
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Inova Docs API", version="0.1.0")
 
@@ -15,15 +30,61 @@ app.add_middleware(
 )
 
 
-@app.get("/health")
-async def health():
-    return {"status": "ok"}
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Usar la plantilla de la ruta (/documents/{doc_id}) para acotar la cardinalidad
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        )
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
 
 
+app.include_router(health_router, tags=["health"])
 app.include_router(documents_router, prefix="/documents", tags=["documents"])
+app.include_router(fields_router, prefix="/fields", tags=["fields"])
+app.include_router(entities_router, prefix="/entities", tags=["entities"])
+app.include_router(shipments_router, prefix="/shipments", tags=["shipments"])
+
+
+async def _retention_loop(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # Fuera del event loop: borra/archiva en lotes y puede hacer VACUUM
+            await asyncio.to_thread(run_retention, get_engine())
+        except Exception:
+            logger.exception("Falló la retención de processing_logs")
 
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     # Crear tablas si no existen (SQLite)
     init_db()
+    get_scheduler().start()
+    recover_pending()
+    interval = get_settings().log_retention_interval
+    if interval > 0:
+        app.state.retention_task = asyncio.create_task(_retention_loop(interval))
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    task = getattr(app.state, "retention_task", None)
+    if task is not None:
+        task.cancel()
+    get_scheduler().stop()
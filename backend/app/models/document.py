@@ -1,4 +1,15 @@
-from sqlalchemy import Column, String, Integer, DateTime, Float, Text, ForeignKey
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    Date,
+    DateTime,
+    Float,
+    Text,
+    ForeignKey,
+    Index,
+    LargeBinary,
+)
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from ..core.db import Base
@@ -6,6 +17,13 @@ from ..core.db import Base
 
 class Document(Base):
     __tablename__ = "documents"
+    # Índices del listado: orden (created_at, id) y filtros frecuentes por delante
+    __table_args__ = (
+        Index("ix_documents_created_at_id", "created_at", "id"),
+        Index("ix_documents_status_created_at", "status", "created_at", "id"),
+        Index("ix_documents_doc_type_created_at", "doc_type", "created_at", "id"),
+        Index("ix_documents_shipment_id", "shipment_id", "created_at"),
+    )
 
     id = Column(String, primary_key=True)
     filename = Column(String, nullable=False)
@@ -15,9 +33,17 @@ class Document(Base):
     language_detected = Column(String, nullable=True)
     status = Column(String, default="queued")
     storage_path = Column(String, nullable=False)
+    # Embarque al que pertenece (agrupa BL, factura, packing list, etc.)
+    shipment_id = Column(String, nullable=True)
     html_preview = Column(Text, nullable=True)  # Stores HTML content for preview
+    # Preview grande comprimido (zstd/gzip); excluye a html_preview
+    html_preview_blob = Column(LargeBinary, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Worker que lo tiene en cola o procesándose y su último latido; pendiente
+    # sin latido reciente, otro worker lo puede reclamar (services/scheduler.py)
+    owner = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
 
     entities = relationship(
         "Entity", back_populates="document", cascade="all, delete-orphan"
@@ -28,15 +54,30 @@ class Document(Base):
     logs = relationship(
         "ProcessingLog", back_populates="document", cascade="all, delete-orphan"
     )
+    fields = relationship(
+        "ExtractedField", back_populates="document", cascade="all, delete-orphan"
+    )
+    pages = relationship(
+        "DocumentPage", back_populates="document", cascade="all, delete-orphan"
+    )
+    rows = relationship(
+        "DocumentRow", back_populates="document", cascade="all, delete-orphan"
+    )
 
 
 class Entity(Base):
     __tablename__ = "entities"
+    __table_args__ = (
+        Index("ix_entities_type_normalized_value", "type", "normalized_value"),
+        Index("ix_entities_document_id", "document_id"),
+    )
 
     id = Column(String, primary_key=True)
     document_id = Column(String, ForeignKey("documents.id"), nullable=False)
     type = Column(String, nullable=False)
     value = Column(String, nullable=False)
+    # Clave de cruce entre documentos (ver services/entities.py)
+    normalized_value = Column(String, nullable=True)
     confidence = Column(Float, default=0.0)
     page = Column(Integer, nullable=True)
 
@@ -54,15 +95,94 @@ class Keyword(Base):
     document = relationship("Document", back_populates="keywords")
 
 
+class DocumentPage(Base):
+    """Texto extraído por página; fuente del índice de búsqueda full-text."""
+
+    __tablename__ = "document_pages"
+
+    id = Column(String, primary_key=True)
+    document_id = Column(
+        String, ForeignKey("documents.id"), nullable=False, index=True
+    )
+    page = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False, default="")
+    # Renglones con posición (JSON comprimido, ver services/layout.py)
+    layout_blob = Column(LargeBinary, nullable=True)
+
+    document = relationship("Document", back_populates="pages")
+
+
+class DocumentRow(Base):
+    """Fila de una tabla del documento (packing list, proforma), ver services/tables.py."""
+
+    __tablename__ = "document_rows"
+    __table_args__ = (
+        Index("ix_document_rows_document_row", "document_id", "row_number"),
+    )
+
+    id = Column(String, primary_key=True)
+    document_id = Column(String, ForeignKey("documents.id"), nullable=False)
+    source = Column(String, nullable=True)  # hoja de la planilla o "page N"
+    row_number = Column(Integer, nullable=False)
+    pallet = Column(String, nullable=True)
+    boxes = Column(Float, nullable=True)
+    variety = Column(String, nullable=True)
+    size = Column(String, nullable=True)
+    category = Column(String, nullable=True)
+    container = Column(String, nullable=True)
+    net_kg = Column(Float, nullable=True)
+    gross_kg = Column(Float, nullable=True)
+    data = Column(Text, nullable=True)  # JSON con todas las celdas de la fila
+
+    document = relationship("Document", back_populates="rows")
+
+
 class ProcessingLog(Base):
     __tablename__ = "processing_logs"
+    # Lecturas del último resultado por paso y ranking de la retención
+    __table_args__ = (
+        Index("ix_processing_logs_document_step", "document_id", "step", "created_at"),
+    )
 
     id = Column(String, primary_key=True)
     document_id = Column(String, ForeignKey("documents.id"), nullable=False)
     step = Column(String, nullable=False)
     payload = Column(Text, nullable=True)  # JSON serialized as text
+    # JSON comprimido cuando es grande (texto OCR); excluye a payload
+    payload_blob = Column(LargeBinary, nullable=True)
     success = Column(Integer, default=1)
     duration_ms = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     document = relationship("Document", back_populates="logs")
+
+
+class ExtractedField(Base):
+    """Valor tipado de un campo del schema, consultable directamente en SQL."""
+
+    __tablename__ = "extracted_fields"
+    __table_args__ = (
+        Index("ix_extracted_fields_field_number", "field", "value_number"),
+        Index("ix_extracted_fields_field_code", "field", "value_code"),
+        Index("ix_extracted_fields_field_date", "field", "value_date"),
+        Index("ix_extracted_fields_doc_type_field", "doc_type", "field"),
+    )
+
+    id = Column(String, primary_key=True)
+    document_id = Column(
+        String, ForeignKey("documents.id"), nullable=False, index=True
+    )
+    doc_type = Column(String, nullable=True)
+    field = Column(String, nullable=False)
+    value_type = Column(String, nullable=False)  # number | weight | code | date | string
+    value_text = Column(String, nullable=True)
+    value_number = Column(Float, nullable=True)
+    value_date = Column(Date, nullable=True)
+    value_code = Column(String, nullable=True)
+    unit = Column(String, nullable=True)
+    raw = Column(String, nullable=True)
+    confidence = Column(Float, default=0.0)
+    kb_version = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    document = relationship("Document", back_populates="fields")
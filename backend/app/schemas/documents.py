@@ -1,12 +1,17 @@
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Dict, Union
 from pydantic import BaseModel, Field
-from datetime import datetime
+from datetime import date, datetime
 
 
 class DocumentCreateResponse(BaseModel):
     id: str
     status: str
     createdAt: datetime
+    shipmentId: Optional[str] = None
+    # SSE con el progreso del procesamiento
+    eventsUrl: Optional[str] = None
+    priority: Optional[str] = None
+    estimatedPages: Optional[int] = None
 
 
 class DocumentDetailResponse(BaseModel):
@@ -15,10 +20,49 @@ class DocumentDetailResponse(BaseModel):
     docType: Optional[str] = None
     languageDetected: Optional[str] = None
     htmlPreview: Optional[str] = None
+    shipmentId: Optional[str] = None
     createdAt: datetime
     updatedAt: Optional[datetime] = None
 
 
+class DocumentSummary(BaseModel):
+    id: str
+    createdAt: datetime
+    filename: Optional[str] = None
+    mime: Optional[str] = None
+    size: Optional[int] = None
+    status: Optional[str] = None
+    docType: Optional[str] = None
+    languageDetected: Optional[str] = None
+    shipmentId: Optional[str] = None
+    updatedAt: Optional[datetime] = None
+
+
+class DocumentListResponse(BaseModel):
+    items: List[DocumentSummary] = Field(default_factory=list)
+    nextCursor: Optional[str] = None
+
+
+class SearchHit(BaseModel):
+    page: int
+    snippet: str
+    score: float
+
+
+class SearchResult(BaseModel):
+    documentId: str
+    filename: Optional[str] = None
+    docType: Optional[str] = None
+    score: float
+    hits: List[SearchHit] = Field(default_factory=list)
+
+
+class SearchResponse(BaseModel):
+    query: str
+    backend: str
+    results: List[SearchResult] = Field(default_factory=list)
+
+
 class EntityResponse(BaseModel):
     id: str
     type: str
@@ -27,6 +71,24 @@ class EntityResponse(BaseModel):
     page: Optional[int] = None
 
 
+class LinkedDocument(BaseModel):
+    documentId: str
+    filename: str
+    docType: Optional[str] = None
+    status: Optional[str] = None
+    createdAt: datetime
+    value: str
+    confidence: float
+
+
+class EntityLookupResponse(BaseModel):
+    type: str
+    value: str
+    normalizedValue: str
+    checkDigitValid: Optional[bool] = None
+    documents: List[LinkedDocument] = Field(default_factory=list)
+
+
 class KeywordResponse(BaseModel):
     keyword: str
     score: float
@@ -57,3 +119,115 @@ class DocumentInsightsResponse(BaseModel):
     compliance: List[InsightIssue] = Field(default_factory=list)
     spellcheck: List[InsightIssue] = Field(default_factory=list)
     recommendations: List[str] = Field(default_factory=list)
+    kbVersion: Optional[str] = None
+    stale: bool = False
+
+
+class SpanTiming(BaseModel):
+    name: str
+    durationMs: float
+    parentId: Optional[str] = None
+    spanId: str
+    attributes: Dict[str, Any] = Field(default_factory=dict)
+    error: Optional[str] = None
+
+
+class DocumentTimingsResponse(BaseModel):
+    traceId: Optional[str] = None
+    totalMs: float = 0.0
+    stages: Dict[str, float] = Field(default_factory=dict)
+    spans: List[SpanTiming] = Field(default_factory=list)
+
+
+class ExtractedFieldResponse(BaseModel):
+    documentId: str
+    docType: Optional[str] = None
+    field: str
+    type: str
+    value: Union[float, date, str, None] = None
+    unit: Optional[str] = None
+    raw: Optional[str] = None
+    confidence: float = 0.0
+    kbVersion: Optional[str] = None
+
+
+class DocumentRowResponse(BaseModel):
+    source: Optional[str] = None
+    rowNumber: int
+    pallet: Optional[str] = None
+    boxes: Optional[float] = None
+    variety: Optional[str] = None
+    size: Optional[str] = None
+    category: Optional[str] = None
+    container: Optional[str] = None
+    netKg: Optional[float] = None
+    grossKg: Optional[float] = None
+    data: Dict[str, Any] = Field(default_factory=dict)
+
+
+class DocumentRowsResponse(BaseModel):
+    documentId: str
+    count: int = 0
+    totals: Dict[str, float] = Field(default_factory=dict)
+    items: List[DocumentRowResponse] = Field(default_factory=list)
+
+
+class QuantityReference(BaseModel):
+    documentId: str
+    docType: Optional[str] = None
+    source: str  # rows | field
+    value: float
+
+
+class QuantityDiscrepancy(QuantityReference):
+    metric: str
+    reference: float
+    difference: float
+    ratio: float
+    severity: str  # ok | warning | error
+
+
+class LineQuantity(BaseModel):
+    reference: float
+    value: float
+    difference: float
+
+
+class LineDiscrepancy(BaseModel):
+    key: str
+    severity: str
+    boxes: LineQuantity
+    netKg: LineQuantity
+
+
+class LineReconciliation(BaseModel):
+    referenceId: str
+    documentId: str
+    key: str  # pallet | size | variety
+    matched: int = 0
+    lines: List[LineDiscrepancy] = Field(default_factory=list)
+
+
+class ReconciledDocument(BaseModel):
+    documentId: str
+    docType: Optional[str] = None
+    filename: str
+    rows: int = 0
+    # magnitud -> {"rows": suma de filas, "field": total declarado}
+    totals: Dict[str, Dict[str, float]] = Field(default_factory=dict)
+
+
+class ShipmentReconciliationResponse(BaseModel):
+    shipmentId: str
+    status: str
+    documents: List[ReconciledDocument] = Field(default_factory=list)
+    references: Dict[str, QuantityReference] = Field(default_factory=dict)
+    discrepancies: List[QuantityDiscrepancy] = Field(default_factory=list)
+    lines: List[LineReconciliation] = Field(default_factory=list)
+
+
+class ExtractedFieldPage(BaseModel):
+    items: List[ExtractedFieldResponse] = Field(default_factory=list)
+    limit: int
+    offset: int
+    nextOffset: Optional[int] = None
@@ -0,0 +1,166 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from ..core.config import get_settings
+from ..core.metrics import register_cache
+from ..core.optional import optional_import
+
+logger = logging.getLogger(__name__)
+
+# Separa la versión del valor en la entrada compartida
+_VERSION_SEPARATOR = b"\n"
+
+
+class LRUCache:
+    """LRU en memoria con una entrada por clave y la versión con que se generó.
+
+    Una versión distinta cuenta como fallo (el valor quedó obsoleto), así que
+    no hace falta invalidar explícitamente cuando cambia lo que la compone.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, version: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] != version:
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def put(self, key: str, version: str, value: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._items[key] = (version, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class RedisCache:
+    """Caché compartida entre workers y réplicas (`redis`, opcional).
+
+    Es de mejor esfuerzo: si el servicio no responde se trata como un fallo y
+    el request sigue con la base de datos.
+    """
+
+    def __init__(self, client, prefix: str, ttl: int):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _name(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def get(self, key: str, version: str) -> Optional[bytes]:
+        try:
+            raw = self.client.get(self._name(key))
+        except Exception:
+            logger.debug("Caché compartida no disponible", exc_info=True)
+            return None
+        if not raw:
+            return None
+        stored, _, value = raw.partition(_VERSION_SEPARATOR)
+        return value if stored.decode("utf-8", "replace") == version else None
+
+    def put(self, key: str, version: str, value: bytes) -> None:
+        try:
+            self.client.set(
+                self._name(key),
+                version.encode("utf-8") + _VERSION_SEPARATOR + value,
+                ex=self.ttl if self.ttl > 0 else None,
+            )
+        except Exception:
+            logger.debug("Caché compartida no disponible", exc_info=True)
+
+    def invalidate(self, key: str) -> None:
+        try:
+            self.client.delete(self._name(key))
+        except Exception:
+            logger.debug("Caché compartida no disponible", exc_info=True)
+
+
+class ResponseCache:
+    """Respuestas ya serializadas: LRU local delante de una caché compartida opcional."""
+
+    def __init__(self, local: LRUCache, shared: Optional[RedisCache] = None):
+        self.local = local
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, version: str) -> Optional[bytes]:
+        value = self.local.get(key, version)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key, version)
+            if value is not None:
+                self.local.put(key, version, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, version: str, value: bytes) -> None:
+        self.local.put(key, version, value)
+        if self.shared is not None:
+            self.shared.put(key, version, value)
+
+    def invalidate(self, key: str) -> None:
+        self.local.invalidate(key)
+        if self.shared is not None:
+            self.shared.invalidate(key)
+
+
+def _shared_cache(url: str, prefix: str, ttl: int) -> Optional[RedisCache]:
+    if not url:
+        return None
+    redis = optional_import("redis")
+    if redis is None:
+        logger.warning("insights_cache_url configurado pero `redis` no está instalado")
+        return None
+    return RedisCache(redis.Redis.from_url(url, socket_timeout=0.2), prefix, ttl)
+
+
+_insights_cache: Optional[ResponseCache] = None
+_insights_cache_lock = threading.Lock()
+
+
+def get_insights_cache() -> ResponseCache:
+    """Caché de `GET /documents/{id}/insights`, por documento."""
+    global _insights_cache
+    if _insights_cache is None:
+        with _insights_cache_lock:
+            if _insights_cache is None:
+                settings = get_settings()
+                _insights_cache = ResponseCache(
+                    LRUCache(settings.insights_cache_entries),
+                    _shared_cache(
+                        settings.insights_cache_url,
+                        "inova:insights:",
+                        settings.insights_cache_ttl,
+                    ),
+                )
+    return _insights_cache
+
+
+register_cache(
+    "insights", lambda: (get_insights_cache().hits, get_insights_cache().misses)
+)
@@ -0,0 +1,140 @@
+import gzip
+import json
+import os
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Iterator, Optional, Tuple
+
+from ..core.metrics import counter
+
+try:  # zstd comprime mejor y más rápido que gzip si está instalado
+    import zstandard
+except ImportError:  # pragma: no cover - dependencia opcional
+    zstandard = None
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+CHUNK_SIZE = 1024 * 1024
+# Por debajo de este tamaño el encabezado del formato no compensa
+MIN_COMPRESS_BYTES = 1024
+
+BYTES_IN = counter(
+    "inova_compression_bytes_in_total",
+    "Bytes antes de comprimir, por tipo de dato.",
+    ("kind",),
+)
+BYTES_OUT = counter(
+    "inova_compression_bytes_out_total",
+    "Bytes guardados tras comprimir, por tipo de dato; ahorro = in - out.",
+    ("kind",),
+)
+
+
+def codec_name() -> str:
+    return "zstd" if zstandard is not None else "gzip"
+
+
+def file_suffix() -> str:
+    return ".zst" if zstandard is not None else ".gz"
+
+
+def compress_bytes(data: bytes, kind: str = "payload") -> bytes:
+    if zstandard is not None:
+        packed = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    else:
+        packed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    BYTES_IN.inc(len(data), kind=kind)
+    BYTES_OUT.inc(len(packed), kind=kind)
+    return packed
+
+
+def decompress_bytes(data: bytes) -> bytes:
+    """Detecta el formato por sus bytes mágicos; datos sin comprimir pasan igual."""
+    if data[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError("Dato comprimido con zstd pero `zstandard` no está instalado")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    if data[:2] == GZIP_MAGIC:
+        return gzip.decompress(data)
+    return data
+
+
+def pack_text(text: Optional[str], kind: str = "payload") -> Tuple[Optional[str], Optional[bytes]]:
+    """Devuelve `(texto, blob)` para columnas texto/blob: solo uno viene poblado."""
+    if text is None:
+        return None, None
+    raw = text.encode("utf-8")
+    if len(raw) < MIN_COMPRESS_BYTES:
+        return text, None
+    packed = compress_bytes(raw, kind=kind)
+    if len(packed) >= len(raw):
+        return text, None
+    return None, packed
+
+
+def unpack_text(text: Optional[str], blob: Optional[bytes]) -> Optional[str]:
+    if blob:
+        return decompress_bytes(blob).decode("utf-8")
+    return text
+
+
+def pack_json(payload: Any, kind: str = "payload") -> Tuple[Optional[str], Optional[bytes]]:
+    return pack_text(json.dumps(payload), kind=kind)
+
+
+def unpack_json(text: Optional[str], blob: Optional[bytes]) -> Any:
+    """JSON de un par texto/blob; `{}` si está vacío o corrupto."""
+    try:
+        raw = unpack_text(text, blob)
+        return json.loads(raw) if raw else {}
+    except (ValueError, OSError, RuntimeError):
+        return {}
+
+
+# --- Archivos ---------------------------------------------------------------
+
+
+def is_compressed_path(path: os.PathLike) -> bool:
+    return str(path).endswith((".zst", ".gz"))
+
+
+def compressed_writer(destination: BinaryIO) -> BinaryIO:
+    """Envuelve `destination` (abierto en binario) con el códec disponible.
+
+    Al cerrar el writer se cierra el flujo comprimido pero no `destination`.
+    """
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(
+            destination, closefd=False
+        )
+    return gzip.GzipFile(fileobj=destination, mode="wb", compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(source: BinaryIO, destination: BinaryIO, kind: str = "file") -> Tuple[int, int]:
+    """Comprime `source` en `destination` por bloques; devuelve `(bytes_in, bytes_out)`."""
+    start = destination.tell()
+    size = 0
+    with compressed_writer(destination) as writer:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+            size += len(chunk)
+            writer.write(chunk)
+    written = destination.tell() - start
+    BYTES_IN.inc(size, kind=kind)
+    BYTES_OUT.inc(written, kind=kind)
+    return size, written
+
+
+@contextmanager
+def decompressed_reader(raw: BinaryIO, name: str) -> Iterator[BinaryIO]:
+    """Envuelve un flujo binario ya abierto según la extensión de `name`."""
+    if str(name).endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("Archivo zstd pero `zstandard` no está instalado")
+        with zstandard.ZstdDecompressor().stream_reader(raw, closefd=False) as reader:
+            yield reader
+    elif str(name).endswith(".gz"):
+        with gzip.GzipFile(fileobj=raw, mode="rb") as reader:
+            yield reader
+    else:
+        yield raw
@@ -0,0 +1,146 @@
+import re
+import string
+from typing import Dict, Optional
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from ..models.document import Entity
+
+# Tipos que identifican un embarque y sirven para cruzar documentos
+LOOKUP_TYPES = ("container", "bl_number", "booking_number", "dus_number")
+TYPE_ALIASES = {
+    "bl": "bl_number",
+    "booking": "booking_number",
+    "dus": "dus_number",
+    "contenedor": "container",
+}
+
+_NON_ALNUM_RE = re.compile(r"[^0-9A-Z]")
+CONTAINER_RE = re.compile(r"^[A-Z]{3}[UJZ]\d{7}$")
+CONTAINER_PREFIX_RE = re.compile(r"^[A-Z]{3}[UJZ]")
+# Letras que el OCR lee en lugar de dígitos en el número de serie
+_OCR_DIGITS = str.maketrans("OQDILZSBG", "000112586")
+
+# ISO 6346: las letras valen 10..38 saltando múltiplos de 11
+_LETTER_VALUES: Dict[str, int] = {}
+_value = 10
+for _letter in string.ascii_uppercase:
+    if _value % 11 == 0:
+        _value += 1
+    _LETTER_VALUES[_letter] = _value
+    _value += 1
+
+
+def canonical_type(entity_type: str) -> str:
+    value = (entity_type or "").strip().lower()
+    return TYPE_ALIASES.get(value, value)
+
+
+def normalize_entity_value(entity_type: str, value: str) -> str:
+    """Clave de búsqueda: mayúsculas sin espacios ni puntuación, más reglas por tipo.
+
+    "mscu 123456-7", "MSCU1234567" y "MSCU-123456/7" quedan iguales. Un
+    contenedor sin dígito verificador ("MSCU123456") lo recibe calculado, y uno
+    cuyo número trae letras que el OCR confunde con dígitos ("MSCU12345O7") se
+    corrige solo si así el dígito verificador calza. En un DUS se descartan los
+    ceros a la izquierda ("012497436-4" y "12497436-4" son el mismo).
+    """
+    key = _NON_ALNUM_RE.sub("", (value or "").upper())
+    entity_type = canonical_type(entity_type)
+    if entity_type == "container":
+        return _container_key(key)
+    if entity_type == "dus_number":
+        return key.lstrip("0") or key
+    return key
+
+
+def _container_key(code: str) -> str:
+    if not CONTAINER_PREFIX_RE.match(code):
+        return code
+    if len(code) == 10 and code[4:].isdigit():
+        return code + str(container_check_digit(code))
+    if len(code) != 11 or is_valid_container(code):
+        return code
+    fixed = code[:4] + code[4:].translate(_OCR_DIGITS)
+    return fixed if is_valid_container(fixed) else code
+
+
+def container_check_digit(code: str) -> Optional[int]:
+    """Dígito verificador ISO 6346 de los 10 primeros caracteres del contenedor."""
+    code = _NON_ALNUM_RE.sub("", (code or "").upper())
+    if len(code) < 10 or not code[:4].isalpha() or not code[4:10].isdigit():
+        return None
+    total = sum(
+        (_LETTER_VALUES[char] if char.isalpha() else int(char)) * 2**position
+        for position, char in enumerate(code[:10])
+    )
+    return total % 11 % 10
+
+
+def is_valid_container(code: str) -> bool:
+    code = _NON_ALNUM_RE.sub("", (code or "").upper())
+    if not CONTAINER_RE.match(code):
+        return False
+    return container_check_digit(code) == int(code[10])
+
+
+def backfill_normalized_values(db: Session, batch_size: int = 1000) -> int:
+    """Completa `normalized_value` de entidades guardadas antes de existir la columna."""
+    updated = 0
+    while True:
+        rows = (
+            db.execute(
+                select(Entity).where(Entity.normalized_value.is_(None)).limit(batch_size)
+            )
+            .scalars()
+            .all()
+        )
+        if not rows:
+            return updated
+        for entity in rows:
+            entity.normalized_value = normalize_entity_value(entity.type, entity.value)
+        db.commit()
+        updated += len(rows)
+
+
+def renormalize_values(db: Session, batch_size: int = 1000) -> int:
+    """Recalcula la clave de contenedores y DUS guardados con reglas anteriores.
+
+    Solo revisa las que las reglas por tipo pueden cambiar: contenedores sin
+    dígito verificador o con letras en el número, y DUS con ceros a la izquierda.
+    """
+    key = Entity.normalized_value
+    serial = func.substr(key, 5)
+    candidates = or_(
+        and_(
+            Entity.type == "container",
+            or_(
+                func.length(key) == 10,
+                *(serial.contains(letter) for letter in "OQDILZSBG"),
+            ),
+        ),
+        and_(Entity.type == "dus_number", key.startswith("0")),
+    )
+    updated = 0
+    last_id = ""
+    while True:
+        rows = (
+            db.execute(
+                select(Entity)
+                .where(candidates, Entity.id > last_id)
+                .order_by(Entity.id)
+                .limit(batch_size)
+            )
+            .scalars()
+            .all()
+        )
+        if not rows:
+            return updated
+        for entity in rows:
+            normalized = normalize_entity_value(entity.type, entity.value)
+            if normalized != entity.normalized_value:
+                entity.normalized_value = normalized
+                updated += 1
+        last_id = rows[-1].id
+        db.commit()
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from ..core.metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+# Etapas que cierran el stream de un documento
+TERMINAL_STAGES = ("done", "failed")
+# Eventos recientes por documento que se re-envían a quien se suscribe tarde
+HISTORY_PER_DOCUMENT = 64
+# Documentos con historial retenido en memoria (los más viejos se descartan)
+MAX_DOCUMENTS = 1000
+SUBSCRIBER_QUEUE_SIZE = 256
+
+EVENTS_PUBLISHED = counter(
+    "inova_processing_events_total",
+    "Eventos de progreso publicados por el pipeline, por etapa.",
+    ("stage",),
+)
+SUBSCRIBERS = gauge(
+    "inova_event_subscribers",
+    "Clientes conectados a los streams de progreso (SSE/WebSocket).",
+)
+
+
+class _Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    def deliver(self, event: Dict[str, Any]) -> None:
+        # Un cliente lento pierde eventos intermedios, pero nunca frena el pipeline
+        if self.queue.full():
+            return
+        self.queue.put_nowait(event)
+
+
+class EventBroker:
+    """Pub/sub en memoria entre el pipeline (threads) y los streams (event loop).
+
+    Los canales son `doc:<id>` y `shipment:<id>`. `publish` se llama desde
+    cualquier thread; la entrega se agenda con `call_soon_threadsafe` en el
+    loop de cada suscriptor.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[_Subscription]] = {}
+        self._history: "OrderedDict[str, Deque[Dict[str, Any]]]" = OrderedDict()
+        self._sequence = 0
+
+    def publish(
+        self, doc_id: str, stage: str, shipment_id: Optional[str] = None, **data
+    ) -> Dict[str, Any]:
+        with self._lock:
+            self._sequence += 1
+            event = {
+                "id": self._sequence,
+                "documentId": doc_id,
+                "shipmentId": shipment_id,
+                "stage": stage,
+                "timestamp": time.time(),
+                "data": data,
+            }
+            history = self._history.pop(doc_id, None)
+            if history is None or stage == "queued":
+                history = deque(maxlen=HISTORY_PER_DOCUMENT)
+            history.append(event)
+            self._history[doc_id] = history
+            while len(self._history) > MAX_DOCUMENTS:
+                self._history.popitem(last=False)
+            targets = list(self._subscribers.get(f"doc:{doc_id}", ()))
+            if shipment_id:
+                targets += self._subscribers.get(f"shipment:{shipment_id}", ())
+        EVENTS_PUBLISHED.inc(stage=stage)
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # El loop del suscriptor ya se cerró
+                continue
+        return event
+
+    def history(self, doc_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._history.get(doc_id, ()))
+
+    def subscribe(self, channel: str) -> _Subscription:
+        subscription = _Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        SUBSCRIBERS.inc()
+        return subscription
+
+    def unsubscribe(self, channel: str, subscription: _Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[channel]
+        SUBSCRIBERS.dec()
+
+
+broker = EventBroker()
+
+
+def publish(doc_id: str, stage: str, shipment_id: Optional[str] = None, **data) -> None:
+    """Atajo para el pipeline; un fallo al notificar nunca corta el procesamiento."""
+    try:
+        broker.publish(doc_id, stage, shipment_id=shipment_id, **data)
+    except Exception:  # pragma: no cover - defensivo
+        logger.exception("No se pudo publicar el evento %s del documento %s", stage, doc_id)
+
+
+def is_terminal(event: Dict[str, Any]) -> bool:
+    return event.get("stage") in TERMINAL_STAGES
+
+
+def status_event(doc_id: str, status: str, shipment_id: Optional[str] = None) -> Dict[str, Any]:
+    """Evento sintético con el estado persistido, para documentos sin historial en memoria."""
+    return {
+        "id": 0,
+        "documentId": doc_id,
+        "shipmentId": shipment_id,
+        "stage": status,
+        "timestamp": time.time(),
+        "data": {"replayed": True},
+    }
@@ -0,0 +1,421 @@
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session
+
+from ..core.config import get_settings
+from ..core.metrics import counter
+from ..core.optional import optional_import
+from ..models.document import (
+    Document,
+    DocumentPage,
+    DocumentRow,
+    Entity,
+    ExtractedField,
+    ProcessingLog,
+)
+from .compression import unpack_json
+
+logger = logging.getLogger(__name__)
+
+EXPORTED_DOCUMENTS = counter(
+    "inova_export_documents_total",
+    "Documentos escritos al export analítico en Parquet.",
+)
+
+BATCH_SIZE = 500
+STATE_FILE = "_export_state.json"
+# Estados finales: lo que sigue en cola se exporta cuando termine (updated_at cambia)
+EXPORT_STATUSES = ("done", "failed")
+# Valor de partición para doc_type vacío, el mismo que usan Hive/Spark
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+PARQUET_COMPRESSION = "zstd"
+TABLES = ("documents", "entities", "fields", "rows", "insights")
+INSIGHT_KINDS = ("compliance", "spellcheck", "recommendations")
+
+
+class ExportUnavailable(RuntimeError):
+    """Falta pyarrow para escribir Parquet."""
+
+
+def _pyarrow():
+    pa = optional_import("pyarrow")
+    pq = optional_import("pyarrow.parquet")
+    if pa is None or pq is None:
+        raise ExportUnavailable("pyarrow no está instalado")
+    return pa, pq
+
+
+def season_of(moment: Optional[datetime], start_month: Optional[int] = None) -> str:
+    """Temporada exportadora ("2024-2025"): empieza en `export_season_start_month`."""
+    if moment is None:
+        return NULL_PARTITION
+    start_month = start_month or get_settings().export_season_start_month
+    first = moment.year if moment.month >= start_month else moment.year - 1
+    return f"{first}-{first + 1}"
+
+
+def _partition_value(value: Optional[str]) -> str:
+    if not value:
+        return NULL_PARTITION
+    return re.sub(r"[^\w.-]", "_", value)
+
+
+def _schemas(pa) -> Dict[str, Any]:
+    """Columnas de cada tabla; `season` y `doc_type` van en la ruta (particiones Hive)."""
+    timestamp = pa.timestamp("us")
+    return {
+        "documents": pa.schema(
+            [
+                ("document_id", pa.string()),
+                ("filename", pa.string()),
+                ("mime", pa.string()),
+                ("size", pa.int64()),
+                ("language", pa.string()),
+                ("status", pa.string()),
+                ("shipment_id", pa.string()),
+                ("pages", pa.int32()),
+                ("created_at", timestamp),
+                ("updated_at", timestamp),
+            ]
+        ),
+        "entities": pa.schema(
+            [
+                ("document_id", pa.string()),
+                ("type", pa.string()),
+                ("value", pa.string()),
+                ("normalized_value", pa.string()),
+                ("confidence", pa.float64()),
+                ("page", pa.int32()),
+            ]
+        ),
+        "fields": pa.schema(
+            [
+                ("document_id", pa.string()),
+                ("field", pa.string()),
+                ("value_type", pa.string()),
+                ("value_text", pa.string()),
+                ("value_number", pa.float64()),
+                ("value_date", pa.date32()),
+                ("value_code", pa.string()),
+                ("unit", pa.string()),
+                ("confidence", pa.float64()),
+                ("kb_version", pa.string()),
+            ]
+        ),
+        "rows": pa.schema(
+            [
+                ("document_id", pa.string()),
+                ("source", pa.string()),
+                ("row_number", pa.int32()),
+                ("pallet", pa.string()),
+                ("boxes", pa.float64()),
+                ("variety", pa.string()),
+                ("size", pa.string()),
+                ("category", pa.string()),
+                ("container", pa.string()),
+                ("net_kg", pa.float64()),
+                ("gross_kg", pa.float64()),
+            ]
+        ),
+        "insights": pa.schema(
+            [
+                ("document_id", pa.string()),
+                ("kind", pa.string()),  # compliance | spellcheck | recommendations
+                ("severity", pa.string()),
+                ("title", pa.string()),
+                ("field", pa.string()),
+                ("detail", pa.string()),
+                ("kb_version", pa.string()),
+            ]
+        ),
+    }
+
+
+def _insight_records(doc_id: str, payload: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+    kb_version = payload.get("kb_version")
+    for kind in INSIGHT_KINDS:
+        for item in payload.get(kind) or []:
+            if not isinstance(item, dict):
+                # Las recomendaciones son texto plano
+                item = {"title": str(item)}
+            yield {
+                "document_id": doc_id,
+                "kind": kind,
+                "severity": item.get("severity"),
+                "title": item.get("title"),
+                "field": item.get("field"),
+                "detail": item.get("detail"),
+                "kb_version": kb_version,
+            }
+
+
+def _batch_records(db: Session, docs: Sequence[Document]) -> Dict[str, List[Dict[str, Any]]]:
+    """Filas de cada tabla para un lote de documentos (una consulta por tabla)."""
+    ids = [doc.id for doc in docs]
+    records: Dict[str, List[Dict[str, Any]]] = {name: [] for name in TABLES}
+    for entity in db.execute(select(Entity).where(Entity.document_id.in_(ids))).scalars():
+        records["entities"].append(
+            {
+                "document_id": entity.document_id,
+                "type": entity.type,
+                "value": entity.value,
+                "normalized_value": entity.normalized_value,
+                "confidence": entity.confidence,
+                "page": entity.page,
+            }
+        )
+    for field in db.execute(
+        select(ExtractedField).where(ExtractedField.document_id.in_(ids))
+    ).scalars():
+        records["fields"].append(
+            {
+                "document_id": field.document_id,
+                "field": field.field,
+                "value_type": field.value_type,
+                "value_text": field.value_text,
+                "value_number": field.value_number,
+                "value_date": field.value_date,
+                "value_code": field.value_code,
+                "unit": field.unit,
+                "confidence": field.confidence,
+                "kb_version": field.kb_version,
+            }
+        )
+    for row in db.execute(
+        select(DocumentRow)
+        .where(DocumentRow.document_id.in_(ids))
+        .order_by(DocumentRow.document_id, DocumentRow.row_number)
+    ).scalars():
+        records["rows"].append(
+            {
+                "document_id": row.document_id,
+                "source": row.source,
+                "row_number": row.row_number,
+                "pallet": row.pallet,
+                "boxes": row.boxes,
+                "variety": row.variety,
+                "size": row.size,
+                "category": row.category,
+                "container": row.container,
+                "net_kg": row.net_kg,
+                "gross_kg": row.gross_kg,
+            }
+        )
+    pages = dict(
+        db.execute(
+            select(DocumentPage.document_id, func.count(DocumentPage.id))
+            .where(DocumentPage.document_id.in_(ids))
+            .group_by(DocumentPage.document_id)
+        ).all()
+    )
+    # Último resultado de insights por documento
+    latest: Dict[str, ProcessingLog] = {}
+    for log in db.execute(
+        select(ProcessingLog)
+        .where(ProcessingLog.document_id.in_(ids), ProcessingLog.step == "insights")
+        .order_by(ProcessingLog.created_at)
+    ).scalars():
+        latest[log.document_id] = log
+    for doc in docs:
+        insights = latest.get(doc.id)
+        if insights is not None:
+            payload = unpack_json(insights.payload, insights.payload_blob)
+            if isinstance(payload, dict):
+                records["insights"].extend(_insight_records(doc.id, payload))
+        records["documents"].append(
+            {
+                "document_id": doc.id,
+                "filename": doc.filename,
+                "mime": doc.mime,
+                "size": doc.size,
+                "language": doc.language_detected,
+                "status": doc.status,
+                "shipment_id": doc.shipment_id,
+                "pages": pages.get(doc.id, 0),
+                "created_at": doc.created_at,
+                "updated_at": doc.updated_at,
+            }
+        )
+    return records
+
+
+class _PartitionWriters:
+    """Un `ParquetWriter` abierto por (tabla, temporada, doc_type) durante la corrida.
+
+    Cada lote se agrega como un row group, así la memoria queda acotada al
+    lote en curso y la corrida deja un archivo por partición en vez de uno por
+    lote.
+    """
+
+    def __init__(self, pa, pq, root: Path, run_id: str):
+        self.pa = pa
+        self.pq = pq
+        self.root = root
+        self.run_id = run_id
+        self.schemas = _schemas(pa)
+        self.writers: Dict[Tuple[str, str, str], Any] = {}
+        self.paths: List[Path] = []
+
+    def write(self, table: str, season: str, doc_type: str, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        key = (table, season, doc_type)
+        writer = self.writers.get(key)
+        if writer is None:
+            directory = self.root / table / f"season={season}" / f"doc_type={doc_type}"
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"part-{self.run_id}.parquet"
+            writer = self.pq.ParquetWriter(
+                str(path), self.schemas[table], compression=PARQUET_COMPRESSION
+            )
+            self.writers[key] = writer
+            self.paths.append(path)
+        writer.write_batch(self.pa.RecordBatch.from_pylist(rows, schema=self.schemas[table]))
+
+    def close(self) -> None:
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
+
+
+def _load_state(root: Path) -> Dict[str, Any]:
+    try:
+        return json.loads((root / STATE_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(root: Path, state: Dict[str, Any]) -> None:
+    tmp = root / f"{STATE_FILE}.tmp"
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, root / STATE_FILE)
+
+
+def _prune(pq, root: Path, seasons: Set[str], doc_ids: Set[str], keep: Set[Path]) -> int:
+    """Quita de los archivos de corridas anteriores las filas de documentos reexportados.
+
+    Solo se leen los `document_id` de cada archivo de las temporadas tocadas;
+    los que contienen alguno se reescriben filtrados (o se borran si quedan vacíos).
+    """
+    rewritten = 0
+    for table in TABLES:
+        for season in seasons:
+            directory = root / table / f"season={season}"
+            if not directory.exists():
+                continue
+            for path in directory.glob("doc_type=*/part-*.parquet"):
+                if path in keep:
+                    continue
+                ids = pq.read_table(str(path), columns=["document_id"]).column(0)
+                stale = [value in doc_ids for value in ids.to_pylist()]
+                if not any(stale):
+                    continue
+                if all(stale):
+                    path.unlink()
+                else:
+                    table_data = pq.read_table(str(path))
+                    mask = [not flag for flag in stale]
+                    tmp = path.with_suffix(".tmp")
+                    pq.write_table(
+                        table_data.filter(mask), str(tmp), compression=PARQUET_COMPRESSION
+                    )
+                    os.replace(tmp, path)
+                rewritten += 1
+    return rewritten
+
+
+def export_parquet(
+    db: Session,
+    output_dir: Optional[str] = None,
+    batch_size: int = BATCH_SIZE,
+    full: bool = False,
+    pause: float = 0.0,
+) -> Dict[str, Any]:
+    """Exporta a Parquet los documentos nuevos o modificados desde la última corrida.
+
+    Recorre `documents` por (`updated_at`, `id`) en lotes de `batch_size` y
+    escribe cada tabla particionada por temporada y tipo documental
+    (`<tabla>/season=2024-2025/doc_type=packing_list/part-<corrida>.parquet`).
+    La marca de agua queda en `_export_state.json`; un documento reprocesado
+    se vuelve a exportar y sus filas anteriores se eliminan de los archivos
+    previos. `pause` espera entre lotes para no cargar la base de producción.
+    """
+    pa, pq = _pyarrow()
+    root = Path(output_dir or get_settings().export_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    state = {} if full else _load_state(root)
+    watermark = state.get("watermark")
+    cursor: Optional[Tuple[datetime, str]] = (
+        (datetime.fromisoformat(watermark["updated_at"]), watermark["id"]) if watermark else None
+    )
+
+    run_id = f"{datetime.utcnow():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+    writers = _PartitionWriters(pa, pq, root, run_id)
+    exported_ids: Set[str] = set()
+    seasons: Set[str] = set()
+    counts = {name: 0 for name in TABLES}
+    try:
+        while True:
+            query = select(Document).where(Document.status.in_(EXPORT_STATUSES))
+            if cursor is not None:
+                query = query.where(tuple_(Document.updated_at, Document.id) > cursor)
+            docs = (
+                db.execute(query.order_by(Document.updated_at, Document.id).limit(batch_size))
+                .scalars()
+                .all()
+            )
+            if not docs:
+                break
+            partition = {
+                doc.id: (season_of(doc.created_at), _partition_value(doc.doc_type))
+                for doc in docs
+            }
+            for table, rows in _batch_records(db, docs).items():
+                grouped: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+                for row in rows:
+                    grouped.setdefault(partition[row["document_id"]], []).append(row)
+                for (season, doc_type), items in grouped.items():
+                    writers.write(table, season, doc_type, items)
+                counts[table] += len(rows)
+            exported_ids.update(partition)
+            seasons.update(season for season, _ in partition.values())
+            cursor = (docs[-1].updated_at, docs[-1].id)
+            # Liberar los objetos del lote antes de pedir el siguiente
+            db.expunge_all()
+            if pause:
+                time.sleep(pause)
+    finally:
+        writers.close()
+
+    pruned = _prune(pq, root, seasons, exported_ids, set(writers.paths)) if exported_ids else 0
+    if cursor is not None:
+        state["watermark"] = {"updated_at": cursor[0].isoformat(), "id": cursor[1]}
+    state["last_run"] = {
+        "run_id": run_id,
+        "finished_at": datetime.utcnow().isoformat(),
+        "documents": len(exported_ids),
+        "rows": counts,
+        "files_pruned": pruned,
+    }
+    _save_state(root, state)
+    if exported_ids:
+        EXPORTED_DOCUMENTS.inc(len(exported_ids))
+        logger.info("Export Parquet %s: %s documentos -> %s", run_id, len(exported_ids), root)
+    return {
+        "output": str(root),
+        "run_id": run_id,
+        "documents": len(exported_ids),
+        "rows": counts,
+        "files": [str(path.relative_to(root)) for path in writers.paths],
+        "files_pruned": pruned,
+        "watermark": state.get("watermark"),
+    }
@@ -0,0 +1,450 @@
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .knowledge import HintMatcher, KnowledgeBase, get_knowledge_base
+from .layout import Line
+
+# Separadores habituales entre etiqueta y valor: "Peso Bruto: 20.000", "N° 123"
+_LABEL_SEPARATOR = r"[ \t]*(?:[:#=]|n[°º]\.?|no\.)?[ \t]*"
+_MAX_VALUE_CHARS = 80
+# Ocurrencias de una etiqueta que se prueban antes de rendirse con el campo
+_MAX_OCCURRENCES = 8
+# Vecindad etiqueta -> valor en el layout (coordenadas de página 0-1)
+_ROW_OVERLAP = 0.5  # fracción del alto compartida para estar en el mismo renglón
+_MAX_RIGHT_GAP = 0.2  # separación horizontal máxima, en anchos de página
+_MAX_BELOW_GAP = 2.5  # separación vertical máxima, en altos del renglón de la etiqueta
+_VALUE_RE = re.compile(
+    _LABEL_SEPARATOR
+    + rf"([^\n]{{0,{_MAX_VALUE_CHARS}}})(?:\n[ \t]*([^\n]{{0,{_MAX_VALUE_CHARS}}}))?",
+    re.IGNORECASE,
+)
+
+# Con separador de miles los grupos son de tres dígitos; un espacio solo agrupa
+# así, de modo que "1540 2" son dos números y no 15402
+NUMBER_RE = re.compile(
+    r"[-+]?(?:\d{1,3}(?:[.,' ]\d{3})+(?:[.,]\d+)?(?!\d)|\d+(?:[.,]\d+)?)"
+)
+WEIGHT_UNITS = {
+    "kg": 1.0,
+    "kgs": 1.0,
+    "kilos": 1.0,
+    "kilogramos": 1.0,
+    "kgm": 1.0,
+    "lb": 0.45359237,
+    "lbs": 0.45359237,
+    "ton": 1000.0,
+    "tons": 1000.0,
+    "tm": 1000.0,
+    "mt": 1000.0,
+}
+WEIGHT_RE = re.compile(
+    r"(?P<number>\d[\d.,]*)\s*(?P<unit>"
+    + "|".join(sorted(WEIGHT_UNITS, key=len, reverse=True))
+    + r")\b",
+    re.IGNORECASE,
+)
+DATE_PATTERNS = (
+    (re.compile(r"\b(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})\b"), ("y", "m", "d")),
+    (re.compile(r"\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})\b"), ("d", "m", "y")),
+    (re.compile(r"\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{2})\b"), ("d", "m", "yy")),
+)
+CONTAINER_RE = re.compile(r"\b([A-Z]{4})\s?(\d{6})\s?-?\s?(\d)\b", re.IGNORECASE)
+DUS_RE = re.compile(r"\b(\d{7,9}-[\dkK])\b")
+HS_RE = re.compile(r"\b(\d{4}(?:[.\s]?\d{2}){1,3})\b")
+INCOTERM_RE = re.compile(
+    r"\b(EXW|FCA|FAS|FOB|CFR|CIF|CPT|CIP|DAP|DPU|DDP|DAT)\b", re.IGNORECASE
+)
+CURRENCIES = ("USD", "EUR", "CLP", "CNY", "RMB", "GBP", "JPY", "MXN", "BRL", "PEN", "ARS", "COP")
+CURRENCY_RE = re.compile(r"\b(" + "|".join(CURRENCIES) + r")\b", re.IGNORECASE)
+# Lo único que puede ir entre la etiqueta y un valor numérico: moneda o unidad,
+# "Valor total: USD 12.345", "Peso neto (kg): 19.080"
+_NUMBER_PREFIX_RE = re.compile(
+    r"(?:\(?(?:"
+    + "|".join(
+        re.escape(token)
+        for token in sorted({*CURRENCIES, *WEIGHT_UNITS, "US$", "$", "€"}, key=len, reverse=True)
+    )
+    + r")\)?[ \t]*[:#=]?[ \t]*)?",
+    re.IGNORECASE,
+)
+CODE_RE = re.compile(r"[A-Z0-9][A-Z0-9\-/.]{1,30}", re.IGNORECASE)
+
+
+def parse_number(raw: str) -> Optional[float]:
+    """Convierte '20.000', '1,234.56', '1.234,56' o '24000' en float.
+
+    Con ambos separadores el último es el decimal. Con uno solo se interpreta
+    como separador de miles (formato chileno y anglosajón) cuando lo siguen
+    exactamente tres dígitos y el grupo inicial tiene de uno a tres sin cero a
+    la izquierda; en otro caso, como decimal ('22132.800' son 22132,8).
+    """
+    match = NUMBER_RE.search(raw or "")
+    if not match:
+        return None
+    token = match.group(0).replace(" ", "").replace("'", "")
+    last_dot, last_comma = token.rfind("."), token.rfind(",")
+    if last_dot >= 0 and last_comma >= 0:
+        decimal = "." if last_dot > last_comma else ","
+        thousands = "," if decimal == "." else "."
+        token = token.replace(thousands, "").replace(decimal, ".")
+    elif last_dot >= 0 or last_comma >= 0:
+        sep = "." if last_dot >= 0 else ","
+        groups = token.lstrip("+-").split(sep)
+        if len(groups) > 2 or (
+            len(groups[1]) == 3 and len(groups[0]) <= 3 and not groups[0].startswith("0")
+        ):
+            token = token.replace(sep, "")
+        else:
+            token = token.replace(sep, ".")
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+
+def parse_weight(raw: str) -> Optional[Tuple[float, str]]:
+    """Peso normalizado a kg; sin unidad explícita se asume kg."""
+    match = WEIGHT_RE.search(raw or "")
+    if match:
+        number = parse_number(match.group("number"))
+        if number is None:
+            return None
+        return number * WEIGHT_UNITS[match.group("unit").lower()], "kg"
+    number = parse_number(raw)
+    return (number, "kg") if number is not None else None
+
+
+def parse_date(raw: str) -> Optional[str]:
+    for pattern, order in DATE_PATTERNS:
+        match = pattern.search(raw or "")
+        if not match:
+            continue
+        parts = dict(zip(order, (int(g) for g in match.groups())))
+        year = parts.get("y") or (2000 + parts["yy"])
+        try:
+            return date(year, parts["m"], parts["d"]).isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def _first_group(pattern: re.Pattern, raw: str) -> Optional[str]:
+    match = pattern.search(raw or "")
+    return match.group(1) if match else None
+
+
+def _upper_group(pattern: re.Pattern, raw: str) -> Optional[str]:
+    value = _first_group(pattern, raw)
+    return value.upper() if value else None
+
+
+def parse_container(raw: str) -> Optional[str]:
+    match = CONTAINER_RE.search(raw or "")
+    return "".join(match.groups()).upper() if match else None
+
+
+def parse_hs_code(raw: str) -> Optional[str]:
+    value = _first_group(HS_RE, raw)
+    return re.sub(r"\D", "", value) if value else None
+
+
+def parse_code(raw: str) -> Optional[str]:
+    match = CODE_RE.search((raw or "").strip())
+    return match.group(0).strip(".-/").upper() if match else None
+
+
+def parse_string(raw: str) -> Optional[str]:
+    # El valor termina en un separador de columnas (2+ espacios / tab)
+    value = re.split(r"\s{2,}|\t", (raw or "").strip(), maxsplit=1)[0]
+    value = value.strip(" :;,.-")
+    return value or None
+
+
+# kind, parser -> (valor, unidad) | valor
+Parser = Callable[[str], Any]
+
+FIELD_PARSERS: Dict[str, Tuple[str, Parser]] = {
+    "peso_neto": ("weight", parse_weight),
+    "peso_bruto": ("weight", parse_weight),
+    "peso_total": ("weight", parse_weight),
+    "hs_code": ("code", parse_hs_code),
+    "numero_contenedor": ("code", parse_container),
+    "numero_dus": ("code", lambda raw: _upper_group(DUS_RE, raw)),
+    "incoterm": ("code", lambda raw: _upper_group(INCOTERM_RE, raw)),
+    "moneda": ("code", lambda raw: _upper_group(CURRENCY_RE, raw)),
+    "codigo_csg": ("code", parse_code),
+    "codigo_csp": ("code", parse_code),
+    "numero_factura": ("code", parse_code),
+    "numero_guia": ("code", parse_code),
+    "numero_certificado": ("code", parse_code),
+    "numero_packing_list": ("code", parse_code),
+    "sello": ("code", parse_code),
+    "lote": ("code", parse_code),
+}
+
+TYPE_PARSERS: Dict[str, Tuple[str, Parser]] = {
+    "number": ("number", parse_number),
+    "string": ("string", parse_string),
+}
+
+
+def _aligned_lower(text: str) -> str:
+    """`text.lower()` con los mismos offsets que `text`."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # Caracteres como "İ" cambian de largo al pasar a minúscula
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+def _parser_for(field: Dict[str, Any]) -> Tuple[str, Parser]:
+    name = field.get("name", "")
+    if name in FIELD_PARSERS:
+        return FIELD_PARSERS[name]
+    if name.startswith("fecha"):
+        return "date", parse_date
+    return TYPE_PARSERS.get(field.get("type", "string"), TYPE_PARSERS["string"])
+
+
+class SchemaMatcher(HintMatcher):
+    """Matcher compilado de un schema: presencia + valores tipados.
+
+    Extiende las etiquetas precompiladas de la KB: por cada etiqueta presente
+    ubica sus ocurrencias con `str.find` y aplica, anclada en esa posición, una
+    expresión que captura el resto de la línea (o la siguiente si la etiqueta
+    queda sola), interpretándolo según el tipo del campo. Nunca se corre una
+    expresión regular sobre el texto completo.
+    """
+
+    def __init__(self, doc_type: str, fields: Sequence[Dict[str, Any]]):
+        self.doc_type = doc_type
+        named = [f for f in fields if f.get("name")]
+        super().__init__(f["name"] for f in named)
+        self.required = tuple(f["name"] for f in named if f.get("required"))
+        self.parsers = {f["name"]: _parser_for(f) for f in named}
+
+    def evaluate(
+        self, text: str, layout: Optional[Sequence[Sequence[Line]]] = None
+    ) -> "SchemaResult":
+        """Presencia sobre el texto; valores primero por posición si hay `layout`.
+
+        Con renglones posicionados el valor se busca en el mismo renglón de la
+        etiqueta, luego en el renglón a su derecha y luego justo debajo (tablas
+        con encabezado); lo que no se resuelva así cae al texto plano.
+        """
+        values: Dict[str, Dict[str, Any]] = {}
+        if not text:
+            return SchemaResult(self.doc_type, self.required, set(), values)
+        present = self.present(text.casefold())
+        lowered = _aligned_lower(text)
+        # Índice por página una sola vez; se recorre por cada etiqueta
+        pages = [_LayoutPage(lines) for lines in layout] if layout else None
+        for field in self._field_hints:
+            if field not in present:
+                continue
+            record = self._extract_spatial(field, pages, lowered) if pages else None
+            if record is None:
+                record = self._extract(field, text, lowered)
+            if record is not None:
+                values[field] = record
+        return SchemaResult(self.doc_type, self.required, present, values)
+
+    @staticmethod
+    def _labels(text: str, lowered: str, hint: str) -> Iterator[Tuple[int, int]]:
+        start = lowered.find(hint)
+        attempts = 0
+        while start >= 0 and attempts < _MAX_OCCURRENCES:
+            end = start + len(hint)
+            # La etiqueta debe ser palabra completa para tomar su valor
+            if not (
+                (start > 0 and text[start - 1].isalnum())
+                or (end < len(text) and text[end].isalnum())
+            ):
+                attempts += 1
+                yield start, end
+            start = lowered.find(hint, start + 1)
+
+    def _extract(self, field: str, text: str, lowered: str) -> Optional[Dict[str, Any]]:
+        for hint in self._field_hints[field]:
+            for start, end in self._labels(text, lowered, hint):
+                match = _VALUE_RE.match(text, end)
+                record = self._parse(field, match.group(1), 0.75)
+                if record is None and match.group(2):
+                    record = self._parse(field, match.group(2), 0.6)
+                if record is not None:
+                    record["offset"] = start
+                    return record
+        return None
+
+    def _extract_spatial(
+        self, field: str, pages: List["_LayoutPage"], lowered: str
+    ) -> Optional[Dict[str, Any]]:
+        for hint in self._field_hints[field]:
+            if hint not in lowered:
+                continue
+            for page, layout_page in enumerate(pages, start=1):
+                for line, line_lowered in zip(layout_page.lines, layout_page.lowered):
+                    if hint not in line_lowered:
+                        continue
+                    for start, end in self._labels(line[5], line_lowered, hint):
+                        record = self._spatial_value(field, line, layout_page, start, end)
+                        if record is not None:
+                            record["page"] = page
+                            record["offset"] = max(0, lowered.find(hint))
+                            return record
+        return None
+
+    def _spatial_value(
+        self, field: str, label: Line, page: "_LayoutPage", start: int, end: int
+    ) -> Optional[Dict[str, Any]]:
+        text = label[5]
+        record = self._parse(field, _VALUE_RE.match(text, end).group(1), 0.85)
+        if record is not None:
+            record["bbox"] = label[:4]
+            return record
+        x, y, w, h = label[:4]
+        # Caja aproximada de la etiqueta dentro de su renglón, por proporción de caracteres
+        label_x = x + w * start / max(1, len(text))
+        label_w = w * (end - start) / max(1, len(text))
+        for candidate, confidence in (
+            (page.right_of(label), 0.85),
+            (page.below((label_x, y, label_w, h)), 0.7),
+        ):
+            if candidate is None or self._is_label(candidate[5]):
+                continue
+            record = self._parse(field, candidate[5], confidence)
+            if record is not None:
+                record["bbox"] = candidate[:4]
+                return record
+        return None
+
+    def _is_label(self, text: str) -> bool:
+        # En formularios el vecino suele ser la etiqueta de otro campo, no un valor
+        lowered = _aligned_lower(text)
+        return any(
+            hint in lowered and next(self._labels(text, lowered, hint), None)
+            for hint in self._hints
+        )
+
+    def _parse(self, field: str, raw: str, confidence: float) -> Optional[Dict[str, Any]]:
+        raw = (raw or "").strip()
+        if not raw:
+            return None
+        kind, parser = self.parsers[field]
+        if kind in ("number", "weight"):
+            # El número debe seguir a la etiqueta (a lo más tras moneda o unidad),
+            # no ser cualquier cifra que aparezca más adelante en la línea
+            if NUMBER_RE.match(raw, _NUMBER_PREFIX_RE.match(raw).end()) is None:
+                return None
+        parsed = parser(raw)
+        if parsed is None:
+            return None
+        unit = None
+        if isinstance(parsed, tuple):
+            parsed, unit = parsed
+        return {
+            "field": field,
+            "type": kind,
+            "value": parsed,
+            "unit": unit,
+            "raw": raw[:_MAX_VALUE_CHARS],
+            "confidence": confidence,
+        }
+
+
+class _LayoutPage:
+    """Renglones de una página ordenados por `y`, para buscar vecinos por franja."""
+
+    def __init__(self, lines: Sequence[Line]):
+        self.lines = sorted(lines, key=lambda line: (line[1], line[0]))
+        self.lowered = [_aligned_lower(line[5]) for line in self.lines]
+        self.ys = [line[1] for line in self.lines]
+        self.max_height = max((line[3] for line in self.lines), default=0.0)
+
+    def _between(self, top: float, bottom: float) -> Iterator[Line]:
+        for index in range(bisect_left(self.ys, top), bisect_right(self.ys, bottom)):
+            yield self.lines[index]
+
+    def right_of(self, label: Line) -> Optional[Line]:
+        """Renglón más cercano a la derecha que comparte la franja vertical de `label`."""
+        x, y, w, h = label[:4]
+        best: Optional[Tuple[float, Line]] = None
+        for line in self._between(y - self.max_height, y + h):
+            if line is label:
+                continue
+            lx, ly, _, lh = line[:4]
+            if min(y + h, ly + lh) - max(y, ly) < _ROW_OVERLAP * min(h, lh):
+                continue
+            gap = lx - (x + w)
+            if -0.01 <= gap <= _MAX_RIGHT_GAP and (best is None or gap < best[0]):
+                best = (gap, line)
+        return best[1] if best else None
+
+    def below(self, box: Sequence[float]) -> Optional[Line]:
+        """Renglón más cercano debajo de `box` que se solapa con él horizontalmente."""
+        x, y, w, h = box
+        for line in self._between(y + 0.75 * h, y + h + _MAX_BELOW_GAP * h):
+            lx, _, lw, _ = line[:4]
+            # En orden de `y`: el primero que se solapa es el más cercano
+            if min(x + w, lx + lw) - max(x, lx) > 0:
+                return line
+        return None
+
+
+class SchemaResult:
+    def __init__(
+        self,
+        doc_type: str,
+        required: Tuple[str, ...],
+        present: Set[str],
+        values: Dict[str, Dict[str, Any]],
+    ):
+        self.doc_type = doc_type
+        self.required = required
+        self.present = present
+        self.values = values
+
+    @property
+    def missing(self) -> List[str]:
+        return [field for field in self.required if field not in self.present]
+
+    def records(self) -> List[Dict[str, Any]]:
+        return sorted(self.values.values(), key=lambda r: r.get("offset", 0))
+
+
+_matchers: Dict[Tuple[str, str], SchemaMatcher] = {}
+_matchers_lock = threading.Lock()
+
+
+def get_schema_matcher(
+    doc_type: str, kb: Optional[KnowledgeBase] = None
+) -> Optional[SchemaMatcher]:
+    """Matcher compilado para `doc_type`, cacheado por versión de KB."""
+    kb = kb or get_knowledge_base()
+    schema = kb.schemas.get(doc_type)
+    if not schema:
+        return None
+    key = (kb.version, doc_type)
+    matcher = _matchers.get(key)
+    if matcher is None:
+        with _matchers_lock:
+            # Descartar matchers de versiones anteriores de la KB
+            for stale in [k for k in _matchers if k[0] != kb.version]:
+                del _matchers[stale]
+            matcher = _matchers.setdefault(
+                key, SchemaMatcher(doc_type, schema.get("fields", []))
+            )
+    return matcher
+
+
+def extract_schema_fields(
+    text: str,
+    doc_type: str,
+    kb: Optional[KnowledgeBase] = None,
+    layout: Optional[Sequence[Sequence[Line]]] = None,
+) -> Optional[SchemaResult]:
+    matcher = get_schema_matcher(doc_type, kb) if doc_type else None
+    return matcher.evaluate(text, layout) if matcher else None
@@ -1,7 +1,12 @@
+import hashlib
 import json
-from functools import lru_cache
+import threading
+import time
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..core.config import get_settings
+from ..core.metrics import register_cache
 
 
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
@@ -10,6 +15,150 @@ GUIDES_DIR = PROJECT_ROOT / "guides"
 EXTRACTION_SCHEMA_FILE = "exportacion_cerezas_extraction_schema.json"
 KB_FILE = "exportacion_cerezas_kb.json"
 
+# Etiquetas con las que suelen aparecer los campos del schema en los documentos
+FIELD_HINTS: Dict[str, List[str]] = {
+    "numero_factura": [
+        "numero factura",
+        "n° factura",
+        "invoice number",
+        "factura no",
+    ],
+    "exportador": ["exportador", "exporter"],
+    "importador": ["importador", "consignee", "importer"],
+    "descripcion_mercaderia": ["descripcion", "description", "mercaderia", "goods"],
+    "variedad": ["variedad", "variety", "cultivar"],
+    "calibre": ["calibre", "caliber", "size"],
+    "cantidad_cajas": ["cantidad de cajas", "cajas", "cartons", "boxes"],
+    "peso_neto": ["peso neto", "net weight"],
+    "peso_bruto": ["peso bruto", "gross weight", "peso total"],
+    "hs_code": ["hs code", "codigo hs", "h.s."],
+    "incoterm": ["incoterm", "terms", "fob", "cif", "cfr"],
+    "valor_total": ["valor total", "total value", "amount due", "fob value"],
+    "moneda": ["usd", "eur", "currency", "moneda"],
+    "numero_contenedor": ["contenedor", "container", "cntr", "booking"],
+    "numero_pallets": ["pallets", "pallet"],
+    "numero_cajas": ["cajas", "boxes", "cartons"],
+    "codigo_csg": ["csg", "codigo csg"],
+    "codigo_csp": ["csp", "codigo csp"],
+    "lote": ["lote", "lot"],
+    "pais_destino": ["pais destino", "destination country", "destino"],
+    "criterio_origen": ["criterio de origen", "origin criterion"],
+    "valor_fob": ["valor fob", "fob value"],
+    "numero_dus": ["numero dus", "dus", "documento unico salida"],
+    "numero_guia": ["guia despacho", "numero guia", "despacho"],
+    "especie": ["especie", "species"],
+    "cantidad": ["cantidad", "quantity", "qty"],
+    "origen": ["origen", "origin"],
+    "destino": ["destino", "destination"],
+}
+
+
+def field_hints(field_name: str) -> List[str]:
+    hints = [hint.casefold() for hint in FIELD_HINTS.get(field_name, []) if hint]
+    return hints or [field_name.replace("_", " ").casefold()]
+
+
+class HintMatcher:
+    """Etiquetas precompiladas de un conjunto de campos.
+
+    Las pistas repetidas entre campos se evalúan una sola vez y se omiten las de
+    campos ya encontrados. Se usa búsqueda de subcadenas (`in`, implementada en
+    C) porque en CPython es más rápida que una alternancia de expresiones
+    regulares sobre el texto completo (ver `tools/benchmark_schema.py`).
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        hint_fields: Dict[str, Set[str]] = {}
+        self._field_hints: Dict[str, Tuple[str, ...]] = {}
+        for field in fields:
+            hints = tuple(field_hints(field))
+            self._field_hints[field] = hints
+            for hint in hints:
+                hint_fields.setdefault(hint, set()).add(field)
+        self._owners: Dict[str, Tuple[str, ...]] = {
+            hint: tuple(sorted(owners)) for hint, owners in hint_fields.items()
+        }
+        self._hints = tuple(self._owners)
+        self.fields = frozenset(self._field_hints)
+
+    def present(self, normalized_text: str) -> Set[str]:
+        """Campos cuya etiqueta aparece en `normalized_text` (ya en casefold)."""
+        found: Set[str] = set()
+        if not normalized_text:
+            return found
+        for hint in self._hints:
+            owners = self._owners[hint]
+            if found.issuperset(owners):
+                continue
+            if hint in normalized_text:
+                found.update(owners)
+                if len(found) == len(self.fields):
+                    break
+        return found
+
+
+class KnowledgeBase:
+    """Versión compilada e inmutable de las guías de `guides/`.
+
+    Se construye una vez por versión de los archivos JSON; `version` es un hash
+    de su contenido y sirve para saber si un resultado cacheado quedó obsoleto.
+    """
+
+    def __init__(
+        self,
+        schemas: Dict[str, Any],
+        document_types: Dict[str, Dict[str, Any]],
+        version: str,
+        fingerprint: Tuple = (),
+    ):
+        self.schemas = schemas
+        self.documents = document_types
+        self.version = version
+        self.fingerprint = fingerprint
+        self.labels: Dict[str, str] = {
+            key: value.get("name", key.replace("_", " ").title())
+            for key, value in document_types.items()
+        }
+        self.required_fields: Dict[str, Tuple[str, ...]] = {}
+        self.hint_matchers: Dict[str, HintMatcher] = {}
+        for doc_type, schema in schemas.items():
+            required = tuple(
+                field.get("name")
+                for field in schema.get("fields", [])
+                if field.get("required") and field.get("name")
+            )
+            self.required_fields[doc_type] = required
+            self.hint_matchers[doc_type] = HintMatcher(required)
+
+        # Índice campo -> [(doc_type, contra qué documento se cruza)]
+        self.cross_checks_by_field: Dict[str, List[Tuple[str, str]]] = {}
+        self.recommendations: Dict[str, Tuple[str, ...]] = {}
+        for doc_type, info in document_types.items():
+            recs: List[str] = []
+            for cross in info.get("cross_checks", []) or []:
+                target = cross.get("against")
+                fields = cross.get("fields") or []
+                if not target or not fields:
+                    continue
+                for field in fields:
+                    self.cross_checks_by_field.setdefault(field, []).append(
+                        (doc_type, target)
+                    )
+                label = self.labels.get(target, target.replace("_", " "))
+                recs.append(
+                    f"Verifica {', '.join(fields)} contra {label} para asegurar consistencia."
+                )
+            for error in info.get("common_errors", [])[:3]:
+                recs.append(f"Revisa: {error}.")
+            self.recommendations[doc_type] = tuple(recs)
+
+    def missing_required_fields(self, normalized_text: str, doc_type: str) -> List[str]:
+        required = self.required_fields.get(doc_type)
+        if not required:
+            return []
+        present = self.hint_matchers[doc_type].present(normalized_text)
+        return [field for field in required if field not in present]
+
 
 def _load_json_file(filename: str) -> Dict[str, Any]:
     path = GUIDES_DIR / filename
@@ -21,19 +170,85 @@ def _load_json_file(filename: str) -> Dict[str, Any]:
         return {}
 
 
-@lru_cache()
+def _fingerprint() -> Tuple:
+    parts = []
+    for filename in (EXTRACTION_SCHEMA_FILE, KB_FILE):
+        try:
+            stat = (GUIDES_DIR / filename).stat()
+            parts.append((filename, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            parts.append((filename, None, None))
+    return tuple(parts)
+
+
+def _build_knowledge_base(fingerprint: Tuple) -> KnowledgeBase:
+    schema_data = _load_json_file(EXTRACTION_SCHEMA_FILE)
+    kb_data = _load_json_file(KB_FILE)
+    digest = hashlib.sha256()
+    for data in (schema_data, kb_data):
+        digest.update(json.dumps(data, sort_keys=True).encode("utf-8"))
+
+    schemas = schema_data.get("schemas", {}) if isinstance(schema_data, dict) else {}
+    items: List[Dict[str, Any]] = (
+        kb_data.get("document_types", []) if isinstance(kb_data, dict) else []
+    )
+    documents = {item.get("id"): item for item in items if item.get("id")}
+    return KnowledgeBase(schemas, documents, digest.hexdigest()[:12], fingerprint)
+
+
+_current: Optional[KnowledgeBase] = None
+_lock = threading.Lock()
+_last_check = 0.0
+_stats = {"hits": 0, "reloads": 0}
+
+
+def get_knowledge_base() -> KnowledgeBase:
+    """KB compilada vigente; se recompila si los JSON cambiaron en disco.
+
+    La verificación de `mtime` se hace como máximo cada
+    `knowledge_reload_interval` segundos (negativo = nunca). El reemplazo es
+    atómico: quien ya tomó una referencia sigue usando la versión anterior.
+    """
+    global _current, _last_check
+    kb = _current
+    interval = get_settings().knowledge_reload_interval
+    now = time.monotonic()
+    if kb is not None and (interval < 0 or now - _last_check < interval):
+        _stats["hits"] += 1
+        return kb
+
+    fingerprint = _fingerprint()
+    _last_check = now
+    if kb is not None and kb.fingerprint == fingerprint:
+        _stats["hits"] += 1
+        return kb
+
+    with _lock:
+        if _current is None or _current.fingerprint != fingerprint:
+            _current = _build_knowledge_base(fingerprint)
+            _stats["reloads"] += 1
+        return _current
+
+
+def reload_knowledge_base() -> KnowledgeBase:
+    """Fuerza la recompilación (p. ej. tras editar las guías en un test)."""
+    global _current
+    with _lock:
+        _current = _build_knowledge_base(_fingerprint())
+        _stats["reloads"] += 1
+        return _current
+
+
 def get_extraction_schema() -> Dict[str, Any]:
-    data = _load_json_file(EXTRACTION_SCHEMA_FILE)
-    return data.get("schemas", {}) if isinstance(data, dict) else {}
+    return get_knowledge_base().schemas
 
 
-@lru_cache()
 def get_document_knowledge() -> Dict[str, Dict[str, Any]]:
-    data = _load_json_file(KB_FILE)
-    items: List[Dict[str, Any]] = data.get("document_types", []) if isinstance(data, dict) else []
-    return {item.get("id"): item for item in items if item.get("id")}
+    return get_knowledge_base().documents
 
 
 def get_document_labels() -> Dict[str, str]:
-    knowledge = get_document_knowledge()
-    return {key: value.get("name", key.replace("_", " ").title()) for key, value in knowledge.items()}
+    return get_knowledge_base().labels
+
+
+register_cache("knowledge_base", lambda: (_stats["hits"], _stats["reloads"]))
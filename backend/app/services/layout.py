@@ -0,0 +1,122 @@
+import json
+import logging
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from ..core.optional import optional_import
+from .compression import compress_bytes, decompress_bytes
+
+logger = logging.getLogger(__name__)
+
+# Un renglón: [x, y, w, h, confianza 0-100, texto]. Coordenadas relativas a la
+# página (0-1, origen arriba a la izquierda) para que no dependan del dpi.
+Line = list
+COORD_DIGITS = 4
+# El texto nativo de un PDF no tiene incertidumbre de reconocimiento
+NATIVE_CONFIDENCE = 100.0
+
+
+def _line(x: float, y: float, w: float, h: float, confidence: float, text: str) -> Line:
+    return [
+        round(min(max(x, 0.0), 1.0), COORD_DIGITS),
+        round(min(max(y, 0.0), 1.0), COORD_DIGITS),
+        round(min(max(w, 0.0), 1.0), COORD_DIGITS),
+        round(min(max(h, 0.0), 1.0), COORD_DIGITS),
+        confidence,
+        text,
+    ]
+
+
+def _sorted(lines: List[Line]) -> List[Line]:
+    # Orden de lectura: de arriba hacia abajo y de izquierda a derecha
+    return sorted(lines, key=lambda line: (line[1], line[0]))
+
+
+def from_pixels(
+    lines: Sequence[Tuple[int, int, int, int, float, str]],
+    origin: Tuple[int, int],
+    size: Tuple[int, int],
+) -> List[Line]:
+    """Renglones de tesseract (px de la imagen preprocesada) a coordenadas de página.
+
+    `origin` es el desplazamiento del recorte al contenido y `size` el tamaño
+    de la página rasterizada original.
+    """
+    dx, dy = origin
+    width, height = max(1, size[0]), max(1, size[1])
+    return _sorted(
+        [
+            _line(
+                (left + dx) / width,
+                (top + dy) / height,
+                line_width / width,
+                line_height / height,
+                confidence,
+                text,
+            )
+            for left, top, line_width, line_height, confidence, text in lines
+        ]
+    )
+
+
+def pdf_layout(path: Path) -> List[List[Line]]:
+    """Renglones por página de un PDF con texto, vía el análisis de layout de pdfminer.
+
+    Vacío si pdfminer no está instalado o el archivo no se puede leer; el
+    texto plano del pipeline no depende de esto.
+    """
+    extract_pages = optional_import("pdfminer.high_level", "extract_pages")
+    text_line = optional_import("pdfminer.layout", "LTTextLine")
+    text_container = optional_import("pdfminer.layout", "LTTextContainer")
+    la_params = optional_import("pdfminer.layout", "LAParams")
+    if extract_pages is None or text_line is None:
+        return []
+    pages: List[List[Line]] = []
+    try:
+        # Sin `boxes_flow` pdfminer no calcula el orden de lectura (lo hace
+        # `_sorted`), que es buena parte del costo del análisis
+        for page in extract_pages(str(path), laparams=la_params(boxes_flow=None)):
+            width, height = max(page.width, 1.0), max(page.height, 1.0)
+            lines: List[Line] = []
+            for element in page:
+                if not isinstance(element, text_container):
+                    continue
+                for item in element:
+                    if not isinstance(item, text_line):
+                        continue
+                    text = item.get_text().strip()
+                    if not text:
+                        continue
+                    x0, y0, x1, y1 = item.bbox
+                    # pdfminer usa origen abajo a la izquierda
+                    lines.append(
+                        _line(
+                            x0 / width,
+                            (height - y1) / height,
+                            (x1 - x0) / width,
+                            (y1 - y0) / height,
+                            NATIVE_CONFIDENCE,
+                            text,
+                        )
+                    )
+            pages.append(_sorted(lines))
+    except Exception:
+        logger.warning("No se pudo analizar el layout de %s", path, exc_info=True)
+        return []
+    return pages
+
+
+def pack_layout(lines: Optional[Sequence[Line]]) -> Optional[bytes]:
+    if not lines:
+        return None
+    raw = json.dumps(lines, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return compress_bytes(raw, kind="layout")
+
+
+def unpack_layout(blob: Optional[bytes]) -> List[Line]:
+    if not blob:
+        return []
+    try:
+        return json.loads(decompress_bytes(blob).decode("utf-8"))
+    except (ValueError, OSError, RuntimeError):
+        return []
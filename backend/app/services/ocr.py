@@ -0,0 +1,359 @@
+import os
+import tempfile
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from ..core.config import get_settings
+from ..core.metrics import counter
+from ..core.tracing import span
+from .layout import Line, from_pixels
+from .render import page_count
+from .scheduler import ocr_slot, raster_budget, raster_bytes
+from .tesseract import get_ocr_backend, installed_languages
+
+# Idioma detectado / hint del upload -> traineddata de tesseract
+TESSERACT_LANGS = {"es": "spa", "spa": "spa", "en": "eng", "eng": "eng"}
+MIXED_LANG = "spa+eng"
+# Ángulos (grados) que se prueban al enderezar; escaneos de oficina rara vez pasan de 3°
+DESKEW_ANGLES = [step / 2 for step in range(-6, 7)]
+DESKEW_SAMPLE_WIDTH = 400
+CROP_MARGIN = 12
+
+# Aparte de `inova_ocr_pages_total` (core/metrics.py), que cuenta todas las
+# pasadas de OCR; esta cuenta una vez cada página por su resultado final
+OCR_PAGE_RESULTS = counter(
+    "inova_ocr_page_results_total",
+    "Páginas reconocidas por resolución final y si hubo que reintentar.",
+    ("dpi", "escalated"),
+)
+
+
+@dataclass
+class PageResult:
+    page: int
+    text: str
+    # Promedio de confianza por palabra de tesseract, 0-100; -1 = sin palabras
+    confidence: float
+    words: int
+    dpi: int
+    lang: str
+    # Renglones posicionados (ver services/layout.py); se guardan aparte del log
+    lines: List[Line] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("text")
+        data.pop("lines")
+        return data
+
+
+def _pil():
+    from .processing import _pil_image
+
+    Image = _pil_image()
+    if Image is None:
+        return None, None
+    from PIL import ImageOps
+
+    return Image, ImageOps
+
+
+def tesseract_lang(hint: Optional[str]) -> str:
+    """Un solo idioma si el hint lo permite (más rápido y preciso); si no, ambos."""
+    lang = TESSERACT_LANGS.get((hint or "").strip().lower())
+    if lang and lang in _installed_langs():
+        return lang
+    return MIXED_LANG
+
+
+@lru_cache(maxsize=1)
+def _installed_langs() -> Tuple[str, ...]:
+    # Si no se pudo consultar, asumir que los de MIXED_LANG existen
+    return installed_languages() or tuple(MIXED_LANG.split("+"))
+
+
+# --- Preprocesamiento -------------------------------------------------------
+
+
+def _otsu_threshold(histogram: List[int]) -> int:
+    total = sum(histogram)
+    if not total:
+        return 128
+    weighted_total = sum(i * count for i, count in enumerate(histogram))
+    background = weighted_background = 0
+    best_threshold, best_variance = 128, -1.0
+    for threshold, count in enumerate(histogram):
+        background += count
+        if not background:
+            continue
+        foreground = total - background
+        if not foreground:
+            break
+        weighted_background += threshold * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = threshold, variance
+    return best_threshold
+
+
+def _crop_to_content(gray, ImageOps):
+    """Recorte a la tinta y su esquina superior izquierda en la imagen original."""
+    # Tinta = píxeles bastante más oscuros que el papel
+    ink = ImageOps.invert(gray).point(lambda value: 255 if value > 96 else 0)
+    box = ink.getbbox()
+    if not box:
+        return gray, (0, 0)
+    left, top, right, bottom = box
+    left, top = max(0, left - CROP_MARGIN), max(0, top - CROP_MARGIN)
+    cropped = gray.crop(
+        (
+            left,
+            top,
+            min(gray.width, right + CROP_MARGIN),
+            min(gray.height, bottom + CROP_MARGIN),
+        )
+    )
+    return cropped, (left, top)
+
+
+def _skew_angle(gray, Image, ImageOps) -> float:
+    """Ángulo que maximiza la varianza del perfil horizontal (renglones nítidos).
+
+    Se evalúa sobre una muestra reducida: reducir a 1 px de ancho con BOX
+    promedia cada fila, así que no hace falta numpy.
+    """
+    scale = DESKEW_SAMPLE_WIDTH / max(1, gray.width)
+    if scale < 1:
+        gray = gray.resize(
+            (DESKEW_SAMPLE_WIDTH, max(1, int(gray.height * scale))), Image.Resampling.BOX
+        )
+    ink = ImageOps.invert(gray)
+    best_angle, best_score = 0.0, -1.0
+    for angle in DESKEW_ANGLES:
+        rotated = ink.rotate(angle, resample=Image.Resampling.BILINEAR, fillcolor=0)
+        rows = list(rotated.resize((1, rotated.height), Image.Resampling.BOX).getdata())
+        mean = sum(rows) / len(rows)
+        score = sum((value - mean) ** 2 for value in rows)
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def _prepare(image) -> Tuple[Any, Tuple[int, int]]:
+    Image, ImageOps = _pil()
+    if Image is None:
+        return image, (0, 0)
+    gray = ImageOps.autocontrast(ImageOps.grayscale(image))
+    gray, origin = _crop_to_content(gray, ImageOps)
+    angle = _skew_angle(gray, Image, ImageOps)
+    if angle:
+        # `expand` agrega unos px por lado; no vale la pena corregir las cajas por eso
+        gray = gray.rotate(
+            angle, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=255
+        )
+    threshold = _otsu_threshold(gray.histogram())
+    return gray.point(lambda value: 255 if value > threshold else 0, mode="1"), origin
+
+
+def preprocess(image):
+    """Escala de grises, recorte al contenido, enderezado y binarización (Otsu).
+
+    Todo con Pillow; cuesta unos pocos ms por página frente a los cientos que
+    tarda tesseract, y le ahorra procesar márgenes y ruido.
+    """
+    return _prepare(image)[0]
+
+
+# --- Reconocimiento ---------------------------------------------------------
+
+
+def _ocr_batch(images: Sequence, first_page: int, dpi: int, lang: str) -> List[PageResult]:
+    """Preprocesa y reconoce páginas consecutivas en una sola llamada al motor."""
+    backend = get_ocr_backend()
+    if backend is None:
+        raise RuntimeError("No hay motor OCR disponible")
+    last_page = first_page + len(images) - 1
+    with span(
+        "ocr.batch", pages=len(images), first_page=first_page, dpi=dpi, lang=lang,
+        backend=backend.name,
+    ), ocr_slot():
+        prepared = [_prepare(image) for image in images]
+        recognized = backend.recognize_batch([item[0] for item in prepared], lang)
+    return [
+        PageResult(
+            number, text, confidence, words, dpi, lang,
+            from_pixels(lines, origin, image.size),
+        )
+        for number, image, (_, origin), (text, confidence, words, lines) in zip(
+            range(first_page, last_page + 1), images, prepared, recognized
+        )
+    ]
+
+
+def _better(current: PageResult, candidate: PageResult) -> PageResult:
+    if candidate.confidence > current.confidence:
+        return candidate
+    return current
+
+
+class OcrEngine:
+    """OCR adaptativo: rasteriza a baja resolución y escala solo lo dudoso.
+
+    La mayoría de los escaneos se leen bien a `ocr_initial_dpi`; las páginas con
+    confianza media bajo `ocr_min_confidence` se vuelven a rasterizar (solo esa
+    página) a `ocr_max_dpi` y con ambos idiomas, y se queda el mejor resultado.
+    """
+
+    def __init__(
+        self,
+        initial_dpi: Optional[int] = None,
+        max_dpi: Optional[int] = None,
+        min_confidence: Optional[float] = None,
+    ):
+        settings = get_settings()
+        self.initial_dpi = initial_dpi or settings.ocr_initial_dpi
+        self.max_dpi = max(self.initial_dpi, max_dpi or settings.ocr_max_dpi)
+        self.min_confidence = (
+            min_confidence if min_confidence is not None else settings.ocr_min_confidence
+        )
+        self.batch_pages = settings.ocr_batch_pages
+
+    def _needs_retry(self, result: PageResult) -> bool:
+        return result.confidence < self.min_confidence and (
+            result.dpi < self.max_dpi or result.lang != MIXED_LANG
+        )
+
+    def _pages_per_batch(self, dpi: int) -> int:
+        # Un lote nunca reserva más que el presupuesto completo
+        fits = raster_budget().capacity // raster_bytes(dpi)
+        return max(1, min(self.batch_pages, fits))
+
+    def _rasterize(self, path: Path, first: int, last: int, dpi: int, folder: str) -> List:
+        """Páginas `first`..`last` vía PNG temporales; se borran al cargarlas."""
+        from .processing import _convert_from_path
+
+        Image, _ = _pil()
+        with span("ocr.rasterize", dpi=dpi, first_page=first, last_page=last):
+            paths = _convert_from_path()(
+                str(path),
+                dpi=dpi,
+                first_page=first,
+                last_page=last,
+                output_folder=folder,
+                paths_only=True,
+                fmt="png",
+            )
+        images = []
+        for page_path in paths:
+            image = Image.open(page_path)
+            image.load()
+            images.append(image)
+            os.remove(page_path)
+        return images
+
+    def ocr_pdf(
+        self,
+        path: Path,
+        language_hint: Optional[str] = None,
+        detect_language: Optional[Callable[[str], str]] = None,
+        on_page: Optional[Callable[[int, Any], None]] = None,
+    ) -> List[PageResult]:
+        """OCR por lotes: nunca hay más de un lote de páginas en memoria.
+
+        Poppler escribe cada lote a un directorio temporal y las imágenes se
+        sueltan apenas se reconocen, así que el pico de memoria depende de
+        `ocr_batch_pages` y no del largo del documento. Cada lote reserva su
+        tamaño estimado en `raster_budget` antes de rasterizar.
+        """
+        total = page_count(path)
+        lang = tesseract_lang(language_hint)
+        # Sin hint, la primera página sola decide el idioma del resto
+        detecting = lang == MIXED_LANG and detect_language is not None and total != 1
+        batch = self._pages_per_batch(self.initial_dpi)
+        results: List[PageResult] = []
+        with tempfile.TemporaryDirectory(prefix="ocr-raster-") as folder:
+            first = 1
+            while total is None or first <= total:
+                last = first + (1 if detecting else batch) - 1
+                if total is not None:
+                    last = min(last, total)
+                wanted = last - first + 1
+                with raster_budget().reserve(raster_bytes(self.initial_dpi, wanted)):
+                    images = self._rasterize(path, first, last, self.initial_dpi, folder)
+                    if not images:
+                        break
+                    results += _ocr_batch(images, first, self.initial_dpi, lang)
+                    if on_page is not None:
+                        for number, image in enumerate(images, start=first):
+                            on_page(number, image)
+                    received = len(images)
+                    del images
+                if detecting:
+                    detecting = False
+                    if results[0].text:
+                        lang = tesseract_lang(detect_language(results[0].text))
+                if received < wanted:
+                    break
+                first = last + 1
+
+            retry_pages = [result.page for result in results if self._needs_retry(result)]
+            retry_batch = self._pages_per_batch(self.max_dpi)
+            for offset in range(0, len(retry_pages), retry_batch):
+                numbers = retry_pages[offset : offset + retry_batch]
+                with raster_budget().reserve(raster_bytes(self.max_dpi, len(numbers))):
+                    images = []
+                    for number in numbers:
+                        images += self._rasterize(path, number, number, self.max_dpi, folder)[:1]
+                    for number, retried in zip(
+                        numbers, _ocr_batch_pages(images, numbers, self.max_dpi)
+                    ):
+                        results[number - 1] = _better(results[number - 1], retried)
+                    del images
+        for result in results:
+            escalated = "true" if result.dpi != self.initial_dpi else "false"
+            OCR_PAGE_RESULTS.inc(dpi=str(result.dpi), escalated=escalated)
+        return results
+
+    def ocr_image(
+        self,
+        path: Path,
+        language_hint: Optional[str] = None,
+        on_page: Optional[Callable[[int, Any], None]] = None,
+    ) -> List[PageResult]:
+        Image, _ = _pil()
+        with Image.open(path) as img:
+            img.load()
+            image = img.copy()
+        # La resolución de una foto/escaneo ya viene dada; solo se reintenta el idioma
+        dpi = int((image.info.get("dpi") or (0,))[0] or 0)
+        lang = tesseract_lang(language_hint)
+        result = _ocr_batch([image], 1, dpi, lang)[0]
+        if result.confidence < self.min_confidence and lang != MIXED_LANG:
+            result = _better(result, _ocr_batch([image], 1, dpi, MIXED_LANG)[0])
+        OCR_PAGE_RESULTS.inc(dpi=str(dpi), escalated="false")
+        if on_page is not None:
+            on_page(1, image)
+        return [result]
+
+
+def _ocr_batch_pages(images: List, numbers: List[int], dpi: int) -> List[PageResult]:
+    """Reintento de páginas no consecutivas: un lote, numeración original."""
+    if not images:
+        return []
+    results = _ocr_batch(images, 1, dpi, MIXED_LANG)
+    for result, number in zip(results, numbers):
+        result.page = number
+    return results
+
+
+def mean_confidence(pages: List[PageResult]) -> Optional[float]:
+    """Confianza global 0-1 ponderada por palabras; `None` si no se reconoció nada."""
+    words = sum(page.words for page in pages if page.words)
+    if not words:
+        return None
+    total = sum(page.confidence * page.words for page in pages if page.words)
+    return round(total / words / 100, 3)
@@ -1,74 +1,93 @@
+import difflib
 import json
+import logging
 import re
+import shutil
 import time
 import uuid
-import difflib
 from collections import Counter
+from datetime import date
 from pathlib import Path
-from typing import Dict, List, Sequence, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 from sqlalchemy import delete
 from sqlalchemy.orm import Session
 
-from ..models.document import Document, Entity, Keyword, ProcessingLog
-from ..services.knowledge import (
-    get_document_knowledge,
-    get_document_labels,
-    get_extraction_schema,
+from ..core.db import session_scope
+from ..core.metrics import DOCUMENTS_PROCESSED, PROCESSING_IN_FLIGHT
+from ..core.optional import module_installed, optional_import
+from ..core.tracing import span, start_trace
+from ..models.document import (
+    Document,
+    DocumentRow,
+    Entity,
+    ExtractedField,
+    Keyword,
+    ProcessingLog,
 )
+from ..services.cache import get_insights_cache
+from ..services.compression import pack_json, pack_text
+from ..services.entities import is_valid_container, normalize_entity_value
+from ..services.events import publish
+from ..services.extraction import SchemaResult, extract_schema_fields
+from ..services.knowledge import KnowledgeBase, get_knowledge_base
+from ..services.layout import Line, pdf_layout
+from ..services.ocr import OcrEngine, PageResult, mean_confidence
+from ..services.render import cache_page_image
+from ..services.scheduler import WORKER_ID, claim
+from ..services.search import PAGE_BREAK, get_search_backend, split_pages
+from ..services.storage import local_file, storage_for
+from ..services.tables import pdf_table_records, read_table_file, table_format
+from ..services.tesseract import get_ocr_backend
 
-# Intentar importaciones opcionales para OCR/PDF -> no fallar si falta la dependencia
-try:
-    import PyPDF2
-except Exception:
-    PyPDF2 = None
+logger = logging.getLogger(__name__)
 
-try:
-    from pdfminer.high_level import extract_text as pdfminer_extract_text
-except Exception:
-    pdfminer_extract_text = None
 
-try:
-    from PIL import Image
-except Exception:
-    Image = None
+# Las librerías de PDF/OCR son pesadas (PyPDF2, pdfminer, Pillow, pytesseract,
+# pdf2image): se cargan con `optional_import` recién cuando un documento las
+# necesita. Si falta la dependencia el pipeline sigue con el siguiente motor.
+def _pypdf2():
+    return optional_import("PyPDF2")
 
-try:
-    import pytesseract
-except Exception:
-    pytesseract = None
 
-try:
-    # pdf2image puede ayudar a rasterizar PDFs cuando PyPDF2 no consigue texto
-    from pdf2image import convert_from_path
-except Exception:
-    convert_from_path = None
+def _pdfminer_extract_text():
+    return optional_import("pdfminer.high_level", "extract_text")
 
-import shutil
-import logging
 
-logger = logging.getLogger(__name__)
+def _pil_image():
+    return optional_import("PIL.Image")
+
+
+def _pytesseract():
+    return optional_import("pytesseract")
+
+
+def _convert_from_path():
+    # pdf2image puede ayudar a rasterizar PDFs cuando PyPDF2 no consigue texto
+    return optional_import("pdf2image", "convert_from_path")
+
 
 # Detectar si los comandos de sistema están disponibles (Tesseract y Poppler)
 TESSERACT_CMD = shutil.which("tesseract")
 POPPLER_CMD = shutil.which("pdftoppm") or shutil.which("pdfinfo")
-TESSERACT_AVAILABLE = pytesseract is not None and TESSERACT_CMD is not None
-POPPLER_AVAILABLE = convert_from_path is not None and POPPLER_CMD is not None
+TESSERACT_AVAILABLE = module_installed("pytesseract") and TESSERACT_CMD is not None
+POPPLER_AVAILABLE = module_installed("pdf2image") and POPPLER_CMD is not None
 
 
 def check_system_dependencies() -> dict:
     """Retorna un dict con la disponibilidad de herramientas de sistema.
 
-    Useful for health checks or for developer diagnostics.
+    Useful for health checks or for developer diagnostics. No importa las
+    librerías: sólo verifica que estén instaladas.
     """
     return {
-        "pytesseract_installed": pytesseract is not None,
+        "pytesseract_installed": module_installed("pytesseract"),
         "tesseract_cmd": TESSERACT_CMD,
         "tesseract_available": TESSERACT_AVAILABLE,
-        "pdf2image_installed": convert_from_path is not None,
+        "pdf2image_installed": module_installed("pdf2image"),
         "poppler_cmd": POPPLER_CMD,
         "poppler_available": POPPLER_AVAILABLE,
-        "PyPDF2_installed": PyPDF2 is not None,
+        "PyPDF2_installed": module_installed("PyPDF2"),
     }
 
 
@@ -144,10 +163,6 @@ ENTITY_KEYWORD_LABELS: Dict[str, str] = {
     "currency": "MONEDA",
 }
 
-EXTRACTION_SCHEMAS = get_extraction_schema()
-DOCUMENT_KNOWLEDGE = get_document_knowledge()
-DOCUMENT_LABELS = get_document_labels()
-
 CHERRY_HS_CODES = {"080921", "080929", "08092100", "08092900"}
 REGULATORY_TERMS = {
     "sag",
@@ -196,42 +211,6 @@ SPELLCHECK_TERMS = {
     "chile": "Chile",
 }
 
-FIELD_HINTS: Dict[str, List[str]] = {
-    "numero_factura": [
-        "numero factura",
-        "n\u00b0 factura",
-        "invoice number",
-        "factura no",
-    ],
-    "exportador": ["exportador", "exporter"],
-    "importador": ["importador", "consignee", "importer"],
-    "descripcion_mercaderia": ["descripcion", "description", "mercaderia", "goods"],
-    "variedad": ["variedad", "variety", "cultivar"],
-    "calibre": ["calibre", "caliber", "size"],
-    "cantidad_cajas": ["cantidad de cajas", "cajas", "cartons", "boxes"],
-    "peso_neto": ["peso neto", "net weight"],
-    "peso_bruto": ["peso bruto", "gross weight", "peso total"],
-    "hs_code": ["hs code", "codigo hs", "h.s."],
-    "incoterm": ["incoterm", "terms", "fob", "cif", "cfr"],
-    "valor_total": ["valor total", "total value", "amount due", "fob value"],
-    "moneda": ["usd", "eur", "currency", "moneda"],
-    "numero_contenedor": ["contenedor", "container", "cntr", "booking"],
-    "numero_pallets": ["pallets", "pallet"],
-    "numero_cajas": ["cajas", "boxes", "cartons"],
-    "codigo_csg": ["csg", "codigo csg"],
-    "codigo_csp": ["csp", "codigo csp"],
-    "lote": ["lote", "lot"],
-    "pais_destino": ["pais destino", "destination country", "destino"],
-    "criterio_origen": ["criterio de origen", "origin criterion"],
-    "valor_fob": ["valor fob", "fob value"],
-    "numero_dus": ["numero dus", "dus", "documento unico salida"],
-    "numero_guia": ["guia despacho", "numero guia", "despacho"],
-    "especie": ["especie", "species"],
-    "cantidad": ["cantidad", "quantity", "qty"],
-    "origen": ["origen", "origin"],
-    "destino": ["destino", "destination"],
-}
-
 DOC_TYPE_KEYWORDS = {
     "factura_comercial": ["factura comercial", "commercial invoice", "invoice"],
     "packing_list": ["packing list", "packing", "lista de empaque", "lista empaque"],
@@ -360,105 +339,191 @@ DEMO_SCENARIOS = {
 
 
 def process_document_sync(db: Session, doc: Document) -> None:
-    start = time.time()
+    # Una sola versión de la KB para todo el documento, aunque se recargue en medio
+    kb = get_knowledge_base()
+    with start_trace("process_document", document_id=doc.id) as trace:
+        _process_document(db, doc, kb)
+        doc_type = getattr(doc, "doc_type", None) or ""
+        trace.attributes["doc_type"] = doc_type
+        trace.attributes["kb_version"] = kb.version
+    _save_log(
+        db,
+        doc.id,
+        "timings",
+        trace.to_dict(),
+        success=True,
+        duration_ms=trace.elapsed_ms,
+    )
+    # Recién aquí: con "done" el frontend ya puede pedir insights y campos
+    doc.status = "done"
+    db.commit()
+    get_insights_cache().invalidate(doc.id)
 
-    # 0) Inyectar HTML Preview si es un archivo demo conocido
-    if doc.filename in DEMO_HTML_MAPPING:
-        html_filename = DEMO_HTML_MAPPING[doc.filename]
-        # Asumimos que los HTML están en la raíz del workspace
-        # Desde donde se ejecuta uvicorn (root), el path es directo
-        html_path = Path(html_filename)
-        if html_path.exists():
-            try:
-                doc.html_preview = html_path.read_text(encoding="utf-8")
-                logger.info(f"Inyectado HTML preview para {doc.filename}")
-            except Exception as e:
-                logger.warning(f"No se pudo leer el HTML preview {html_filename}: {e}")
 
-    # 0.1) Si el archivo subido es HTML, usarlo como preview
-    elif doc.mime == "text/html" or doc.filename.lower().endswith(".html"):
+def _emit(doc: Document, stage: str, **data) -> None:
+    publish(doc.id, stage, shipment_id=getattr(doc, "shipment_id", None), **data)
+
+
+def run_document_job(doc_id: str) -> str:
+    """Procesa un documento ya guardado, fuera del request que lo subió.
+
+    Usa su propia sesión (la del request ya se cerró), publica el progreso en
+    el broker de eventos y devuelve el estado final.
+    """
+    with session_scope() as db:
+        doc = db.get(Document, doc_id)
+        if doc is None:
+            return "missing"
+        if doc.owner and doc.owner != WORKER_ID:
+            # Su lease venció y lo reclamó otro worker: que lo procese ese
+            logger.info("%s ya es de %s; se omite", doc_id, doc.owner)
+            return doc.status
+        claim(doc)
+        doc.status = "processing"
+        db.commit()
+        _emit(doc, "started", filename=doc.filename)
+        PROCESSING_IN_FLIGHT.inc()
         try:
-            path = Path(doc.storage_path)
-            if path.exists():
-                doc.html_preview = path.read_text(encoding="utf-8", errors="ignore")
-                logger.info(
-                    f"Usando contenido HTML subido como preview para {doc.filename}"
-                )
-        except Exception as e:
-            logger.warning(f"No se pudo leer el archivo HTML subido: {e}")
+            process_document_sync(db, doc)
+            status = "done"
+        except Exception as exc:
+            logger.exception("Falló el procesamiento de %s", doc_id)
+            db.rollback()
+            status = "failed"
+            doc.status = status
+            db.commit()
+            _emit(doc, status, error=str(exc))
+        else:
+            _emit(doc, status, docType=doc.doc_type, language=doc.language_detected)
+        finally:
+            PROCESSING_IN_FLIGHT.dec()
+        DOCUMENTS_PROCESSED.inc(doc_type=doc.doc_type or "unknown", status=status)
+        return status
+
+
+def _process_document(db: Session, doc: Document, kb: KnowledgeBase) -> None:
+    # Resolverlo antes de escribir: la primera vez puede crear el índice FTS
+    search_backend = get_search_backend(db)
 
-    # 1) OCR (heurística básica/lectura de texto almacenado)
-    ocr_text = _read_text_from_storage(doc)
-    if not ocr_text.strip():
-        ocr_text = DEFAULT_OCR_TEXT
-        ocr_conf = 0.82
-    else:
-        ocr_conf = _estimate_confidence(ocr_text)
+    # 0) Inyectar HTML Preview si es un archivo demo conocido
+    with span("read_preview"):
+        _load_html_preview(doc)
 
-    doc.language_detected = _detect_language(ocr_text)
+    # 1) OCR (heurística básica/lectura de texto almacenado)
+    with span("extract") as extract_span:
+        ocr_pages: List[PageResult] = []
+        page_layouts: List[List[Line]] = []
+        table_records: List[Dict[str, Any]] = []
+        ocr_text = _read_text_from_storage(doc, ocr_pages, page_layouts, table_records)
+        if ocr_pages and not page_layouts:
+            page_layouts = [page.lines for page in ocr_pages]
+        if not ocr_text.strip():
+            ocr_text = DEFAULT_OCR_TEXT
+            ocr_conf = 0.82
+        else:
+            # Con OCR la confianza es la de tesseract por palabra; si no, heurística
+            ocr_conf = mean_confidence(ocr_pages) or _estimate_confidence(ocr_text)
+        extract_span.set_attribute("chars", len(ocr_text))
+    _emit(doc, "text_extracted", chars=len(ocr_text), pages=len(split_pages(ocr_text)))
+
+    with span("language"):
+        doc.language_detected = _detect_language(ocr_text)
 
     # Detectar y normalizar tipo de documento
-    normalized_doc_type = _normalize_doc_type(getattr(doc, "doc_type", ""))
-    if not normalized_doc_type:
-        doc_type_guess = _detect_document_type(ocr_text)
-        normalized_doc_type = _normalize_doc_type(doc_type_guess)
-    if normalized_doc_type:
-        doc.doc_type = normalized_doc_type
+    with span("classify"):
+        normalized_doc_type = _normalize_doc_type(getattr(doc, "doc_type", ""), kb)
+        if not normalized_doc_type:
+            doc_type_guess = _detect_document_type(ocr_text)
+            normalized_doc_type = _normalize_doc_type(doc_type_guess, kb)
+        if normalized_doc_type:
+            doc.doc_type = normalized_doc_type
+
+    with span("persistence", step="ocr"):
+        _save_log(
+            db,
+            doc.id,
+            "ocr",
+            {
+                "text": ocr_text,
+                "confidence": ocr_conf,
+                "pages": [page.to_dict() for page in ocr_pages],
+            },
+            success=True,
+            duration_ms=extract_span.duration_ms,
+        )
 
-    _save_log(
-        db,
-        doc.id,
-        "ocr",
-        {"text": ocr_text, "confidence": ocr_conf},
-        success=True,
-        start=start,
-    )
-
-    # Limpieza de entidades/keywords previas en caso de reprocesar
-    db.execute(delete(Entity).where(Entity.document_id == doc.id))
-    db.execute(delete(Keyword).where(Keyword.document_id == doc.id))
-    db.commit()
+        # Limpieza de entidades/keywords previas en caso de reprocesar
+        db.execute(delete(Entity).where(Entity.document_id == doc.id))
+        db.execute(delete(Keyword).where(Keyword.document_id == doc.id))
+        db.execute(delete(ExtractedField).where(ExtractedField.document_id == doc.id))
+        page_texts = [page.strip() for page in ocr_text.split("\f")]
+        if page_layouts and len(page_layouts) == len(page_texts):
+            # Numeración real de páginas (con vacías) para que cada layout caiga en la suya
+            search_backend.index_document(db, doc.id, page_texts, page_layouts)
+        else:
+            page_layouts = []
+            search_backend.index_document(db, doc.id, split_pages(ocr_text))
+        db.commit()
+
+    # Filas de tablas: planillas o tablas detectadas en el layout del PDF
+    with span("tables") as tables_span:
+        if not table_records and page_layouts:
+            table_records = pdf_table_records(page_layouts)
+        db.execute(delete(DocumentRow).where(DocumentRow.document_id == doc.id))
+        if table_records:
+            db.add_all(_document_rows(doc.id, table_records))
+        db.commit()
+        tables_span.set_attribute("count", len(table_records))
+    if table_records:
+        _emit(doc, "tables", count=len(table_records))
 
     # 2) NLP/Extracción (reglas simples)
-    entity_payloads = _detect_entities(ocr_text)
-    for payload in entity_payloads:
-        db.add(
-            Entity(
-                id=str(uuid.uuid4()),
-                document_id=doc.id,
-                type=payload["type"],
-                value=payload["value"],
-                confidence=payload["confidence"],
-                page=payload.get("page", 1),
-            )
-        )
+    with span("entities") as entities_span:
+        entity_payloads = _detect_entities(ocr_text)
+        entities_span.set_attribute("count", len(entity_payloads))
+    _emit(doc, "entities", count=len(entity_payloads))
 
     # 3) Keywords dinámicas basadas en texto
-    keyword_payloads = _extract_keywords(ocr_text, entity_payloads)
-    for keyword, score in keyword_payloads:
-        db.add(
-            Keyword(
-                id=str(uuid.uuid4()),
-                document_id=doc.id,
-                keyword=keyword,
-                score=score,
+    with span("keywords") as keywords_span:
+        keyword_payloads = _extract_keywords(ocr_text, entity_payloads)
+
+    with span("persistence", step="nlp"):
+        for payload in entity_payloads:
+            db.add(
+                Entity(
+                    id=str(uuid.uuid4()),
+                    document_id=doc.id,
+                    type=payload["type"],
+                    value=payload["value"],
+                    normalized_value=normalize_entity_value(
+                        payload["type"], payload["value"]
+                    ),
+                    confidence=payload["confidence"],
+                    page=payload.get("page", 1),
+                )
             )
-        )
-
-    doc.status = "done"
-    db.commit()
+        for keyword, score in keyword_payloads:
+            db.add(
+                Keyword(
+                    id=str(uuid.uuid4()),
+                    document_id=doc.id,
+                    keyword=keyword,
+                    score=score,
+                )
+            )
+        db.commit()
 
-    _save_log(
-        db,
-        doc.id,
-        "nlp",
-        {
-            "entities": len(entity_payloads),
-            "keywords": [kw for kw, _ in keyword_payloads],
-        },
-        success=True,
-        start=start,
-    )
+        _save_log(
+            db,
+            doc.id,
+            "nlp",
+            {
+                "entities": len(entity_payloads),
+                "keywords": [kw for kw, _ in keyword_payloads],
+            },
+            success=True,
+            duration_ms=entities_span.duration_ms + keywords_span.duration_ms,
+        )
 
     # Registrar advertencias sobre campos faltantes que el frontend deberá mostrar
     required = ["incoterm", "hs_code", "container", "doc_type"]
@@ -470,9 +535,8 @@ def process_document_sync(db: Session, doc: Document) -> None:
     ]
     legacy_missing_issues: List[Dict[str, str]] = []
     if missing:
-        _save_log(
-            db, doc.id, "warnings", {"missing": missing}, success=True, start=start
-        )
+        with span("persistence", step="warnings"):
+            _save_log(db, doc.id, "warnings", {"missing": missing}, success=True)
         for field in missing:
             legacy_missing_issues.append(
                 {
@@ -483,15 +547,32 @@ def process_document_sync(db: Session, doc: Document) -> None:
                 }
             )
 
-    schema_issues = _evaluate_schema_requirements(ocr_text, normalized_doc_type)
-    compliance_issues = _evaluate_cherry_compliance(ocr_text, entity_payloads, doc)
+    insights_start = time.perf_counter()
+    with span("schema"):
+        schema_result = extract_schema_fields(
+            ocr_text, normalized_doc_type, kb, layout=page_layouts
+        )
+        schema_issues = _schema_issues(schema_result)
+    if schema_result is not None:
+        with span("persistence", step="fields") as fields_span:
+            rows = _extracted_field_rows(doc.id, schema_result, kb.version)
+            db.add_all(rows)
+            db.commit()
+            fields_span.set_attribute("count", len(rows))
+        _emit(doc, "fields", count=len(rows))
+    with span("compliance"):
+        compliance_issues = _evaluate_cherry_compliance(
+            ocr_text, entity_payloads, doc
+        )
     combined_compliance = schema_issues + legacy_missing_issues + compliance_issues
-    spellcheck_issues = _detect_spelling_issues(ocr_text)
-    recommendations = _generate_recommendations(
-        combined_compliance, spellcheck_issues, entity_payloads, doc
-    )
-    recommendations.extend(_knowledge_recommendations(normalized_doc_type))
-    recommendations = _deduplicate_strings(recommendations)
+    with span("spellcheck"):
+        spellcheck_issues = _detect_spelling_issues(ocr_text)
+    with span("recommendations"):
+        recommendations = _generate_recommendations(
+            combined_compliance, spellcheck_issues, entity_payloads, doc
+        )
+        recommendations.extend(_knowledge_recommendations(normalized_doc_type, kb))
+        recommendations = _deduplicate_strings(recommendations)
 
     # OVERRIDE FOR DEMO: Si el archivo está en los escenarios demo, usar validaciones fijas
     if doc.filename in DEMO_SCENARIOS:
@@ -505,27 +586,132 @@ def process_document_sync(db: Session, doc: Document) -> None:
         "compliance": combined_compliance,
         "spellcheck": spellcheck_issues,
         "recommendations": recommendations,
+        "kb_version": kb.version,
     }
-    _save_log(
-        db,
-        doc.id,
+    with span("persistence", step="insights"):
+        _save_log(
+            db,
+            doc.id,
+            "insights",
+            insights_payload,
+            success=True,
+            start=insights_start,
+        )
+    _emit(
+        doc,
         "insights",
-        insights_payload,
-        success=True,
-        start=start,
+        compliance=len(combined_compliance),
+        spellcheck=len(spellcheck_issues),
+        recommendations=len(recommendations),
     )
 
 
+def _document_rows(doc_id: str, records: Sequence[Dict[str, Any]]) -> List[DocumentRow]:
+    columns = (
+        "pallet", "boxes", "variety", "size", "category", "container", "net_kg", "gross_kg",
+    )
+    return [
+        DocumentRow(
+            id=str(uuid.uuid4()),
+            document_id=doc_id,
+            source=record.get("source"),
+            row_number=record.get("row_number") or index,
+            data=json.dumps(record.get("data") or {}, ensure_ascii=False, default=str),
+            **{name: record.get(name) for name in columns},
+        )
+        for index, record in enumerate(records, start=1)
+    ]
+
+
+def _extracted_field_rows(
+    doc_id: str, result: SchemaResult, kb_version: str
+) -> List[ExtractedField]:
+    """Convierte los valores del `SchemaMatcher` en filas con columnas tipadas."""
+    rows = []
+    for record in result.records():
+        kind = record["type"]
+        value = record["value"]
+        row = ExtractedField(
+            id=str(uuid.uuid4()),
+            document_id=doc_id,
+            doc_type=result.doc_type,
+            field=record["field"],
+            value_type=kind,
+            value_text=str(value),
+            unit=record.get("unit"),
+            raw=record.get("raw"),
+            confidence=record.get("confidence", 0.0),
+            kb_version=kb_version,
+        )
+        if kind in ("number", "weight"):
+            row.value_number = float(value)
+        elif kind == "date":
+            row.value_date = date.fromisoformat(value)
+        elif kind == "code":
+            row.value_code = str(value).upper()
+        rows.append(row)
+    return rows
+
+
+def _set_html_preview(doc: Document, html: str) -> None:
+    doc.html_preview, doc.html_preview_blob = pack_text(html, kind="html_preview")
+
+
+def _read_stored_text(location: str) -> str:
+    with storage_for(location).open_decompressed(location) as reader:
+        return reader.read().decode("utf-8", errors="ignore")
+
+
+def _load_html_preview(doc: Document) -> None:
+    if doc.filename in DEMO_HTML_MAPPING:
+        html_filename = DEMO_HTML_MAPPING[doc.filename]
+        # Asumimos que los HTML están en la raíz del workspace
+        # Desde donde se ejecuta uvicorn (root), el path es directo
+        html_path = Path(html_filename)
+        if html_path.exists():
+            try:
+                _set_html_preview(doc, html_path.read_text(encoding="utf-8"))
+                logger.info(f"Inyectado HTML preview para {doc.filename}")
+            except Exception as e:
+                logger.warning(f"No se pudo leer el HTML preview {html_filename}: {e}")
+
+    # 0.1) Si el archivo subido es HTML, usarlo como preview
+    elif doc.mime == "text/html" or doc.filename.lower().endswith(".html"):
+        try:
+            if storage_for(doc.storage_path).exists(doc.storage_path):
+                _set_html_preview(doc, _read_stored_text(doc.storage_path))
+                logger.info(
+                    f"Usando contenido HTML subido como preview para {doc.filename}"
+                )
+        except Exception as e:
+            logger.warning(f"No se pudo leer el archivo HTML subido: {e}")
+
+
 def _save_log(
-    db: Session, doc_id: str, step: str, payload: dict, success: bool, start: float
+    db: Session,
+    doc_id: str,
+    step: str,
+    payload: dict,
+    success: bool,
+    start: Optional[float] = None,
+    duration_ms: Optional[float] = None,
 ):
+    """Persiste un `ProcessingLog`.
+
+    `duration_ms` es la duración de la etapa que produjo el payload; si no se
+    entrega se calcula desde `start` (valor de `time.perf_counter()`).
+    """
+    if duration_ms is None:
+        duration_ms = (time.perf_counter() - start) * 1000 if start is not None else 0
+    text_payload, blob_payload = pack_json(payload, kind=f"log_{step}")
     log = ProcessingLog(
         id=str(uuid.uuid4()),
         document_id=doc_id,
         step=step,
-        payload=json.dumps(payload),
+        payload=text_payload,
+        payload_blob=blob_payload,
         success=1 if success else 0,
-        duration_ms=int((time.time() - start) * 1000),
+        duration_ms=int(round(duration_ms)),
     )
     db.add(log)
     db.commit()
@@ -679,20 +865,19 @@ def _evaluate_cherry_compliance(
     return issues
 
 
-def _evaluate_schema_requirements(text: str, doc_type: str) -> List[Dict[str, str]]:
+def _evaluate_schema_requirements(
+    text: str, doc_type: str, kb: Optional[KnowledgeBase] = None
+) -> List[Dict[str, str]]:
     if not doc_type:
         return []
-    schema = EXTRACTION_SCHEMAS.get(doc_type)
-    if not schema:
+    return _schema_issues(extract_schema_fields(text, doc_type, kb))
+
+
+def _schema_issues(result: Optional[SchemaResult]) -> List[Dict[str, str]]:
+    if result is None:
         return []
-    normalized_text = text.casefold()
     issues: List[Dict[str, str]] = []
-    for field in schema.get("fields", []):
-        if not field.get("required"):
-            continue
-        field_name = field.get("name", "")
-        if not field_name or _field_in_text(normalized_text, field_name):
-            continue
+    for field_name in result.missing:
         label = field_name.replace("_", " ")
         issues.append(
             {
@@ -705,20 +890,6 @@ def _evaluate_schema_requirements(text: str, doc_type: str) -> List[Dict[str, st
     return issues
 
 
-def _field_in_text(normalized_text: str, field_name: str) -> bool:
-    if not normalized_text or not field_name:
-        return False
-    hints = FIELD_HINTS.get(field_name, [])
-    if not hints:
-        hints = [field_name.replace("_", " ")]
-    for hint in hints:
-        if not hint:
-            continue
-        if hint.casefold() in normalized_text:
-            return True
-    return False
-
-
 def _contains_keywords(normalized_text: str, keywords: Sequence[str]) -> bool:
     return any(keyword.casefold() in normalized_text for keyword in keywords)
 
@@ -819,32 +990,21 @@ def _generate_recommendations(
     return recommendations[:8]
 
 
-def _knowledge_recommendations(doc_type: str) -> List[str]:
-    info = DOCUMENT_KNOWLEDGE.get(doc_type)
-    if not info:
-        return []
-    recs: List[str] = []
-    for cross in info.get("cross_checks", []) or []:
-        target = cross.get("against")
-        fields = cross.get("fields") or []
-        if not target or not fields:
-            continue
-        label = DOCUMENT_LABELS.get(target, target.replace("_", " "))
-        recs.append(
-            f"Verifica {', '.join(fields)} contra {label} para asegurar consistencia."
-        )
-    for error in info.get("common_errors", [])[:3]:
-        recs.append(f"Revisa: {error}.")
-    return recs
+def _knowledge_recommendations(
+    doc_type: str, kb: Optional[KnowledgeBase] = None
+) -> List[str]:
+    kb = kb or get_knowledge_base()
+    return list(kb.recommendations.get(doc_type, ()))
 
 
-def _normalize_doc_type(doc_type: str) -> str:
+def _normalize_doc_type(doc_type: str, kb: Optional[KnowledgeBase] = None) -> str:
     value = (doc_type or "").strip().lower()
     if not value:
         return ""
     if value in DOC_TYPE_ALIASES:
         return DOC_TYPE_ALIASES[value]
-    if value in EXTRACTION_SCHEMAS or value in DOC_TYPE_KEYWORDS:
+    kb = kb or get_knowledge_base()
+    if value in kb.schemas or value in DOC_TYPE_KEYWORDS:
         return value
     return ""
 
@@ -865,6 +1025,7 @@ def _deduplicate_strings(items: Sequence[str]) -> List[str]:
 
 def extract_text_from_pdf(path: Path) -> str:
     """Obtiene texto de un PDF usando PyPDF2 o pdfminer (si están disponibles)."""
+    PyPDF2 = _pypdf2()
     if PyPDF2 is not None:
         try:
             text_parts = []
@@ -875,11 +1036,12 @@ def extract_text_from_pdf(path: Path) -> str:
                         text_parts.append(page.extract_text() or "")
                     except Exception:
                         continue
-            joined = "\n".join(text_parts).strip()
+            joined = PAGE_BREAK.join(text_parts).strip()
             if joined:
                 return joined
         except Exception:
             pass
+    pdfminer_extract_text = _pdfminer_extract_text()
     if pdfminer_extract_text is not None:
         try:
             text = pdfminer_extract_text(str(path))
@@ -890,52 +1052,124 @@ def extract_text_from_pdf(path: Path) -> str:
     return ""
 
 
-def _read_text_from_storage(doc: Document) -> str:
-    path = Path(doc.storage_path or "")
-    if not path.exists() or path.is_dir():
+def ocr_pdf(
+    path: Path,
+    on_page: Optional[Callable[[int, Any], None]] = None,
+    language_hint: Optional[str] = None,
+    pages: Optional[List[PageResult]] = None,
+) -> str:
+    """Rasteriza un PDF y aplica OCR adaptativo página a página (ver `services/ocr.py`).
+
+    `on_page(número, imagen)` recibe cada página rasterizada, para reutilizarla
+    (p. ej. en la caché de previews) sin volver a rasterizar. Si se entrega
+    `pages`, se completa con el resultado (confianza, dpi, idioma) de cada página.
+    """
+    if _convert_from_path() is None or _pil_image() is None or get_ocr_backend() is None:
         return ""
     try:
-        # Lectura directa de archivos de texto
+        results = OcrEngine().ocr_pdf(
+            path,
+            language_hint=language_hint,
+            detect_language=_detect_language,
+            on_page=on_page,
+        )
+    except Exception:
+        return ""
+    if pages is not None:
+        pages.extend(results)
+    return PAGE_BREAK.join(result.text for result in results).strip()
+
+
+def _read_text_from_storage(
+    doc: Document,
+    ocr_pages: Optional[List[PageResult]] = None,
+    layouts: Optional[List[List[Line]]] = None,
+    tables: Optional[List[Dict[str, Any]]] = None,
+) -> str:
+    """Texto del documento almacenado; `tables` recibe las filas si es una planilla."""
+    location = doc.storage_path or ""
+    try:
+        if not location or not storage_for(location).exists(location):
+            return ""
+        # Planillas antes que text/*: un CSV llega como text/csv
+        fmt = table_format(doc.mime, doc.filename)
+        if fmt is not None:
+            with local_file(location) as local_path:
+                return _read_table(local_path, fmt, tables)
+        # Lectura directa de archivos de texto (descomprimiendo al vuelo)
         if doc.mime and doc.mime.startswith("text/"):
-            return path.read_text(encoding="utf-8", errors="ignore")
+            return _read_stored_text(location)
         if doc.mime in {"application/json", "application/xml"}:
-            return path.read_text(encoding="utf-8", errors="ignore")
+            return _read_stored_text(location)
+        # Las librerías de PDF/OCR necesitan un archivo local sin comprimir
+        with local_file(location) as local_path:
+            return _read_text_from_file(doc, local_path, ocr_pages, layouts)
+    except (OSError, RuntimeError):
+        return ""
+
+
+def _read_table(path: Path, fmt: str, tables: Optional[List[Dict[str, Any]]]) -> str:
+    try:
+        with span("table_read", format=fmt):
+            extraction = read_table_file(path, fmt)
+    except Exception:
+        # Zip corrupto, XML inválido o CSV ilegible: el documento queda sin texto
+        logger.warning("No se pudo leer la planilla %s", path, exc_info=True)
+        return ""
+    if tables is not None:
+        tables.extend(extraction.records)
+    return extraction.text
+
+
+def _ocr_page_done(doc: Document, number: int, image) -> None:
+    cache_page_image(doc.id, number, image)
+    _emit(doc, "ocr_page", page=number)
 
+
+def _read_text_from_file(
+    doc: Document,
+    path: Path,
+    ocr_pages: Optional[List[PageResult]] = None,
+    layouts: Optional[List[List[Line]]] = None,
+) -> str:
+    """Texto del archivo; completa `ocr_pages` si hubo OCR y `layouts` si es un PDF con texto."""
+    try:
         # Si es PDF, intentar extraer texto con los motores disponibles
         if doc.mime == "application/pdf" or path.suffix.lower() == ".pdf":
-            pdf_text = extract_text_from_pdf(path)
+            with span("extract_native"):
+                pdf_text = extract_text_from_pdf(path)
             if pdf_text:
+                if layouts is not None:
+                    with span("layout"):
+                        layouts.extend(pdf_layout(path))
                 return pdf_text
             # Si no hay texto directo recurrimos a rasterizar y OCR
-            if (
-                convert_from_path is not None
-                and Image is not None
-                and pytesseract is not None
-            ):
-                try:
-                    images = convert_from_path(str(path), dpi=200)
-                    page_texts = []
-                    for img in images:
-                        page_texts.append(
-                            pytesseract.image_to_string(img, lang="spa+eng")
-                        )
-                    joined = "\n".join(page_texts).strip()
-                    if joined:
-                        return joined
-                except Exception:
-                    pass
+            with span("ocr"):
+                ocr_text = ocr_pdf(
+                    path,
+                    on_page=lambda number, img: _ocr_page_done(doc, number, img),
+                    language_hint=doc.language_detected,
+                    pages=ocr_pages,
+                )
+            if ocr_text:
+                return ocr_text
     except OSError:
         return ""
     # Si es imagen, intentar OCR con Pillow + pytesseract
     try:
         if path.suffix.lower() in {".png", ".jpg", ".jpeg", ".tiff", ".bmp"}:
-            if Image is not None and pytesseract is not None:
+            if _pil_image() is not None and get_ocr_backend() is not None:
                 try:
-                    img = Image.open(path)
-                    text = pytesseract.image_to_string(img, lang="spa+eng")
-                    return text or ""
+                    results = OcrEngine().ocr_image(
+                        path,
+                        language_hint=doc.language_detected,
+                        on_page=lambda number, img: _ocr_page_done(doc, number, img),
+                    )
                 except Exception:
                     return ""
+                if ocr_pages is not None:
+                    ocr_pages.extend(results)
+                return results[0].text
     except Exception:
         return ""
 
@@ -1020,14 +1254,17 @@ def _detect_entities(text: str) -> List[Dict[str, object]]:
                 {"type": "hs_code", "value": hs_fallback.group(1), "confidence": 0.6}
             )
 
-    # Contenedor ISO: 4 letras + 7 dígitos
-    container_match = re.search(r"\b([A-Za-z]{4}\d{7})\b", text)
-    if container_match:
+    # Contenedor ISO: 4 letras + 7 dígitos; se prefiere uno con dígito verificador válido
+    container_candidates = [
+        m.group(1).upper() for m in re.finditer(r"\b([A-Za-z]{4}\d{7})\b", text)
+    ]
+    if container_candidates:
+        valid = [c for c in container_candidates if is_valid_container(c)]
         results.append(
             {
                 "type": "container",
-                "value": container_match.group(1).upper(),
-                "confidence": 0.88,
+                "value": valid[0] if valid else container_candidates[0],
+                "confidence": 0.95 if valid else 0.7,
             }
         )
 
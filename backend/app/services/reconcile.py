@@ -0,0 +1,479 @@
+"""Conciliación numérica de pesos, cajas y montos entre documentos de un embarque.
+
+Las cantidades se cargan en arreglos de numpy en formato largo (una entrada
+por documento, magnitud y origen) y todas las comparaciones se resuelven con
+operaciones vectorizadas, así que el mismo código sirve para un embarque o
+para auditar una temporada completa.
+
+Cada documento aporta un valor por magnitud: la suma de sus filas
+(`document_rows`, packing lists y proformas) o, si no las tiene, el total
+declarado que extrajo el schema (`extracted_fields`) con confianza de al menos
+`reconcile_min_confidence`. Por embarque y magnitud se elige un valor de
+referencia según `REFERENCE_ORDER` y el resto se compara contra él con las
+tolerancias de `guides/exportacion_cerezas_validation_rules.md`.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..core.config import get_settings
+from ..core.optional import optional_import
+from ..models.document import Document, DocumentRow, ExtractedField
+
+# Magnitudes conciliadas, en el orden de las columnas de los arreglos
+METRICS = ("net_kg", "gross_kg", "boxes", "value")
+# Pesos y montos se comparan por cociente; cajas por unidades
+COUNT_METRICS = {"boxes"}
+ROW_METRICS = ("boxes", "net_kg", "gross_kg")
+# Magnitud -> campo del schema que la declara en cada tipo de documento, según
+# los pares de validation_rules.md §1.1. El `peso_total` del certificado
+# fitosanitario queda fuera: el schema no dice si es neto o bruto y compararlo
+# con el que no es daría errores falsos en cada embarque
+QUANTITY_FIELDS: Dict[str, Dict[str, str]] = {
+    "net_kg": {
+        "packing_list": "peso_neto",
+        "factura_comercial": "peso_neto",
+        "dus": "peso_neto",
+    },
+    "gross_kg": {
+        "packing_list": "peso_bruto",
+        "factura_comercial": "peso_bruto",
+        "bl": "peso_bruto",
+        "dus": "peso_bruto",
+    },
+    "boxes": {
+        "packing_list": "numero_cajas",
+        "factura_comercial": "cantidad_cajas",
+        "certificado_fitosanitario": "cantidad",
+        "guia_despacho": "cantidad",
+    },
+    "value": {"factura_comercial": "valor_total", "dus": "valor_fob"},
+}
+# Referencia por magnitud, en orden de preferencia: el packing list detalla
+# pallet por pallet y es la fuente de las cantidades del resto
+REFERENCE_ORDER = (
+    "packing_list",
+    "factura_comercial",
+    "dus",
+    "bl",
+    "certificado_fitosanitario",
+    "guia_despacho",
+)
+SOURCE_ROWS, SOURCE_FIELD = 0, 1
+SOURCES = ("rows", "field")
+SEVERITIES = ("ok", "warning", "error")
+# Claves para cruzar filas entre dos documentos, de la más fina a la más gruesa
+LINE_KEYS = ("pallet", "size", "variety")
+# Fracción de filas de cada documento que debe tener la clave para usarla
+LINE_KEY_COVERAGE = 0.9
+
+
+class ReconciliationUnavailable(RuntimeError):
+    """Falta numpy para conciliar cantidades."""
+
+
+def _numpy():
+    np = optional_import("numpy")
+    if np is None:
+        raise ReconciliationUnavailable("numpy no está instalado")
+    return np
+
+
+def _tolerances(np):
+    """(warning, error) por magnitud, alineados con `METRICS`."""
+    settings = get_settings()
+    warning = np.array(
+        [
+            0.0 if name in COUNT_METRICS else settings.reconcile_ratio_warning
+            for name in METRICS
+        ]
+    )
+    error = np.array(
+        [
+            settings.reconcile_count_tolerance
+            if name in COUNT_METRICS
+            else settings.reconcile_ratio_tolerance
+            for name in METRICS
+        ]
+    )
+    return warning, error
+
+
+def _documents_query(
+    shipment_ids: Optional[Sequence[str]] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    query = select(Document.id).where(
+        Document.shipment_id.is_not(None), Document.status == "done"
+    )
+    if shipment_ids is not None:
+        query = query.where(Document.shipment_id.in_(list(shipment_ids)))
+    if created_from is not None:
+        query = query.where(Document.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(Document.created_at <= created_to)
+    return query
+
+
+class Quantities:
+    """Cantidades de un conjunto de documentos en arreglos paralelos.
+
+    `docs` son tuplas (id, embarque, tipo, archivo); las entradas (`doc`,
+    `metric`, `source`, `value`) indexan a `docs`, `METRICS` y `SOURCES`.
+    """
+
+    def __init__(self, np, docs, doc, metric, source, value, row_counts):
+        self.np = np
+        self.docs = docs
+        self.doc = doc
+        self.metric = metric
+        self.source = source
+        self.value = value
+        self.row_counts = row_counts
+
+    @classmethod
+    def load(cls, db: Session, documents_query) -> "Quantities":
+        np = _numpy()
+        docs = db.execute(
+            select(Document.id, Document.shipment_id, Document.doc_type, Document.filename)
+            .where(Document.id.in_(documents_query))
+            .order_by(Document.shipment_id, Document.created_at, Document.id)
+        ).all()
+        index = {doc_id: position for position, (doc_id, *_) in enumerate(docs)}
+        doc_parts, metric_parts, source_parts, value_parts = [], [], [], []
+
+        # Filas: sumas por documento con bincount sobre el índice del documento
+        rows = db.execute(
+            select(
+                DocumentRow.document_id,
+                DocumentRow.boxes,
+                DocumentRow.net_kg,
+                DocumentRow.gross_kg,
+            ).where(DocumentRow.document_id.in_(documents_query))
+        ).all()
+        row_counts = np.zeros(len(docs), dtype=np.int64)
+        if rows:
+            row_doc = np.fromiter((index[row[0]] for row in rows), dtype=np.int64, count=len(rows))
+            values = np.array([row[1:] for row in rows], dtype=float)  # None -> nan
+            row_counts = np.bincount(row_doc, minlength=len(docs))
+            for column, name in enumerate(ROW_METRICS):
+                present = ~np.isnan(values[:, column])
+                counts = np.bincount(row_doc[present], minlength=len(docs))
+                sums = np.bincount(
+                    row_doc[present], weights=values[present, column], minlength=len(docs)
+                )
+                with_rows = np.flatnonzero(counts)
+                doc_parts.append(with_rows)
+                metric_parts.append(np.full(len(with_rows), METRICS.index(name)))
+                source_parts.append(np.full(len(with_rows), SOURCE_ROWS))
+                value_parts.append(sums[with_rows])
+
+        # Totales declarados, solo donde no hay filas: la suma de filas es más
+        # confiable que un total leído del texto. Ante repetidos gana el de
+        # mayor confianza
+        seen = {
+            (int(position), METRICS.index(name))
+            for positions, name in zip(doc_parts, ROW_METRICS)
+            for position in positions
+        }
+        field_metric: Dict[Tuple[str, str], int] = {
+            (doc_type, field): METRICS.index(name)
+            for name, fields in QUANTITY_FIELDS.items()
+            for doc_type, field in fields.items()
+        }
+        fields = db.execute(
+            select(ExtractedField.document_id, ExtractedField.field, ExtractedField.value_number)
+            .where(
+                ExtractedField.document_id.in_(documents_query),
+                ExtractedField.field.in_(sorted({field for _, field in field_metric})),
+                ExtractedField.value_number.is_not(None),
+                ExtractedField.confidence >= get_settings().reconcile_min_confidence,
+            )
+            .order_by(ExtractedField.confidence.desc())
+        ).all()
+        declared: List[Tuple[int, int, float]] = []
+        for doc_id, field, number in fields:
+            position = index[doc_id]
+            metric = field_metric.get((docs[position][2], field))
+            if metric is None or (position, metric) in seen:
+                continue
+            seen.add((position, metric))
+            declared.append((position, metric, number))
+        if declared:
+            array = np.array(declared, dtype=float)
+            doc_parts.append(array[:, 0].astype(np.int64))
+            metric_parts.append(array[:, 1].astype(np.int64))
+            source_parts.append(np.full(len(array), SOURCE_FIELD))
+            value_parts.append(array[:, 2])
+
+        def concat(parts, dtype):
+            return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+
+        return cls(
+            np,
+            docs,
+            concat(doc_parts, np.int64),
+            concat(metric_parts, np.int64),
+            concat(source_parts, np.int64),
+            concat(value_parts, float),
+            row_counts,
+        )
+
+    def compare(self) -> Dict[str, Any]:
+        """Referencia por (embarque, magnitud) y diferencia de cada entrada contra ella."""
+        np = self.np
+        shipment_names, shipment_code = np.unique(
+            np.array([str(doc[1]) for doc in self.docs] or [""])[: len(self.docs)],
+            return_inverse=True,
+        )
+        if not len(self.value):
+            empty = np.zeros(0)
+            return {
+                "shipments": shipment_names,
+                "shipment_code": shipment_code,
+                "reference_entry": empty.astype(np.int64),
+                "reference": empty,
+                "difference": empty,
+                "ratio": empty,
+                "severity": empty.astype(np.int64),
+                "compared": empty.astype(bool),
+            }
+        priority = np.array(
+            [
+                REFERENCE_ORDER.index(doc[2]) if doc[2] in REFERENCE_ORDER else len(REFERENCE_ORDER)
+                for doc in self.docs
+            ],
+            dtype=np.int64,
+        )
+        group = shipment_code[self.doc] * len(METRICS) + self.metric
+        # Orden por grupo y, dentro de él, por preferencia: el primero es la referencia
+        order = np.lexsort((self.source, priority[self.doc], group))
+        group_sorted = group[order]
+        starts = np.flatnonzero(np.r_[True, group_sorted[1:] != group_sorted[:-1]])
+        reference_entry = order[starts][np.searchsorted(group_sorted[starts], group)]
+        reference = self.value[reference_entry]
+
+        difference = self.value - reference
+        scale = np.maximum(np.abs(self.value), np.abs(reference))
+        ratio = np.divide(
+            np.abs(difference), scale, out=np.zeros_like(scale), where=scale > 0
+        )
+        warning, error = _tolerances(np)
+        is_count = np.isin(self.metric, [METRICS.index(name) for name in COUNT_METRICS])
+        measure = np.where(is_count, np.abs(difference), ratio)
+        severity = np.select(
+            [measure > error[self.metric], measure > warning[self.metric]], [2, 1], 0
+        )
+        compared = np.arange(len(self.value)) != reference_entry
+        return {
+            "shipments": shipment_names,
+            "shipment_code": shipment_code,
+            "reference_entry": reference_entry,
+            "reference": reference,
+            "difference": difference,
+            "ratio": ratio,
+            "severity": np.where(compared, severity, 0),
+            "compared": compared,
+        }
+
+
+def _line_key(rows: Sequence[Tuple], document_ids: Tuple[str, str]) -> Optional[str]:
+    """Primera clave de `LINE_KEYS` presente en casi todas las filas de ambos y con valores en común."""
+    for position, key in enumerate(LINE_KEYS):
+        keys_by_doc = []
+        for doc_id in document_ids:
+            values = [row[1 + position] for row in rows if row[0] == doc_id]
+            filled = [value for value in values if value]
+            if not values or len(filled) < LINE_KEY_COVERAGE * len(values):
+                break
+            keys_by_doc.append(set(filled))
+        else:
+            if keys_by_doc[0] & keys_by_doc[1]:
+                return key
+    return None
+
+
+def reconcile_lines(
+    db: Session, reference_id: str, other_id: str
+) -> Optional[Dict[str, Any]]:
+    """Cajas y kilos netos por clave (pallet, calibre o variedad) entre dos documentos con filas."""
+    np = _numpy()
+    rows = db.execute(
+        select(
+            DocumentRow.document_id,
+            DocumentRow.pallet,
+            DocumentRow.size,
+            DocumentRow.variety,
+            DocumentRow.boxes,
+            DocumentRow.net_kg,
+        ).where(DocumentRow.document_id.in_((reference_id, other_id)))
+    ).all()
+    key = _line_key(rows, (reference_id, other_id))
+    if key is None:
+        return None
+    column = 1 + LINE_KEYS.index(key)
+    keys, key_code = np.unique(
+        np.array([str(row[column] or "") for row in rows]), return_inverse=True
+    )
+    side = np.array([row[0] == other_id for row in rows], dtype=np.int64)
+    quantities = np.nan_to_num(np.array([row[4:] for row in rows], dtype=float))
+    # Sumas por (lado, clave) en una sola pasada: índice = lado * claves + clave
+    slot = side * len(keys) + key_code
+    warning, error = _tolerances(np)
+    result: Dict[str, Any] = {"key": key, "lines": []}
+    metrics = {}
+    for position, name in enumerate(("boxes", "net_kg")):
+        sums = np.bincount(slot, weights=quantities[:, position], minlength=2 * len(keys))
+        expected, actual = sums[: len(keys)], sums[len(keys) :]
+        difference = actual - expected
+        scale = np.maximum(np.abs(expected), np.abs(actual))
+        ratio = np.divide(np.abs(difference), scale, out=np.zeros_like(scale), where=scale > 0)
+        metric = METRICS.index(name)
+        measure = np.abs(difference) if name in COUNT_METRICS else ratio
+        severity = np.select([measure > error[metric], measure > warning[metric]], [2, 1], 0)
+        metrics[name] = (expected, actual, difference, severity)
+    worst = np.maximum(metrics["boxes"][3], metrics["net_kg"][3])
+    for position in np.flatnonzero(worst):
+        line = {"key": str(keys[position]), "severity": SEVERITIES[int(worst[position])]}
+        for name, (expected, actual, difference, _) in metrics.items():
+            line[name] = {
+                "reference": round(float(expected[position]), 3),
+                "value": round(float(actual[position]), 3),
+                "difference": round(float(difference[position]), 3),
+            }
+        result["lines"].append(line)
+    result["matched"] = int(len(keys) - len(result["lines"]))
+    return result
+
+
+def reconcile_shipment(db: Session, shipment_id: str) -> Dict[str, Any]:
+    """Totales por documento, referencia por magnitud y diferencias del embarque.
+
+    Además compara fila a fila el documento de referencia con cada otro
+    documento que tenga filas (por ejemplo packing list contra proforma).
+    """
+    quantities = Quantities.load(db, _documents_query([shipment_id]))
+    compared = quantities.compare()
+    docs = quantities.docs
+    documents = [
+        {
+            "document_id": doc_id,
+            "doc_type": doc_type,
+            "filename": filename,
+            "rows": int(quantities.row_counts[position]),
+            "totals": {},
+        }
+        for position, (doc_id, _, doc_type, filename) in enumerate(docs)
+    ]
+    references: Dict[str, Dict[str, Any]] = {}
+    discrepancies = []
+    for entry in range(len(quantities.value)):
+        position = int(quantities.doc[entry])
+        metric = METRICS[int(quantities.metric[entry])]
+        source = SOURCES[int(quantities.source[entry])]
+        value = round(float(quantities.value[entry]), 3)
+        documents[position]["totals"].setdefault(metric, {})[source] = value
+        if not compared["compared"][entry]:
+            references[metric] = {
+                "document_id": docs[position][0],
+                "doc_type": docs[position][2],
+                "source": source,
+                "value": value,
+            }
+            continue
+        discrepancies.append(
+            {
+                "metric": metric,
+                "document_id": docs[position][0],
+                "doc_type": docs[position][2],
+                "source": source,
+                "value": value,
+                "reference": round(float(compared["reference"][entry]), 3),
+                "difference": round(float(compared["difference"][entry]), 3),
+                "ratio": round(float(compared["ratio"][entry]), 5),
+                "severity": SEVERITIES[int(compared["severity"][entry])],
+            }
+        )
+
+    lines = []
+    with_rows = [position for position in range(len(docs)) if quantities.row_counts[position]]
+    reference_doc = next(
+        (ref["document_id"] for ref in references.values() if ref["source"] == "rows"), None
+    )
+    if reference_doc is not None:
+        for position in with_rows:
+            other = docs[position][0]
+            if other == reference_doc:
+                continue
+            report = reconcile_lines(db, reference_doc, other)
+            if report is not None:
+                report.update(reference_id=reference_doc, document_id=other)
+                lines.append(report)
+
+    worst = max(
+        [SEVERITIES.index(item["severity"]) for item in discrepancies]
+        + [SEVERITIES.index(line["severity"]) for report in lines for line in report["lines"]]
+        + [0]
+    )
+    return {
+        "shipment_id": shipment_id,
+        "status": SEVERITIES[worst],
+        "documents": documents,
+        "references": references,
+        "discrepancies": discrepancies,
+        "lines": lines,
+    }
+
+
+def audit_shipments(
+    db: Session,
+    shipment_ids: Optional[Sequence[str]] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """Resumen por embarque para auditorías de temporada (solo totales, sin filas).
+
+    Las cantidades de todos los embarques se cargan con tres consultas y las
+    severidades se cuentan por embarque con `bincount`.
+    """
+    np = _numpy()
+    quantities = Quantities.load(
+        db, _documents_query(shipment_ids, created_from, created_to)
+    )
+    compared = quantities.compare()
+    shipments = compared["shipments"]
+    if not len(shipments):
+        return []
+    entry_shipment = compared["shipment_code"][quantities.doc]
+    counts = {
+        name: np.bincount(
+            entry_shipment[compared["compared"] & (compared["severity"] == level)],
+            minlength=len(shipments),
+        )
+        for level, name in enumerate(SEVERITIES)
+    }
+    # Mayor desviación relativa por embarque (solo pesos y montos)
+    ratio_entries = compared["compared"] & ~np.isin(
+        quantities.metric, [METRICS.index(name) for name in COUNT_METRICS]
+    )
+    max_ratio = np.zeros(len(shipments))
+    np.maximum.at(max_ratio, entry_shipment[ratio_entries], compared["ratio"][ratio_entries])
+    documents = np.bincount(compared["shipment_code"], minlength=len(shipments))
+    return [
+        {
+            "shipment_id": str(shipments[code]),
+            "documents": int(documents[code]),
+            "compared": int(sum(counts[name][code] for name in SEVERITIES)),
+            "warnings": int(counts["warning"][code]),
+            "errors": int(counts["error"][code]),
+            "max_ratio": round(float(max_ratio[code]), 5),
+            "status": (
+                "error" if counts["error"][code] else "warning" if counts["warning"][code] else "ok"
+            ),
+        }
+        for code in range(len(shipments))
+    ]
@@ -0,0 +1,208 @@
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from ..core.config import get_settings
+from ..core.metrics import register_cache
+from ..core.tracing import span
+from ..models.document import Document
+from .storage import local_file
+
+logger = logging.getLogger(__name__)
+
+# Ancho en px de cada variante; el alto mantiene la proporción de la página
+SIZES: Dict[str, int] = {"thumb": 240, "preview": 1200}
+# Alcanza para el preview de 1200 px en A4; las páginas del OCR llegan ya hechas
+RASTER_DPI = 200
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".tiff", ".bmp"}
+
+
+class RenderUnavailable(RuntimeError):
+    """No hay motor para rasterizar este documento (p. ej. falta Poppler)."""
+
+
+class PageCache:
+    """PNG por (documento, página, tamaño) en disco con expulsión LRU.
+
+    El `mtime` de cada archivo se actualiza en cada acierto y hace de marca de
+    último uso; al superar `max_bytes` se borran los menos usados.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def path(self, doc_id: str, page: int, size: str) -> Path:
+        return self.root / doc_id / f"{page}-{size}.png"
+
+    def get(self, doc_id: str, page: int, size: str) -> Optional[Path]:
+        path = self.path(doc_id, page, size)
+        try:
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, doc_id: str, page: int, image) -> None:
+        """Guarda todas las variantes de una página a partir de su imagen completa."""
+        written = 0
+        paths = []
+        for size, width in SIZES.items():
+            path = self.path(doc_id, page, size)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            variant = image.convert("RGB") if image.mode not in ("RGB", "L") else image
+            if variant.width > width:
+                height = max(1, round(variant.height * width / variant.width))
+                variant = variant.resize((width, height))
+            # Escritura atómica: un lector concurrente nunca ve un PNG a medias
+            tmp = path.with_suffix(".tmp")
+            variant.save(tmp, format="PNG", optimize=True)
+            os.replace(tmp, path)
+            written += path.stat().st_size
+            paths.append(path)
+        with self._lock:
+            self._size = self._current_size() + written
+            if self._size > self.max_bytes:
+                self._evict(keep=set(paths))
+
+    def _current_size(self) -> int:
+        if self._size is None:
+            self._size = sum(p.stat().st_size for p in self.root.rglob("*.png"))
+        return self._size
+
+    def _evict(self, keep=()) -> None:
+        """Borra los PNG menos usados hasta quedar en el 90 % del tope."""
+        files = []
+        for path in self.root.rglob("*.png"):
+            if path in keep:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files) + sum(p.stat().st_size for p in keep)
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                continue
+        self._size = total
+
+
+_cache: Optional[PageCache] = None
+_cache_lock = threading.Lock()
+# Evita rasterizar dos veces la misma página ante requests simultáneos
+_render_locks: Dict[Tuple[str, int], threading.Lock] = {}
+
+
+def get_page_cache() -> PageCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                settings = get_settings()
+                _cache = PageCache(
+                    settings.render_cache_dir, settings.render_cache_max_mb * 1024 * 1024
+                )
+    return _cache
+
+
+def cache_page_image(doc_id: str, page: int, image) -> None:
+    """Guarda una página ya rasterizada (p. ej. por el OCR); nunca falla el pipeline."""
+    try:
+        get_page_cache().put(doc_id, page, image)
+    except Exception:
+        logger.warning("No se pudo cachear la página %s de %s", page, doc_id, exc_info=True)
+
+
+def page_count(path: Path) -> Optional[int]:
+    """Cantidad de páginas de un PDF sin rasterizarlo; `None` si no se puede leer."""
+    from .processing import _pypdf2
+
+    PyPDF2 = _pypdf2()
+    if PyPDF2 is None:
+        return None
+    try:
+        with open(path, "rb") as fh:
+            return len(PyPDF2.PdfReader(fh).pages)
+    except Exception:
+        return None
+
+
+def _rasterize(doc: Document, page: int):
+    from .processing import _convert_from_path, _pil_image
+
+    Image = _pil_image()
+    if Image is None:
+        raise RenderUnavailable("Pillow no está instalado")
+    with local_file(doc.storage_path) as path:
+        if path.suffix.lower() in IMAGE_SUFFIXES:
+            if page != 1:
+                return None
+            with Image.open(path) as img:
+                img.load()
+                return img.copy()
+        if doc.mime != "application/pdf" and path.suffix.lower() != ".pdf":
+            raise RenderUnavailable(f"No se pueden renderizar archivos {doc.mime}")
+        total = page_count(path)
+        if total is not None and page > total:
+            return None
+        convert_from_path = _convert_from_path()
+        if convert_from_path is None:
+            raise RenderUnavailable("pdf2image no está instalado")
+        try:
+            images = convert_from_path(
+                str(path), dpi=RASTER_DPI, first_page=page, last_page=page
+            )
+        except Exception as exc:
+            raise RenderUnavailable(f"No se pudo rasterizar: {exc}") from exc
+        return images[0] if images else None
+
+
+def render_page(doc: Document, page: int, size: str = "preview") -> Optional[Path]:
+    """PNG de la página `page` (desde 1) en la variante `size`.
+
+    Primero busca en la caché (llenada también por el OCR); si no está
+    rasteriza solo esa página. `None` si la página no existe.
+    """
+    from .scheduler import raster_budget, raster_bytes
+
+    cache = get_page_cache()
+    cached = cache.get(doc.id, page, size)
+    if cached is not None:
+        return cached
+    with _cache_lock:
+        lock = _render_locks.setdefault((doc.id, page), threading.Lock())
+    with lock:
+        # Otro request pudo haberla generado mientras esperábamos
+        if cache.path(doc.id, page, size).exists():
+            return cache.path(doc.id, page, size)
+        # Comparte el presupuesto de memoria con el OCR: un pico de previews
+        # no debe sumarse sin límite a los lotes que se están reconociendo
+        with raster_budget().reserve(raster_bytes(RASTER_DPI)):
+            with span("render.page", page=page):
+                image = _rasterize(doc, page)
+            if image is None:
+                return None
+            cache.put(doc.id, page, image)
+    _render_locks.pop((doc.id, page), None)
+    return cache.path(doc.id, page, size)
+
+
+register_cache(
+    "page_render", lambda: (get_page_cache().hits, get_page_cache().misses)
+)
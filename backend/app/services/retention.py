@@ -0,0 +1,184 @@
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from ..core.config import get_settings
+from ..core.metrics import counter
+from ..models.document import ProcessingLog
+from .compression import (
+    MIN_COMPRESS_BYTES,
+    compressed_writer,
+    file_suffix,
+    pack_text,
+    unpack_text,
+)
+from .search import rebuild_search_index
+
+logger = logging.getLogger(__name__)
+
+LOGS_ARCHIVED = counter(
+    "inova_processing_logs_archived_total",
+    "Filas históricas de processing_logs movidas a archivos fríos.",
+)
+
+BATCH_SIZE = 500
+
+
+def _open_archive(directory: Path):
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S-%f")
+    path = directory / f"processing_logs-{stamp}.jsonl{file_suffix()}"
+    raw = open(path, "wb")
+    return path, raw, compressed_writer(raw)
+
+
+def _row(log: ProcessingLog) -> Dict[str, object]:
+    return {
+        "id": log.id,
+        "document_id": log.document_id,
+        "step": log.step,
+        "payload": unpack_text(log.payload, log.payload_blob),
+        "success": log.success,
+        "duration_ms": log.duration_ms,
+        "created_at": log.created_at.isoformat() if log.created_at else None,
+    }
+
+
+def superseded_log_ids(db: Session, keep: int = 1, limit: int = BATCH_SIZE) -> List[str]:
+    """Ids de logs que ya no son de los `keep` más recientes de su (documento, paso)."""
+    ranked = select(
+        ProcessingLog.id,
+        func.row_number()
+        .over(
+            partition_by=(ProcessingLog.document_id, ProcessingLog.step),
+            order_by=(ProcessingLog.created_at.desc(), ProcessingLog.id.desc()),
+        )
+        .label("position"),
+    ).subquery()
+    return list(
+        db.execute(select(ranked.c.id).where(ranked.c.position > keep).limit(limit))
+        .scalars()
+        .all()
+    )
+
+
+def compact_processing_logs(
+    db: Session,
+    keep: Optional[int] = None,
+    archive_dir: Optional[str] = None,
+) -> Dict[str, object]:
+    """Deja solo los `keep` resultados más recientes por documento y paso.
+
+    Las filas reemplazadas se escriben a un JSONL comprimido (zstd o gzip) en
+    `archive_dir` antes de borrarse; sin `archive_dir` simplemente se borran.
+    Se procesa por lotes para no cargar todo el historial en memoria.
+    """
+    settings = get_settings()
+    keep = max(1, keep if keep is not None else settings.log_retention_keep)
+    archive_dir = archive_dir if archive_dir is not None else settings.log_archive_dir
+
+    archived = 0
+    archive_path = raw = writer = None
+    try:
+        while True:
+            ids = superseded_log_ids(db, keep=keep)
+            if not ids:
+                break
+            if archive_dir:
+                if writer is None:
+                    archive_path, raw, writer = _open_archive(Path(archive_dir))
+                logs = db.execute(
+                    select(ProcessingLog).where(ProcessingLog.id.in_(ids))
+                ).scalars()
+                for log in logs:
+                    writer.write((json.dumps(_row(log)) + "\n").encode("utf-8"))
+                writer.flush()
+            db.execute(delete(ProcessingLog).where(ProcessingLog.id.in_(ids)))
+            db.commit()
+            archived += len(ids)
+    finally:
+        if writer is not None:
+            writer.close()
+            raw.close()
+
+    if archived:
+        LOGS_ARCHIVED.inc(archived)
+        logger.info("processing_logs compactados: %s filas -> %s", archived, archive_path)
+    return {
+        "removed": archived,
+        "archive": str(archive_path) if archive_path else None,
+    }
+
+
+def compress_payloads(db: Session, batch_size: int = BATCH_SIZE) -> int:
+    """Comprime payloads grandes guardados como texto antes de existir `payload_blob`."""
+    compressed = 0
+    while True:
+        logs = (
+            db.execute(
+                select(ProcessingLog)
+                .where(
+                    ProcessingLog.payload_blob.is_(None),
+                    func.length(ProcessingLog.payload) >= MIN_COMPRESS_BYTES,
+                )
+                .limit(batch_size)
+            )
+            .scalars()
+            .all()
+        )
+        changed = 0
+        for log in logs:
+            text, blob = pack_text(log.payload, kind=f"log_{log.step}")
+            if blob is not None:
+                log.payload, log.payload_blob = text, blob
+                changed += 1
+        db.commit()
+        compressed += changed
+        # Lo que no se achica queda como texto; cortar para no volver a leerlo
+        if len(logs) < batch_size or not changed:
+            return compressed
+
+
+def reclaim_space(engine: Engine, pages: int = 0) -> Dict[str, object]:
+    """Devuelve al sistema el espacio libre de SQLite.
+
+    La primera vez cambia la base a `auto_vacuum=INCREMENTAL` (requiere un VACUUM
+    completo); desde entonces basta `incremental_vacuum`, que no bloquea la base
+    durante minutos como un VACUUM.
+    """
+    if engine.dialect.name != "sqlite":
+        return {"mode": None}
+    # VACUUM no puede correr dentro de una transacción
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        mode = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+        free_before = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        if mode != 2:
+            conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.exec_driver_sql("VACUUM")
+            # VACUUM puede renumerar los rowid implícitos que indexa el FTS
+            rebuild_search_index(conn)
+            action = "vacuum"
+        else:
+            conn.exec_driver_sql(
+                f"PRAGMA incremental_vacuum({int(pages)})" if pages else "PRAGMA incremental_vacuum"
+            )
+            action = "incremental_vacuum"
+        free_after = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+    return {"mode": action, "freed_pages": max(0, (free_before or 0) - (free_after or 0))}
+
+
+def run_retention(engine: Engine) -> Dict[str, object]:
+    """Compactación + recuperación de espacio; la usa la tarea de fondo y el CLI."""
+    with Session(engine) as db:
+        result = compact_processing_logs(db)
+        result["compressed"] = compress_payloads(db)
+    if result["removed"] or result["compressed"]:
+        result["vacuum"] = reclaim_space(engine)
+    return result
+
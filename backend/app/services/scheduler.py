@@ -0,0 +1,446 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import or_, select, update
+
+from ..core.config import get_settings
+from ..core.db import session_scope
+from ..core.metrics import gauge, histogram
+from ..models.document import Document
+from .compression import is_compressed_path
+from .events import publish
+from .render import page_count
+from .storage import LocalStorage, storage_for
+
+logger = logging.getLogger(__name__)
+
+# Clases de prioridad, de mayor a menor
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+PENDING_STATUSES = ("queued", "processing")
+
+# Dueño de los documentos que este proceso tiene en cola o procesándose; con
+# `uvicorn --workers N` o varios nodos sobre la misma base cada uno tiene el suyo
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Sin conteo de páginas (S3, comprimido, ilegible) se estima por tamaño
+BYTES_PER_PAGE_ESTIMATE = 150 * 1024
+MAX_COST = 500
+
+QUEUE_DEPTH = gauge(
+    "inova_scheduler_queue_depth",
+    "Documentos esperando worker, por clase de prioridad.",
+    ("priority",),
+)
+QUEUE_WAIT = histogram(
+    "inova_scheduler_wait_seconds",
+    "Tiempo en cola antes de empezar a procesarse, por clase de prioridad.",
+    ("priority",),
+)
+OCR_IN_USE = gauge("inova_ocr_slots_in_use", "Páginas/documentos en OCR en este momento.")
+OCR_WAITING = gauge("inova_ocr_slots_waiting", "Workers esperando un cupo de OCR.")
+RASTER_IN_USE = gauge(
+    "inova_raster_budget_bytes_in_use", "Bytes de páginas rasterizadas reservados en memoria."
+)
+RASTER_WAITING = gauge(
+    "inova_raster_budget_waiting", "Workers esperando presupuesto para rasterizar."
+)
+
+# Página más grande esperable (A4 de alto, carta de ancho), en pulgadas
+PAGE_INCHES = (8.5, 11.69)
+# RGB de pdf2image más las copias en grises/rotada del preprocesamiento
+BYTES_PER_PIXEL = 5
+
+
+@dataclass
+class Job:
+    doc_id: str
+    priority: str
+    cost: int
+    tenant: str
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class _PriorityClass:
+    """Cola de una prioridad con reparto justo entre embarques.
+
+    Cada embarque (tenant) tiene su FIFO y un tiempo virtual que avanza con el
+    costo (páginas) de lo que se le despacha; se atiende siempre al de menor
+    tiempo virtual. Así un full set de 80 páginas no bloquea el documento de
+    una página de otro embarque, y los documentos chicos salen antes.
+    """
+
+    def __init__(self):
+        self.queues: Dict[str, Deque[Job]] = {}
+        self.virtual_time: Dict[str, float] = {}
+        self.clock = 0.0
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+    def push(self, job: Job) -> None:
+        queue = self.queues.get(job.tenant)
+        if queue is None:
+            queue = self.queues[job.tenant] = deque()
+            # Un embarque que recién llega no arrastra crédito ni deuda viejos
+            self.virtual_time[job.tenant] = self.clock
+        queue.append(job)
+
+    def oldest_wait(self, now: float) -> float:
+        return max((now - q[0].enqueued_at for q in self.queues.values()), default=0.0)
+
+    def pop(self) -> Job:
+        tenant = min(
+            self.queues, key=lambda t: (self.virtual_time[t], self.queues[t][0].enqueued_at)
+        )
+        queue = self.queues[tenant]
+        job = queue.popleft()
+        self.clock = self.virtual_time[tenant]
+        self.virtual_time[tenant] += job.cost
+        if not queue:
+            # `push` vuelve a partir desde `clock` si el embarque regresa; sin esto
+            # cada documento sin embarque (tenant = su id) dejaría una entrada
+            del self.queues[tenant]
+            del self.virtual_time[tenant]
+        return job
+
+
+def estimate_cost(doc: Document) -> int:
+    """Costo relativo del documento en páginas; el OCR escala con ellas."""
+    mime = doc.mime or ""
+    location = doc.storage_path or ""
+    if mime.startswith("image/") or mime.startswith("text/"):
+        return 1
+    if mime == "application/pdf" and location and not is_compressed_path(location):
+        if isinstance(storage_for(location), LocalStorage):
+            pages = page_count(Path(location))
+            if pages:
+                return min(pages, MAX_COST)
+    return max(1, min(MAX_COST, (doc.size or 0) // BYTES_PER_PAGE_ESTIMATE))
+
+
+class ProcessingScheduler:
+    """Cola de procesamiento con prioridades y pool fijo de workers.
+
+    `interactive` (uploads) se atiende antes que `batch` (reprocesos), salvo
+    que un batch lleve más de `scheduler_batch_max_wait` segundos esperando:
+    entonces pasa primero para no quedar postergado indefinidamente.
+    """
+
+    def __init__(self, workers: int, batch_max_wait: float, lease: float = 0.0):
+        self.workers = max(1, workers)
+        self.batch_max_wait = batch_max_wait
+        # Con lease > 0 un hilo aparte renueva el latido de lo propio y reclama
+        # lo ajeno vencido cada tercio del lease
+        self.lease = lease
+        self._classes = {priority: _PriorityClass() for priority in PRIORITIES}
+        self._queued: Dict[str, Job] = {}
+        self._running: Dict[str, Job] = {}
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        # Aparte de `_condition`: un `notify` de `submit` debe despertar a un worker
+        self._stop_maintenance = threading.Event()
+
+    def start(self) -> None:
+        with self._condition:
+            if self._threads:
+                return
+            self._stopping = False
+            self._stop_maintenance.clear()
+            for index in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker, name=f"processing-{index}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            if self.lease > 0:
+                thread = threading.Thread(
+                    target=self._maintenance, name="processing-lease", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._condition:
+            self._stopping = True
+            self._stop_maintenance.set()
+            self._condition.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def submit(self, doc: Document, priority: str = INTERACTIVE) -> Optional[Job]:
+        """Encola un documento; `None` si ya estaba en cola o procesándose."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Prioridad desconocida: {priority}")
+        job = Job(
+            doc_id=doc.id,
+            priority=priority,
+            cost=estimate_cost(doc),
+            tenant=doc.shipment_id or doc.id,
+        )
+        with self._condition:
+            if doc.id in self._queued or doc.id in self._running:
+                return None
+            self._classes[priority].push(job)
+            self._queued[doc.id] = job
+            self._condition.notify()
+        self.start()
+        return job
+
+    def is_pending(self, doc_id: str) -> bool:
+        """Si el documento está en cola o procesándose."""
+        with self._condition:
+            return doc_id in self._queued or doc_id in self._running
+
+    def pending_ids(self) -> List[str]:
+        with self._condition:
+            return [*self._queued, *self._running]
+
+    def depth(self) -> Dict[str, int]:
+        with self._condition:
+            return {priority: len(queue) for priority, queue in self._classes.items()}
+
+    def snapshot(self) -> dict:
+        with self._condition:
+            return {
+                "workers": self.workers,
+                "running": len(self._running),
+                "queued": {p: len(q) for p, q in self._classes.items()},
+                "queued_cost": sum(job.cost for job in self._queued.values()),
+            }
+
+    def _next_job(self) -> Optional[Job]:
+        interactive = self._classes[INTERACTIVE]
+        batch = self._classes[BATCH]
+        if len(batch) and (
+            not len(interactive) or batch.oldest_wait(time.monotonic()) > self.batch_max_wait
+        ):
+            return batch.pop()
+        if len(interactive):
+            return interactive.pop()
+        return None
+
+    def _worker(self) -> None:
+        from .processing import run_document_job
+
+        while True:
+            with self._condition:
+                job = None
+                while job is None:
+                    if self._stopping:
+                        return
+                    job = self._next_job()
+                    if job is None:
+                        self._condition.wait()
+                del self._queued[job.doc_id]
+                self._running[job.doc_id] = job
+            QUEUE_WAIT.observe(time.monotonic() - job.enqueued_at, priority=job.priority)
+            try:
+                run_document_job(job.doc_id)
+            except Exception:
+                logger.exception("Falló el job de %s", job.doc_id)
+            finally:
+                with self._condition:
+                    self._running.pop(job.doc_id, None)
+
+    def _maintenance(self) -> None:
+        while not self._stop_maintenance.wait(self.lease / 3):
+            try:
+                heartbeat(self.pending_ids())
+                recover_pending()
+            except Exception:
+                logger.exception("Falló la renovación de documentos pendientes")
+
+
+_scheduler: Optional[ProcessingScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> ProcessingScheduler:
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                settings = get_settings()
+                _scheduler = ProcessingScheduler(
+                    settings.max_concurrent_processing,
+                    settings.scheduler_batch_max_wait,
+                    settings.scheduler_lease_seconds,
+                )
+    return _scheduler
+
+
+def enqueue(doc: Document, priority: str = INTERACTIVE) -> Optional[Job]:
+    job = get_scheduler().submit(doc, priority)
+    if job is not None:
+        publish(
+            doc.id,
+            "queued",
+            shipment_id=doc.shipment_id,
+            filename=doc.filename,
+            priority=job.priority,
+            cost=job.cost,
+        )
+    return job
+
+
+def claim(doc: Document) -> None:
+    """Marca `doc` como de este worker; va en el mismo commit que lo deja pendiente."""
+    doc.owner = WORKER_ID
+    doc.heartbeat_at = datetime.utcnow()
+
+
+def heartbeat(doc_ids: Iterable[str]) -> None:
+    """Renueva el latido de los documentos que este worker tiene pendientes."""
+    doc_ids = list(doc_ids)
+    if not doc_ids:
+        return
+    with session_scope() as db:
+        db.execute(
+            update(Document)
+            .where(Document.id.in_(doc_ids), Document.owner == WORKER_ID)
+            # Sin tocar updated_at: versiona la caché de insights y el export
+            .values(heartbeat_at=datetime.utcnow(), updated_at=Document.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def recover_pending() -> int:
+    """Reclama y re-encola como batch lo pendiente cuyo worker dejó de latir.
+
+    El reclamo es un solo UPDATE condicionado al latido vencido: con varios
+    workers o nodos sobre la misma base cada documento lo gana uno solo, y
+    nunca se quita uno que su dueño sigue procesando. Corre al arrancar y luego
+    periódicamente, así lo de un proceso caído se retoma al vencer su lease.
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=get_settings().scheduler_lease_seconds)
+    with session_scope() as db:
+        claimed = db.execute(
+            update(Document)
+            .where(
+                Document.status.in_(PENDING_STATUSES),
+                or_(Document.heartbeat_at.is_(None), Document.heartbeat_at < stale),
+            )
+            .values(status="queued", owner=WORKER_ID, heartbeat_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            return 0
+        db.commit()
+        docs = (
+            db.execute(
+                select(Document)
+                .where(
+                    Document.owner == WORKER_ID,
+                    Document.heartbeat_at == now,
+                    Document.status == "queued",
+                )
+                .order_by(Document.created_at)
+            )
+            .scalars()
+            .all()
+        )
+        recovered = [doc for doc in docs if enqueue(doc, BATCH) is not None]
+    if recovered:
+        logger.info("Re-encolados %s documentos pendientes", len(recovered))
+    return len(recovered)
+
+
+QUEUE_DEPTH.set_function(
+    lambda: {(p,): float(n) for p, n in get_scheduler().depth().items()}
+)
+
+
+_ocr_semaphore: Optional[threading.BoundedSemaphore] = None
+
+
+@contextmanager
+def ocr_slot() -> Iterator[None]:
+    """Cupo para reconocer una página (`max_concurrent_ocr`).
+
+    Tesseract satura un core por página: se limita aparte de los workers para
+    que los PDF vectoriales y el resto de las etapas no esperen a los escaneos.
+    """
+    global _ocr_semaphore
+    if _ocr_semaphore is None:
+        with _scheduler_lock:
+            if _ocr_semaphore is None:
+                _ocr_semaphore = threading.BoundedSemaphore(
+                    max(1, get_settings().max_concurrent_ocr)
+                )
+    OCR_WAITING.inc()
+    _ocr_semaphore.acquire()
+    OCR_WAITING.dec()
+    OCR_IN_USE.inc()
+    try:
+        yield
+    finally:
+        OCR_IN_USE.dec()
+        _ocr_semaphore.release()
+
+
+def raster_bytes(dpi: int, pages: int = 1) -> int:
+    """Memoria estimada de `pages` páginas rasterizadas a `dpi` mientras se procesan."""
+    width, height = (int(inches * max(1, dpi)) for inches in PAGE_INCHES)
+    return width * height * BYTES_PER_PIXEL * max(1, pages)
+
+
+class MemoryBudget:
+    """Bytes reservables entre todos los workers; quien no entra espera.
+
+    Un pedido mayor que el total se recorta al total: pasa solo, cuando no
+    queda nadie más rasterizando, en vez de bloquearse para siempre.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.used = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def reserve(self, nbytes: int) -> Iterator[None]:
+        nbytes = max(0, min(nbytes, self.capacity))
+        with self._condition:
+            if self.used + nbytes > self.capacity:
+                RASTER_WAITING.inc()
+                try:
+                    while self.used + nbytes > self.capacity:
+                        self._condition.wait()
+                finally:
+                    RASTER_WAITING.dec()
+            self.used += nbytes
+            RASTER_IN_USE.inc(nbytes)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.used -= nbytes
+                RASTER_IN_USE.dec(nbytes)
+                self._condition.notify_all()
+
+
+_raster_budget: Optional[MemoryBudget] = None
+
+
+def raster_budget() -> MemoryBudget:
+    """Presupuesto compartido (`raster_budget_mb`) para imágenes de páginas en memoria."""
+    global _raster_budget
+    if _raster_budget is None:
+        with _scheduler_lock:
+            if _raster_budget is None:
+                _raster_budget = MemoryBudget(get_settings().raster_budget_mb * 1024 * 1024)
+    return _raster_budget
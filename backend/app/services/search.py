@@ -0,0 +1,315 @@
+import re
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from ..models.document import Document, DocumentPage, ProcessingLog
+from .compression import unpack_json
+from .layout import Line, pack_layout
+
+# Separador de páginas en el texto extraído (pdfminer ya usa "\f")
+PAGE_BREAK = "\n\f"
+FTS_TABLE = "document_pages_fts"
+SNIPPET_TOKENS = 12
+MARK_START, MARK_END = "<mark>", "</mark>"
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+# Índice externo sobre document_pages: el texto no se duplica y los triggers
+# lo mantienen al insertar/borrar páginas. Va por el rowid implícito, que un
+# VACUUM puede renumerar: ver `rebuild_search_index`.
+_FTS_DDL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text,
+        content='document_pages',
+        content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS document_pages_ai AFTER INSERT ON document_pages BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.rowid, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS document_pages_ad AFTER DELETE ON document_pages BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.rowid, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS document_pages_au AFTER UPDATE ON document_pages BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.rowid, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.rowid, new.text);
+    END""",
+)
+
+
+def split_pages(text: str) -> List[str]:
+    pages = [page.strip() for page in (text or "").split("\f")]
+    return [page for page in pages if page] or [""]
+
+
+def search_terms(query: str) -> List[str]:
+    return _TERM_RE.findall(query or "")
+
+
+class SearchBackend:
+    """Búsqueda full-text sobre `document_pages`.
+
+    `index_document` reemplaza las páginas de un documento; `search` devuelve
+    documentos ordenados por relevancia con sus páginas coincidentes.
+    """
+
+    name = "base"
+
+    def index_document(
+        self,
+        db: Session,
+        doc_id: str,
+        pages: Sequence[str],
+        layouts: Optional[Sequence[Sequence[Line]]] = None,
+    ) -> None:
+        """`layouts`, si se entrega, trae los renglones posicionados de cada página."""
+        layouts = layouts or []
+        db.execute(delete(DocumentPage).where(DocumentPage.document_id == doc_id))
+        db.add_all(
+            DocumentPage(
+                id=str(uuid.uuid4()),
+                document_id=doc_id,
+                page=number,
+                text=page,
+                layout_blob=pack_layout(layouts[number - 1]) if number <= len(layouts) else None,
+            )
+            for number, page in enumerate(pages, start=1)
+        )
+
+    def search(
+        self, db: Session, query: str, limit: int = 20, offset: int = 0
+    ) -> List[Dict[str, object]]:
+        raise NotImplementedError
+
+
+class LikeSearchBackend(SearchBackend):
+    """Respaldo para motores sin FTS5: LIKE por término, sin índice."""
+
+    name = "like"
+
+    def search(self, db, query, limit=20, offset=0):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        # `_` es parte de \w: sin escapar sería comodín ("SA_1690" calzaría "SA-1690")
+        conditions = [
+            DocumentPage.text.ilike(f"%{_escape_like(term)}%", escape="\\") for term in terms
+        ]
+        matched = select(DocumentPage.document_id, DocumentPage.page, DocumentPage.text)
+        for condition in conditions:
+            matched = matched.where(condition)
+        rows = db.execute(matched.order_by(DocumentPage.document_id, DocumentPage.page)).all()
+
+        hits: Dict[str, List[Dict[str, object]]] = {}
+        for doc_id, page, page_text in rows:
+            score = float(sum(page_text.casefold().count(t.casefold()) for t in terms))
+            hits.setdefault(doc_id, []).append(
+                {"page": page, "snippet": _python_snippet(page_text, terms), "score": score}
+            )
+        ranked = sorted(hits.items(), key=lambda item: -max(h["score"] for h in item[1]))
+        return [
+            {
+                "document_id": doc_id,
+                "score": max(h["score"] for h in doc_hits),
+                "hits": sorted(doc_hits, key=lambda h: -h["score"]),
+            }
+            for doc_id, doc_hits in ranked[offset : offset + limit]
+        ]
+
+
+class SqliteFtsBackend(SearchBackend):
+    """FTS5 con ranking bm25 y `snippet()` calculados dentro de SQLite."""
+
+    name = "fts5"
+
+    def search(self, db, query, limit=20, offset=0):
+        match = fts_query(query)
+        if not match:
+            return []
+        # bm25 es negativo: más bajo = más relevante
+        best = db.execute(
+            text(
+                # MATERIALIZED: bm25() no puede evaluarse dentro de un agregado
+                f"""WITH ranked AS MATERIALIZED (
+                    SELECT rowid, bm25({FTS_TABLE}) AS rank
+                    FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match
+                )
+                SELECT p.document_id, MIN(ranked.rank) AS best
+                FROM ranked JOIN document_pages p ON p.rowid = ranked.rowid
+                GROUP BY p.document_id
+                ORDER BY best LIMIT :limit OFFSET :offset"""
+            ),
+            {"match": match, "limit": limit, "offset": offset},
+        ).all()
+        if not best:
+            return []
+
+        doc_ids = [row[0] for row in best]
+        params = {"match": match, **{f"d{i}": d for i, d in enumerate(doc_ids)}}
+        placeholders = ", ".join(f":d{i}" for i in range(len(doc_ids)))
+        rows = db.execute(
+            text(
+                f"""SELECT p.document_id, p.page,
+                    snippet({FTS_TABLE}, 0, '{MARK_START}', '{MARK_END}', '…', {SNIPPET_TOKENS}),
+                    bm25({FTS_TABLE}) AS rank
+                FROM {FTS_TABLE} JOIN document_pages p ON p.rowid = {FTS_TABLE}.rowid
+                WHERE {FTS_TABLE} MATCH :match AND p.document_id IN ({placeholders})
+                ORDER BY rank"""
+            ),
+            params,
+        ).all()
+        hits: Dict[str, List[Dict[str, object]]] = {}
+        for doc_id, page, snippet, rank in rows:
+            hits.setdefault(doc_id, []).append(
+                {"page": page, "snippet": snippet, "score": -rank}
+            )
+        return [
+            {"document_id": doc_id, "score": -rank, "hits": hits.get(doc_id, [])}
+            for doc_id, rank in best
+        ]
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def fts_query(query: str) -> str:
+    """Consulta FTS5 segura: cada término entre comillas, todos obligatorios.
+
+    Evita errores de sintaxis con entradas como "MSCU-1234567" o "N°".
+    Una consulta entre comillas dobles se busca como frase.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return ""
+    stripped = (query or "").strip()
+    if len(stripped) > 1 and stripped.startswith('"') and stripped.endswith('"'):
+        return '"' + " ".join(terms) + '"'
+    return " AND ".join(f'"{term}"' for term in terms)
+
+
+def _python_snippet(page_text: str, terms: Sequence[str], width: int = 60) -> str:
+    lowered = page_text.casefold()
+    positions = [p for p in (lowered.find(t.casefold()) for t in terms) if p >= 0]
+    if not positions:
+        return page_text[: width * 2]
+    start = max(0, min(positions) - width)
+    snippet = page_text[start : min(positions) + width]
+    for term in terms:
+        snippet = re.sub(
+            re.escape(term), lambda m: f"{MARK_START}{m.group(0)}{MARK_END}", snippet,
+            flags=re.IGNORECASE,
+        )
+    return ("…" if start else "") + " ".join(snippet.split())
+
+
+_backends: Dict[int, SearchBackend] = {}
+
+
+def _fts5_available(engine: Engine) -> bool:
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.connect() as conn:
+        options = {row[0] for row in conn.exec_driver_sql("PRAGMA compile_options")}
+    return "ENABLE_FTS5" in options
+
+
+def ensure_search_index(engine: Engine) -> SearchBackend:
+    """Crea el índice FTS5 (si el motor lo soporta) y completa páginas faltantes."""
+    if not _fts5_available(engine):
+        backend: SearchBackend = LikeSearchBackend()
+    else:
+        backend = SqliteFtsBackend()
+        with engine.begin() as conn:
+            exists = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (FTS_TABLE,)
+            ).first()
+            for statement in _FTS_DDL:
+                conn.exec_driver_sql(statement)
+            if not exists:
+                # Indexar páginas que existían antes de crear la tabla virtual
+                conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    _backends[id(engine)] = backend
+    with Session(engine) as db:
+        backfill_pages(db, backend)
+        db.commit()
+    return backend
+
+
+def rebuild_search_index(conn) -> bool:
+    """Reconstruye el índice FTS5 desde `document_pages`, si existe.
+
+    El índice externo usa el `rowid` implícito de `document_pages` (su clave es
+    texto) y un VACUUM puede renumerarlo: sin reconstruir, los resultados
+    apuntarían a otras páginas. Llamar después de cada VACUUM.
+    """
+    if conn.engine.dialect.name != "sqlite":
+        return False
+    exists = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (FTS_TABLE,)
+    ).first()
+    if exists:
+        conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return bool(exists)
+
+
+def get_search_backend(db: Session) -> SearchBackend:
+    engine = db.get_bind()
+    backend = _backends.get(id(engine))
+    if backend is None:
+        backend = ensure_search_index(engine)
+    return backend
+
+
+def backfill_pages(db: Session, backend: Optional[SearchBackend] = None) -> int:
+    """Genera páginas para documentos procesados antes de existir el índice."""
+    backend = backend or get_search_backend(db)
+    latest = (
+        select(ProcessingLog.document_id, func.max(ProcessingLog.created_at).label("at"))
+        .where(ProcessingLog.step == "ocr")
+        .group_by(ProcessingLog.document_id)
+        .subquery()
+    )
+    missing = db.execute(
+        select(ProcessingLog.document_id, ProcessingLog.payload, ProcessingLog.payload_blob)
+        .join(
+            latest,
+            (latest.c.document_id == ProcessingLog.document_id)
+            & (latest.c.at == ProcessingLog.created_at),
+        )
+        .where(ProcessingLog.step == "ocr")
+        .where(
+            ~select(DocumentPage.id)
+            .where(DocumentPage.document_id == ProcessingLog.document_id)
+            .exists()
+        )
+    ).all()
+    for doc_id, payload, blob in missing:
+        page_text = unpack_json(payload, blob).get("text", "")
+        backend.index_document(db, doc_id, split_pages(page_text))
+    return len(missing)
+
+
+def search_documents(
+    db: Session, query: str, limit: int = 20, offset: int = 0
+) -> List[Dict[str, object]]:
+    results = get_search_backend(db).search(db, query, limit=limit, offset=offset)
+    if not results:
+        return results
+    docs = {
+        row.id: row
+        for row in db.execute(
+            select(Document.id, Document.filename, Document.doc_type).where(
+                Document.id.in_([r["document_id"] for r in results])
+            )
+        ).all()
+    }
+    for result in results:
+        doc = docs.get(result["document_id"])
+        result["filename"] = doc.filename if doc else None
+        result["doc_type"] = doc.doc_type if doc else None
+    return results
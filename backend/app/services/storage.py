@@ -1,23 +1,395 @@
 import os
+import shutil
+import tempfile
+import threading
+import time
 import uuid
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+from urllib.parse import quote
+
 from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
 from ..core.config import get_settings
+from .compression import (
+    BYTES_IN,
+    BYTES_OUT,
+    compressed_writer,
+    decompressed_reader,
+    file_suffix,
+    is_compressed_path,
+)
+
+# Tipos que comprimen bien; PDF e imágenes ya vienen comprimidos
+COMPRESSIBLE_MIMES = {"application/json", "application/xml"}
+READ_CHUNK = 1024 * 1024
+S3_SCHEME = "s3://"
+# Mínimo de S3 para las partes de un multipart (salvo la última)
+S3_MIN_PART_BYTES = 5 * 1024 * 1024
+
+
+def should_compress(mime: str) -> bool:
+    mode = get_settings().upload_compression
+    if mode == "all":
+        return True
+    if mode == "text":
+        return bool(mime) and (mime.startswith("text/") or mime in COMPRESSIBLE_MIMES)
+    return False
+
+
+class StorageBackend:
+    """Dónde viven los archivos originales.
+
+    Las ubicaciones se guardan en `Document.storage_path`: una ruta absoluta
+    para disco local y `s3://bucket/clave` para almacenamiento de objetos, de
+    modo que cada documento sigue legible aunque cambie el backend configurado.
+    """
+
+    name = "base"
+
+    def writer(self, name: str) -> "BlobWriter":
+        raise NotImplementedError
+
+    def open(self, location: str) -> BinaryIO:
+        raise NotImplementedError
+
+    def exists(self, location: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, location: str) -> None:
+        raise NotImplementedError
+
+    def presigned_url(self, location: str, filename: Optional[str] = None) -> Optional[str]:
+        """URL temporal de descarga directa; `None` si el backend no la ofrece."""
+        return None
+
+    def check(self) -> dict:
+        raise NotImplementedError
+
+    @contextmanager
+    def open_decompressed(self, location: str) -> Iterator[BinaryIO]:
+        with closing(self.open(location)) as raw, decompressed_reader(raw, location) as reader:
+            yield reader
+
+    def iter_bytes(self, location: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Contenido descomprimido por bloques, para `StreamingResponse`."""
+        with self.open_decompressed(location) as reader:
+            for chunk in iter(lambda: reader.read(chunk_size), b""):
+                yield chunk
+
+
+class BlobWriter:
+    """Flujo de escritura de un upload; `location` es válido tras `close()`."""
+
+    location: str
+
+    def write(self, data: bytes) -> int:
+        raise NotImplementedError
+
+    def tell(self) -> int:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+    def abort(self) -> None:
+        raise NotImplementedError
+
+
+class _LocalWriter(BlobWriter):
+    def __init__(self, path: str):
+        self.location = path
+        self._fh = open(path, "wb")
+
+    def write(self, data: bytes) -> int:
+        return self._fh.write(data)
+
+    def tell(self) -> int:
+        return self._fh.tell()
+
+    def flush(self) -> None:
+        self._fh.flush()
+
+    def close(self) -> None:
+        self._fh.close()
+
+    def abort(self) -> None:
+        self._fh.close()
+        if os.path.exists(self.location):
+            os.unlink(self.location)
+
+
+class LocalStorage(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def writer(self, name: str) -> BlobWriter:
+        os.makedirs(self.root, exist_ok=True)
+        return _LocalWriter(os.path.join(self.root, name))
+
+    def open(self, location: str) -> BinaryIO:
+        return open(location, "rb")
+
+    def exists(self, location: str) -> bool:
+        return Path(location).is_file()
+
+    def delete(self, location: str) -> None:
+        if os.path.exists(location):
+            os.unlink(location)
+
+    def check(self) -> dict:
+        settings = get_settings()
+        try:
+            usage = shutil.disk_usage(self.root)
+        except OSError as exc:
+            return {"ok": False, "backend": self.name, "error": str(exc)}
+        free_mb = usage.free / (1024 * 1024)
+        return {
+            "ok": free_mb >= settings.readiness_min_free_storage_mb,
+            "backend": self.name,
+            "free_mb": round(free_mb, 1),
+            "total_mb": round(usage.total / (1024 * 1024), 1),
+            "min_free_mb": settings.readiness_min_free_storage_mb,
+        }
+
+
+def _split_s3(location: str):
+    bucket, _, key = location[len(S3_SCHEME):].partition("/")
+    return bucket, key
+
+
+class _S3MultipartWriter(BlobWriter):
+    """Sube por partes a medida que se escribe; nunca guarda el archivo entero."""
+
+    def __init__(self, storage: "S3Storage", key: str):
+        self._client = storage.client
+        self._bucket = storage.bucket
+        self._key = key
+        self._part_size = storage.part_size
+        self._buffer = bytearray()
+        self._parts = []
+        self._written = 0
+        self._upload_id = None
+        self.location = f"{S3_SCHEME}{storage.bucket}/{key}"
+
+    def write(self, data: bytes) -> int:
+        self._buffer.extend(data)
+        self._written += len(data)
+        while len(self._buffer) >= self._part_size:
+            self._upload_part(bytes(self._buffer[: self._part_size]))
+            del self._buffer[: self._part_size]
+        return len(data)
+
+    def tell(self) -> int:
+        return self._written
+
+    def _upload_part(self, body: bytes) -> None:
+        if self._upload_id is None:
+            self._upload_id = self._client.create_multipart_upload(
+                Bucket=self._bucket, Key=self._key
+            )["UploadId"]
+        number = len(self._parts) + 1
+        response = self._client.upload_part(
+            Bucket=self._bucket,
+            Key=self._key,
+            UploadId=self._upload_id,
+            PartNumber=number,
+            Body=body,
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": number})
+
+    def close(self) -> None:
+        if self._upload_id is None:
+            # Archivo chico: un solo PUT
+            self._client.put_object(Bucket=self._bucket, Key=self._key, Body=bytes(self._buffer))
+            return
+        if self._buffer:
+            self._upload_part(bytes(self._buffer))
+        self._client.complete_multipart_upload(
+            Bucket=self._bucket,
+            Key=self._key,
+            UploadId=self._upload_id,
+            MultipartUpload={"Parts": self._parts},
+        )
+
+    def abort(self) -> None:
+        if self._upload_id is not None:
+            self._client.abort_multipart_upload(
+                Bucket=self._bucket, Key=self._key, UploadId=self._upload_id
+            )
+
+
+class S3Storage(StorageBackend):
+    """S3 o compatible (MinIO, Ceph) vía `boto3`, opcional.
+
+    El cliente se crea una vez por proceso y es thread-safe; su pool HTTP
+    (`s3_max_pool_connections`) se reutiliza entre requests y workers.
+    """
+
+    name = "s3"
+
+    def __init__(self, settings):
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError as exc:  # pragma: no cover - dependencia opcional
+            raise RuntimeError("storage_backend=s3 requiere `boto3`") from exc
+        if not settings.s3_bucket:
+            raise RuntimeError("storage_backend=s3 requiere `s3_bucket`")
+        self.bucket = settings.s3_bucket
+        self.prefix = settings.s3_prefix.strip("/")
+        self.part_size = max(S3_MIN_PART_BYTES, settings.s3_multipart_chunk_mb * 1024 * 1024)
+        self.presign_expiry = settings.s3_presign_expiry
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.s3_endpoint_url or None,
+            region_name=settings.s3_region or None,
+            aws_access_key_id=settings.s3_access_key or None,
+            aws_secret_access_key=settings.s3_secret_key or None,
+            config=Config(
+                max_pool_connections=settings.s3_max_pool_connections,
+                retries={"max_attempts": 3, "mode": "standard"},
+                # MinIO y similares suelen requerir direccionamiento por path
+                s3={"addressing_style": "path" if settings.s3_endpoint_url else "auto"},
+            ),
+        )
+
+    def writer(self, name: str) -> BlobWriter:
+        key = f"{self.prefix}/{name}" if self.prefix else name
+        return _S3MultipartWriter(self, key)
+
+    def open(self, location: str) -> BinaryIO:
+        bucket, key = _split_s3(location)
+        return self.client.get_object(Bucket=bucket, Key=key)["Body"]
+
+    def exists(self, location: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        bucket, key = _split_s3(location)
+        try:
+            self.client.head_object(Bucket=bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+
+    def delete(self, location: str) -> None:
+        bucket, key = _split_s3(location)
+        self.client.delete_object(Bucket=bucket, Key=key)
+
+    def presigned_url(self, location: str, filename: Optional[str] = None) -> Optional[str]:
+        bucket, key = _split_s3(location)
+        params = {"Bucket": bucket, "Key": key}
+        if filename:
+            # RFC 5987: nombres con tildes, "N°" o comillas llegan intactos
+            params["ResponseContentDisposition"] = (
+                f"attachment; filename*=utf-8''{quote(filename)}"
+            )
+        return self.client.generate_presigned_url(
+            "get_object", Params=params, ExpiresIn=self.presign_expiry
+        )
+
+    def check(self) -> dict:
+        start = time.perf_counter()
+        try:
+            self.client.head_bucket(Bucket=self.bucket)
+        except Exception as exc:
+            return {"ok": False, "backend": self.name, "bucket": self.bucket, "error": str(exc)}
+        return {
+            "ok": True,
+            "backend": self.name,
+            "bucket": self.bucket,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def _backend(kind: str) -> StorageBackend:
+    backend = _backends.get(kind)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(kind)
+            if backend is None:
+                settings = get_settings()
+                backend = S3Storage(settings) if kind == "s3" else LocalStorage(settings.storage_dir)
+                _backends[kind] = backend
+    return backend
+
+
+def get_storage() -> StorageBackend:
+    """Backend configurado para los archivos nuevos (`storage_backend`)."""
+    return _backend(get_settings().storage_backend)
+
+
+def storage_for(location: str) -> StorageBackend:
+    """Backend que puede leer `location`, sin importar la configuración actual."""
+    return _backend("s3" if (location or "").startswith(S3_SCHEME) else "local")
+
+
+@contextmanager
+def local_file(location: str) -> Iterator[Path]:
+    """Archivo local sin comprimir para librerías que exigen una ruta (PDF/OCR).
+
+    En disco local sin compresión es la misma ruta; si no, se descarga y/o
+    descomprime a un temporal que se borra al salir.
+    """
+    storage = storage_for(location)
+    if isinstance(storage, LocalStorage) and not is_compressed_path(location):
+        yield Path(location)
+        return
+    # Conservar la extensión original (".pdf"), sin la de compresión
+    original = Path(location).with_suffix("") if is_compressed_path(location) else Path(location)
+    suffix = original.suffix
+    fd, tmp_name = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as tmp, storage.open_decompressed(location) as reader:
+            shutil.copyfileobj(reader, tmp, READ_CHUNK)
+        yield Path(tmp_name)
+    finally:
+        os.unlink(tmp_name)
 
 
 async def save_upload(file: UploadFile):
-    settings = get_settings()
-    os.makedirs(settings.storage_dir, exist_ok=True)
+    """Guarda el upload por bloques; devuelve `(ubicación, tamaño original)`.
+
+    Según `upload_compression` el archivo se comprime al escribirlo y la
+    ubicación termina en `.zst`/`.gz`. Con S3 cada bloque se sube como parte de
+    un multipart upload; la E/S bloqueante corre en el threadpool.
+    """
+    storage = get_storage()
     ext = os.path.splitext(file.filename)[1].lower()
-    name = f"{uuid.uuid4()}{ext}"
-    path = os.path.join(settings.storage_dir, name)
+    compress = should_compress(file.content_type)
+    name = f"{uuid.uuid4()}{ext}" + (file_suffix() if compress else "")
 
+    blob = await run_in_threadpool(storage.writer, name)
+    out = compressed_writer(blob) if compress else blob
     size = 0
-    with open(path, "wb") as f:
+    try:
         while True:
-            chunk = await file.read(1024 * 1024)
+            chunk = await file.read(READ_CHUNK)
             if not chunk:
                 break
             size += len(chunk)
-            f.write(chunk)
-    await file.close()
-    return path, size
+            await run_in_threadpool(out.write, chunk)
+        if compress:
+            await run_in_threadpool(out.close)
+        stored = blob.tell()
+        await run_in_threadpool(blob.close)
+    except Exception:
+        await run_in_threadpool(blob.abort)
+        raise
+    finally:
+        await file.close()
+    if compress:
+        BYTES_IN.inc(size, kind="upload")
+        BYTES_OUT.inc(stored, kind="upload")
+    return blob.location, size
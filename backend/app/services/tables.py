@@ -0,0 +1,358 @@
+import csv
+import re
+import unicodedata
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from xml.etree.ElementTree import iterparse
+
+from ..core.optional import optional_import
+from .extraction import parse_number, parse_weight
+from .layout import Line
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# Excel en Windows sube los .csv como vnd.ms-excel
+CSV_MIMES = {"text/csv", "application/csv", "application/vnd.ms-excel"}
+TABLE_SUFFIXES = {".xlsx": "xlsx", ".xlsm": "xlsx", ".csv": "csv"}
+
+# Columna canónica -> encabezados (sin tildes, en minúscula). El orden importa:
+# se prueba de lo más específico a lo más general ("kg neto unidad" antes que "kg neto").
+COLUMNS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("box_kg", ("kg neto unidad", "net weight per unit", "kilos por caja", "kg por caja", "peso caja")),
+    ("gross_kg", ("peso bruto", "kilos brutos", "kg bruto", "gross weight")),
+    ("net_kg", ("peso neto", "kilos netos", "kg neto", "kilos", "net weight")),
+    ("boxes", ("cajas", "bultos", "boxes", "cartons", "cases", "cantidad", "quantity")),
+    ("pallet", ("folio pallet", "pallet", "folio")),
+    ("variety", ("variedad", "variety")),
+    ("size", ("calibre", "size")),
+    ("category", ("categoria", "category", "calidad")),
+    ("container", ("contenedor", "container")),
+)
+NUMERIC_COLUMNS = {"boxes", "net_kg", "gross_kg", "box_kg"}
+QUANTITY_COLUMNS = {"boxes", "net_kg", "gross_kg"}
+# Filas iniciales de cada hoja donde se busca el encabezado
+HEADER_SCAN_ROWS = 25
+MIN_HEADER_COLUMNS = 3
+# Tope del texto derivado (búsqueda, entidades); los registros no tienen tope
+TEXT_MAX_ROWS = 5000
+MAX_CELL_CHARS = 120
+# En PDF, un recuadro de totales ("peso neto total | peso bruto total") tiene
+# la forma de un encabezado con una sola fila; una tabla pide al menos dos
+PDF_MIN_TABLE_ROWS = 2
+
+_ALIAS_RES = [
+    (name, [re.compile(rf"(?<!\w){re.escape(alias)}(?!\w)") for alias in aliases])
+    for name, aliases in COLUMNS
+]
+_XLSX_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_CELL_REF_RE = re.compile(r"([A-Z]+)")
+
+
+@dataclass
+class TableExtraction:
+    """Texto plano de la planilla y registros por fila de la tabla detectada."""
+
+    text: str = ""
+    records: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def table_format(mime: Optional[str], filename: Optional[str]) -> Optional[str]:
+    """`xlsx`, `csv` o `None` según extensión (preferida) o MIME."""
+    suffix = Path(filename or "").suffix.lower()
+    if suffix in TABLE_SUFFIXES:
+        return TABLE_SUFFIXES[suffix]
+    if mime == XLSX_MIME:
+        return "xlsx"
+    if mime in {"text/csv", "application/csv"}:
+        return "csv"
+    return None
+
+
+def _normalize_header(value: Any) -> str:
+    text = unicodedata.normalize("NFKD", str(value or "")).casefold()
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def map_columns(headers: Sequence[Any]) -> Dict[int, str]:
+    """Índice de columna -> nombre canónico; cada canónico toma la primera columna."""
+    mapping: Dict[int, str] = {}
+    normalized = [_normalize_header(h) for h in headers]
+    for name, patterns in _ALIAS_RES:
+        for index, header in enumerate(normalized):
+            if index in mapping or not header:
+                continue
+            if any(pattern.search(header) for pattern in patterns):
+                mapping[index] = name
+                break
+    return mapping
+
+
+def _is_header(mapping: Dict[int, str]) -> bool:
+    names = set(mapping.values())
+    return len(names) >= MIN_HEADER_COLUMNS and bool(names & QUANTITY_COLUMNS)
+
+
+def _clean(value: Any) -> Any:
+    if isinstance(value, str):
+        value = value.strip()
+        return value[:MAX_CELL_CHARS] or None
+    return value
+
+
+def _number(value: Any, name: str) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if name in ("net_kg", "gross_kg", "box_kg"):
+        parsed = parse_weight(str(value))
+        return parsed[0] if parsed else None
+    return parse_number(str(value))
+
+
+def build_record(
+    headers: Sequence[Any], mapping: Dict[int, str], values: Sequence[Any]
+) -> Optional[Dict[str, Any]]:
+    """Registro de una fila de datos; `None` si es vacía, de totales o sin cantidades."""
+    cells = [_clean(v) for v in values]
+    texts = [c for c in cells if isinstance(c, str)]
+    if any(_normalize_header(t).startswith("total") for t in texts):
+        return None
+    record: Dict[str, Any] = {}
+    for index, name in mapping.items():
+        value = cells[index] if index < len(cells) else None
+        if name in NUMERIC_COLUMNS:
+            value = _number(value, name)
+        elif isinstance(value, float) and value.is_integer():
+            # Folios y códigos que Excel guardó como número
+            value = str(int(value))
+        elif value is not None:
+            value = str(value)
+        if value is not None:
+            record[name] = value
+    if not any(record.get(name) is not None for name in QUANTITY_COLUMNS):
+        return None
+    if record.get("net_kg") is None and record.get("boxes") and record.get("box_kg"):
+        record["net_kg"] = round(record["boxes"] * record["box_kg"], 3)
+    record["data"] = {
+        str(headers[i]).strip(): cells[i]
+        for i in range(min(len(headers), len(cells)))
+        if headers[i] not in (None, "") and cells[i] is not None
+    }
+    return record
+
+
+# --- Lectores en streaming ----------------------------------------------------
+
+
+def _column_index(ref: str) -> int:
+    letters = _CELL_REF_RE.match(ref).group(1)
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter) - 64)
+    return index - 1
+
+
+def _xlsx_rows_stdlib(path: Path) -> Iterator[Tuple[str, List[Any]]]:
+    """Filas de cada hoja leyendo el XML del .xlsx con `iterparse` (sin openpyxl).
+
+    Cada fila se libera al procesarla; solo los strings compartidos quedan en
+    memoria, como hace openpyxl en modo read-only.
+    """
+    with zipfile.ZipFile(path) as archive:
+        names = set(archive.namelist())
+        shared: List[str] = []
+        if "xl/sharedStrings.xml" in names:
+            with archive.open("xl/sharedStrings.xml") as fh:
+                for _, element in iterparse(fh):
+                    if element.tag == f"{_XLSX_NS}si":
+                        shared.append("".join(t.text or "" for t in element.iter(f"{_XLSX_NS}t")))
+                        element.clear()
+        targets: Dict[str, str] = {}
+        with archive.open("xl/_rels/workbook.xml.rels") as fh:
+            for _, element in iterparse(fh):
+                if element.tag.endswith("Relationship"):
+                    target = element.get("Target", "").lstrip("/")
+                    targets[element.get("Id")] = target if target.startswith("xl/") else f"xl/{target}"
+        sheets: List[Tuple[str, str]] = []
+        with archive.open("xl/workbook.xml") as fh:
+            for _, element in iterparse(fh):
+                if element.tag == f"{_XLSX_NS}sheet":
+                    sheets.append((element.get("name"), targets.get(element.get(f"{_REL_NS}id"), "")))
+        for sheet_name, target in sheets:
+            if target not in names:
+                continue
+            with archive.open(target) as fh:
+                for _, element in iterparse(fh):
+                    if element.tag != f"{_XLSX_NS}row":
+                        continue
+                    row: List[Any] = []
+                    for cell in element.iter(f"{_XLSX_NS}c"):
+                        index = _column_index(cell.get("r", "A"))
+                        kind = cell.get("t")
+                        raw = cell.findtext(f"{_XLSX_NS}v")
+                        if kind == "s" and raw is not None:
+                            value: Any = shared[int(raw)]
+                        elif kind == "inlineStr":
+                            value = "".join(t.text or "" for t in cell.iter(f"{_XLSX_NS}t"))
+                        elif kind in ("str", "e") or raw is None:
+                            value = raw
+                        elif kind == "b":
+                            value = raw == "1"
+                        else:
+                            number = float(raw)
+                            value = int(number) if number.is_integer() else number
+                        row.extend([None] * (index - len(row)))
+                        row.append(value)
+                    element.clear()
+                    yield sheet_name, row
+
+
+def _xlsx_rows(path: Path) -> Iterator[Tuple[str, List[Any]]]:
+    load_workbook = optional_import("openpyxl", "load_workbook")
+    if load_workbook is None:
+        yield from _xlsx_rows_stdlib(path)
+        return
+    # read_only: las filas se generan desde el XML sin armar el modelo completo
+    workbook = load_workbook(str(path), read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            for values in sheet.iter_rows(values_only=True):
+                yield sheet.title, list(values)
+    finally:
+        workbook.close()
+
+
+def _csv_rows(path: Path) -> Iterator[Tuple[str, List[Any]]]:
+    with open(path, "rb") as raw:
+        sample = raw.read(4096)
+    encoding = "utf-8-sig"
+    try:
+        sample.decode(encoding)
+    except UnicodeDecodeError:
+        # Exportaciones de Excel en español suelen venir en cp1252
+        encoding = "cp1252"
+    try:
+        dialect = csv.Sniffer().sniff(sample.decode(encoding, "replace"), delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    with open(path, newline="", encoding=encoding, errors="replace") as fh:
+        for row in csv.reader(fh, dialect):
+            yield "csv", row
+
+
+def read_table_file(path: Path, fmt: str) -> TableExtraction:
+    """Recorre la planilla una sola vez: texto por hoja y registros de la primera tabla.
+
+    La tabla es la primera hoja cuyo encabezado (dentro de `HEADER_SCAN_ROWS`)
+    nombra al menos `MIN_HEADER_COLUMNS` columnas conocidas, una de ellas de
+    cantidad; las hojas resumen (tablas dinámicas) quedan solo como texto.
+    """
+    rows = _xlsx_rows(path) if fmt == "xlsx" else _csv_rows(path)
+    result = TableExtraction()
+    pages: List[str] = []
+    lines: List[str] = []
+    text_rows = 0
+    current_sheet: Optional[str] = None
+    headers: Optional[List[Any]] = None
+    mapping: Dict[int, str] = {}
+    table_sheet: Optional[str] = None
+    sheet_row = 0
+    for sheet, values in rows:
+        if sheet != current_sheet:
+            if lines:
+                pages.append("\n".join(lines))
+            lines, current_sheet, sheet_row = [], sheet, 0
+        sheet_row += 1
+        cells = ["" if v is None else str(v).strip() for v in values]
+        if text_rows < TEXT_MAX_ROWS and any(cells):
+            lines.append("\t".join(cells).rstrip("\t"))
+            text_rows += 1
+        if table_sheet is None and sheet_row <= HEADER_SCAN_ROWS:
+            candidate = map_columns(values)
+            if _is_header(candidate):
+                headers, mapping, table_sheet = list(values), candidate, sheet
+            continue
+        if sheet == table_sheet and headers is not None:
+            record = build_record(headers, mapping, values)
+            if record is not None:
+                record["source"] = sheet
+                record["row_number"] = sheet_row
+                result.records.append(record)
+    if lines:
+        pages.append("\n".join(lines))
+    from .search import PAGE_BREAK
+
+    result.text = PAGE_BREAK.join(pages)
+    return result
+
+
+# --- Tablas en PDF ------------------------------------------------------------
+
+
+def _row_bands(lines: Sequence[Line]) -> List[List[Line]]:
+    """Agrupa renglones con la misma altura en filas, ordenadas de izquierda a derecha."""
+    bands: List[List[Line]] = []
+    for line in sorted(lines, key=lambda item: (item[1], item[0])):
+        if bands:
+            first = bands[-1][0]
+            if line[1] < first[1] + 0.5 * max(first[3], line[3]):
+                bands[-1].append(line)
+                continue
+        bands.append([line])
+    return [sorted(band, key=lambda item: item[0]) for band in bands]
+
+
+def _nearest_column(line: Line, centers: Sequence[float]) -> int:
+    center = line[0] + line[2] / 2
+    return min(range(len(centers)), key=lambda index: abs(centers[index] - center))
+
+
+def pdf_table_records(layouts: Sequence[Sequence[Line]]) -> List[Dict[str, Any]]:
+    """Tablas detectadas en los renglones posicionados de cada página.
+
+    El encabezado es una fila cuyas celdas nombran columnas conocidas; las
+    filas siguientes sin dígitos se suman a él (encabezados en dos renglones o
+    bilingües). Cada celda va a la columna de centro más cercano y la tabla
+    termina en la primera fila sin cantidades o de totales. Las tablas con
+    menos de `PDF_MIN_TABLE_ROWS` filas se descartan.
+    """
+    records: List[Dict[str, Any]] = []
+    for page, lines in enumerate(layouts, start=1):
+        bands = _row_bands(lines)
+        index = 0
+        while index < len(bands):
+            header_band = bands[index]
+            mapping = map_columns([line[5] for line in header_band])
+            index += 1
+            if not _is_header(mapping):
+                continue
+            headers = [line[5] for line in header_band]
+            centers = [line[0] + line[2] / 2 for line in header_band]
+            while index < len(bands) and not any(
+                ch.isdigit() for line in bands[index] for ch in line[5]
+            ):
+                for line in bands[index]:
+                    column = _nearest_column(line, centers)
+                    headers[column] = f"{headers[column]} {line[5]}"
+                index += 1
+            mapping = map_columns(headers)
+            table: List[Dict[str, Any]] = []
+            while index < len(bands):
+                values: List[Optional[str]] = [None] * len(headers)
+                for line in bands[index]:
+                    column = _nearest_column(line, centers)
+                    values[column] = line[5] if values[column] is None else f"{values[column]} {line[5]}"
+                record = build_record(headers, mapping, values)
+                if record is None:
+                    break
+                record["source"] = f"page {page}"
+                record["row_number"] = index + 1
+                table.append(record)
+                index += 1
+            if len(table) >= PDF_MIN_TABLE_ROWS:
+                records.extend(table)
+    return records
@@ -0,0 +1,281 @@
+import csv
+import io
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..core.config import get_settings
+from ..core.optional import optional_import
+
+# Renglón reconocido: (left, top, width, height, confianza 0-100, texto) en px de la imagen
+TextLine = Tuple[int, int, int, int, float, str]
+# (texto, confianza media 0-100 o -1, palabras, renglones)
+Recognition = Tuple[str, float, int, List[TextLine]]
+
+# Tope por página del lote: un PDF patológico no debe colgar al worker
+CLI_TIMEOUT_PER_PAGE = 120
+
+
+class _LineCollector:
+    """Agrupa palabras de `image_to_data`/TSV por (block, par, line) con su caja."""
+
+    def __init__(self):
+        self.words: Dict[tuple, List[str]] = {}
+        self.boxes: Dict[tuple, List[int]] = {}
+        self.line_confidences: Dict[tuple, List[float]] = {}
+        self.confidences: List[float] = []
+
+    def add(self, key: tuple, word: str, confidence: float, box: Sequence[int]) -> None:
+        left, top, width, height = box
+        self.words.setdefault(key, []).append(word)
+        self.line_confidences.setdefault(key, []).append(confidence)
+        self.confidences.append(confidence)
+        current = self.boxes.get(key)
+        if current is None:
+            self.boxes[key] = [left, top, left + width, top + height]
+        else:
+            current[0], current[1] = min(current[0], left), min(current[1], top)
+            current[2] = max(current[2], left + width)
+            current[3] = max(current[3], top + height)
+
+    def summarize(self) -> Recognition:
+        lines: List[TextLine] = []
+        for key in sorted(self.words):
+            x0, y0, x1, y1 = self.boxes[key]
+            confidences = self.line_confidences[key]
+            lines.append(
+                (
+                    x0, y0, x1 - x0, y1 - y0,
+                    round(sum(confidences) / len(confidences), 2),
+                    " ".join(self.words[key]),
+                )
+            )
+        text = "\n".join(line[5] for line in lines)
+        confidences = self.confidences
+        mean = sum(confidences) / len(confidences) if confidences else -1.0
+        return text, round(mean, 2), len(confidences), lines
+
+
+def _box(row) -> Tuple[int, int, int, int]:
+    return tuple(int(row[name]) for name in ("left", "top", "width", "height"))
+
+
+class OcrBackend:
+    """Motor que reconoce un lote de imágenes ya preprocesadas con un idioma."""
+
+    name = "base"
+
+    def recognize_batch(self, images: Sequence, lang: str) -> List[Recognition]:
+        raise NotImplementedError
+
+
+class TesserocrBackend(OcrBackend):
+    """Bindings de la API C de tesseract (`tesserocr`, opcional).
+
+    Cada `PyTessBaseAPI` mantiene el traineddata cargado; se reutilizan entre
+    páginas y documentos desde un pool por idioma (hay como máximo
+    `max_concurrent_ocr` en uso, el cupo de `ocr_slot`). La API libera el GIL
+    mientras reconoce, así que los threads corren en paralelo de verdad.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, tesserocr):
+        self._tesserocr = tesserocr
+        self._pools: Dict[str, "queue.LifoQueue"] = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, lang: str):
+        with self._lock:
+            pool = self._pools.setdefault(lang, queue.LifoQueue())
+        try:
+            return pool.get_nowait()
+        except queue.Empty:
+            return self._tesserocr.PyTessBaseAPI(lang=lang)
+
+    def _release(self, lang: str, api) -> None:
+        self._pools[lang].put(api)
+
+    def recognize_batch(self, images: Sequence, lang: str) -> List[Recognition]:
+        api = self._acquire(lang)
+        try:
+            results = []
+            for image in images:
+                api.SetImage(image)
+                text = api.GetUTF8Text()
+                confidences = [float(c) for c in api.AllWordConfidences()]
+                mean = sum(confidences) / len(confidences) if confidences else -1.0
+                lines = self._lines(api)
+                results.append((text.strip(), round(mean, 2), len(confidences), lines))
+                api.Clear()
+            return results
+        finally:
+            self._release(lang, api)
+
+    def _lines(self, api) -> List[TextLine]:
+        level = self._tesserocr.RIL.TEXTLINE
+        lines: List[TextLine] = []
+        iterator = api.GetIterator()
+        if iterator is None:
+            return lines
+        for item in self._tesserocr.iterate_level(iterator, level):
+            text = (item.GetUTF8Text(level) or "").strip()
+            box = item.BoundingBox(level)
+            if not text or not box:
+                continue
+            x0, y0, x1, y1 = box
+            lines.append((x0, y0, x1 - x0, y1 - y0, round(item.Confidence(level), 2), text))
+        return lines
+
+
+class CliBatchBackend(OcrBackend):
+    """Un proceso `tesseract` por lote en vez de uno por página.
+
+    Las imágenes se escriben a un directorio temporal y se pasan como lista
+    de archivos: tesseract carga el modelo una vez y devuelve un TSV con
+    `page_num` por imagen.
+    """
+
+    name = "cli"
+
+    def __init__(self, command: str):
+        self.command = command
+
+    def recognize_batch(self, images: Sequence, lang: str) -> List[Recognition]:
+        if not images:
+            return []
+        with tempfile.TemporaryDirectory(prefix="ocr-") as tmp:
+            paths = []
+            for index, image in enumerate(images):
+                path = os.path.join(tmp, f"{index:04d}.png")
+                image.save(path, format="PNG")
+                paths.append(path)
+            listing = os.path.join(tmp, "pages.txt")
+            with open(listing, "w", encoding="utf-8") as fh:
+                fh.write("\n".join(paths) + "\n")
+            completed = subprocess.run(
+                [self.command, listing, "stdout", "-l", lang, "tsv"],
+                capture_output=True,
+                timeout=CLI_TIMEOUT_PER_PAGE * len(paths),
+                check=False,
+            )
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.decode("utf-8", "replace").strip())
+        return self._parse_tsv(completed.stdout.decode("utf-8", "replace"), len(images))
+
+    @staticmethod
+    def _parse_tsv(output: str, pages: int) -> List[Recognition]:
+        collectors = [_LineCollector() for _ in range(pages)]
+        rows = csv.DictReader(io.StringIO(output), delimiter="\t", quoting=csv.QUOTE_NONE)
+        for row in rows:
+            word = (row.get("text") or "").strip()
+            try:
+                confidence = float(row.get("conf") or -1)
+                page = int(row["page_num"]) - 1
+                box = _box(row)
+            except (TypeError, ValueError, KeyError):
+                continue
+            if not word or confidence < 0 or not 0 <= page < pages:
+                continue
+            key = (int(row["block_num"]), int(row["par_num"]), int(row["line_num"]))
+            collectors[page].add(key, word, confidence, box)
+        return [collector.summarize() for collector in collectors]
+
+
+class PytesseractBackend(OcrBackend):
+    """Un `tesseract` por página vía pytesseract; solo como referencia en benchmarks."""
+
+    name = "pytesseract"
+
+    def __init__(self, pytesseract):
+        self._pytesseract = pytesseract
+
+    def recognize_batch(self, images: Sequence, lang: str) -> List[Recognition]:
+        results = []
+        for image in images:
+            data = self._pytesseract.image_to_data(
+                image, lang=lang, output_type=self._pytesseract.Output.DICT
+            )
+            collector = _LineCollector()
+            for index, word in enumerate(data.get("text", [])):
+                word = (word or "").strip()
+                try:
+                    confidence = float(data["conf"][index])
+                except (TypeError, ValueError):
+                    confidence = -1.0
+                if not word or confidence < 0:
+                    continue
+                key = (
+                    data["block_num"][index], data["par_num"][index], data["line_num"][index]
+                )
+                box = [int(data[name][index]) for name in ("left", "top", "width", "height")]
+                collector.add(key, word, confidence, box)
+            results.append(collector.summarize())
+        return results
+
+
+def _tesserocr():
+    return optional_import("tesserocr")
+
+
+def build_backend(kind: str) -> Optional[OcrBackend]:
+    """`tesserocr`, `cli` o `pytesseract`; `None` si no está disponible."""
+    if kind == "tesserocr":
+        tesserocr = _tesserocr()
+        return TesserocrBackend(tesserocr) if tesserocr is not None else None
+    if kind == "cli":
+        command = shutil.which("tesseract")
+        return CliBatchBackend(command) if command else None
+    if kind == "pytesseract":
+        from .processing import _pytesseract
+
+        pytesseract = _pytesseract()
+        if pytesseract is None or not shutil.which("tesseract"):
+            return None
+        return PytesseractBackend(pytesseract)
+    raise ValueError(f"Motor OCR desconocido: {kind}")
+
+
+def installed_languages() -> Tuple[str, ...]:
+    """Traineddata disponibles; vacío si no se puede consultar."""
+    tesserocr = _tesserocr()
+    if tesserocr is not None:
+        try:
+            return tuple(tesserocr.get_languages()[1])
+        except Exception:
+            pass
+    command = shutil.which("tesseract")
+    if not command:
+        return ()
+    try:
+        completed = subprocess.run(
+            [command, "--list-langs"], capture_output=True, timeout=10, check=False
+        )
+    except (OSError, subprocess.SubprocessError):
+        return ()
+    # La primera línea es "List of available languages ..."
+    output = completed.stdout.decode("utf-8", "replace").splitlines()[1:]
+    return tuple(line.strip() for line in output if line.strip())
+
+
+_backend: Optional[OcrBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_ocr_backend() -> Optional[OcrBackend]:
+    """Motor configurado en `ocr_backend`; `auto` prefiere tesserocr y luego el CLI por lotes."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                kind = get_settings().ocr_backend
+                candidates = ("tesserocr", "cli") if kind == "auto" else (kind,)
+                for candidate in candidates:
+                    _backend = build_backend(candidate)
+                    if _backend is not None:
+                        break
+    return _backend
@@ -0,0 +1,55 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend.app.core.config import get_settings
+from backend.app.core.db import Base
+from backend.app.models.document import Document
+
+
+@pytest.fixture(scope="session", autouse=True)
+def settings_env(tmp_path_factory):
+    """`get_settings` crea los directorios de la base y de `storage/`: que sean temporales."""
+    root = tmp_path_factory.mktemp("settings")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("DATABASE_URL", f"sqlite:///{root / 'db.sqlite3'}")
+        patch.setenv("STORAGE_DIR", str(root / "storage"))
+        get_settings.cache_clear()
+        yield
+    get_settings.cache_clear()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite3'}", future=True)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def make_document(db):
+    def make(**values):
+        doc = Document(
+            id=values.pop("id", None) or str(uuid.uuid4()),
+            filename=values.pop("filename", "documento.pdf"),
+            mime=values.pop("mime", "application/pdf"),
+            size=values.pop("size", 1),
+            storage_path=values.pop("storage_path", "documento.pdf"),
+            created_at=values.pop("created_at", None) or datetime.utcnow(),
+            **values,
+        )
+        db.add(doc)
+        db.flush()
+        return doc
+
+    return make
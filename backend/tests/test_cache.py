@@ -0,0 +1,95 @@
+import asyncio
+import json
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from backend.app.api import routes_documents
+from backend.app.models.document import ProcessingLog
+from backend.app.services.cache import LRUCache, RedisCache, ResponseCache
+
+
+class _DictClient:
+    """Cliente en memoria con la parte de la API de redis que usa `RedisCache`."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def set(self, name, value, ex=None):
+        self.data[name] = value
+
+    def delete(self, name):
+        self.data.pop(name, None)
+
+
+@pytest.mark.parametrize(
+    "put_version, get_version, expected",
+    [("v1", "v1", b"valor"), ("v1", "v2", None), ("2024|kb-1", "2024|kb-2", None)],
+)
+@pytest.mark.parametrize("shared", [False, True])
+def test_version_change_is_a_miss(shared, put_version, get_version, expected):
+    cache = ResponseCache(
+        LRUCache(10), RedisCache(_DictClient(), "test:", ttl=0) if shared else None
+    )
+    cache.put("doc", put_version, b"valor")
+    assert cache.get("doc", get_version) == expected
+    assert (cache.hits, cache.misses) == ((1, 0) if expected else (0, 1))
+
+
+def test_shared_hit_fills_local():
+    shared = RedisCache(_DictClient(), "test:", ttl=0)
+    ResponseCache(LRUCache(10), shared).put("doc", "v1", b"valor")
+    # Otro worker: LRU vacío, misma caché compartida
+    other = ResponseCache(LRUCache(10), shared)
+    assert other.get("doc", "v1") == b"valor"
+    assert other.local.get("doc", "v1") == b"valor"
+    other.invalidate("doc")
+    assert other.get("doc", "v1") is None
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", "v", b"a")
+    cache.put("b", "v", b"b")
+    cache.get("a", "v")
+    cache.put("c", "v", b"c")
+    assert [cache.get(key, "v") for key in "abc"] == [b"a", None, b"c"]
+    assert len(cache) == 2
+
+
+def test_disabled_lru_stores_nothing():
+    cache = LRUCache(0)
+    cache.put("a", "v", b"a")
+    assert cache.get("a", "v") is None
+
+
+def test_insights_miss_on_kb_version_change(db, make_document, monkeypatch):
+    doc = make_document(status="done")
+    db.add(
+        ProcessingLog(
+            id=str(uuid.uuid4()), document_id=doc.id, step="insights",
+            payload=json.dumps({"kb_version": "kb-1", "recommendations": ["Revisar"]}),
+        )
+    )
+    db.commit()
+    cache = ResponseCache(LRUCache(10))
+    kb = SimpleNamespace(version="kb-1")
+    monkeypatch.setattr(routes_documents, "get_insights_cache", lambda: cache)
+    monkeypatch.setattr(routes_documents, "get_knowledge_base", lambda: kb)
+
+    def insights():
+        response = asyncio.run(routes_documents.get_insights(doc.id, db=db))
+        return json.loads(response.body)
+
+    first = insights()
+    assert (first["stale"], first["kbVersion"]) == (False, "kb-1")
+    assert insights() == first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    kb.version = "kb-2"
+    assert insights()["stale"] is True
+    assert (cache.hits, cache.misses) == (1, 2)
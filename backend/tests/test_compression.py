@@ -0,0 +1,82 @@
+import io
+
+import pytest
+
+from backend.app.services import compression
+from backend.app.services.compression import (
+    GZIP_MAGIC,
+    MIN_COMPRESS_BYTES,
+    ZSTD_MAGIC,
+    compress_stream,
+    decompress_bytes,
+    decompressed_reader,
+    file_suffix,
+    pack_json,
+    pack_text,
+    unpack_json,
+    unpack_text,
+)
+
+LONG_TEXT = "Guía de despacho N° 1234 — cerezas Lapins 5 kg\n" * 200
+
+
+@pytest.fixture(params=["gzip", "zstd"])
+def codec(request, monkeypatch):
+    """Corre cada prueba con gzip y, si está instalado, con zstd."""
+    if request.param == "zstd":
+        monkeypatch.setattr(compression, "zstandard", pytest.importorskip("zstandard"))
+    else:
+        monkeypatch.setattr(compression, "zstandard", None)
+    return request.param
+
+
+MAGIC = {"gzip": GZIP_MAGIC, "zstd": ZSTD_MAGIC}
+
+
+@pytest.mark.parametrize(
+    "text",
+    [LONG_TEXT, "x" * MIN_COMPRESS_BYTES, "ñandú " * 500],
+)
+def test_pack_text_round_trip(codec, text):
+    stored, blob = pack_text(text)
+    assert stored is None
+    assert blob.startswith(MAGIC[codec])
+    assert unpack_text(stored, blob) == text
+
+
+@pytest.mark.parametrize("text", [None, "", "corto", "x" * (MIN_COMPRESS_BYTES - 1)])
+def test_pack_text_keeps_small_text(codec, text):
+    assert pack_text(text) == (text, None)
+
+
+def test_pack_json_round_trip(codec):
+    payload = {"text": LONG_TEXT, "pages": [1, 2], "confidence": 91.5}
+    assert unpack_json(*pack_json(payload)) == payload
+
+
+@pytest.mark.parametrize(
+    "text, blob",
+    [(None, None), ("", None), ("no es json", None), (None, b"\x1f\x8bcorrupto")],
+)
+def test_unpack_json_tolerates_bad_data(text, blob):
+    assert unpack_json(text, blob) == {}
+
+
+def test_decompress_bytes_passes_plain_data(codec):
+    assert decompress_bytes(b"sin comprimir") == b"sin comprimir"
+
+
+@pytest.mark.parametrize("size", [0, 1, compression.CHUNK_SIZE + 17])
+def test_compress_stream_round_trip(codec, size):
+    data = (LONG_TEXT.encode("utf-8") * (size // len(LONG_TEXT) + 1))[:size]
+    destination = io.BytesIO()
+    destination.write(b"cabecera")
+    size_in, size_out = compress_stream(io.BytesIO(data), destination)
+
+    assert size_in == size
+    assert size_out == len(destination.getvalue()) - len(b"cabecera")
+    destination.seek(len(b"cabecera"))
+    with decompressed_reader(destination, f"archivo{file_suffix()}") as reader:
+        assert reader.read() == data
+    # El writer no cierra el destino
+    assert not destination.closed
@@ -0,0 +1,104 @@
+import pytest
+
+from backend.app.models.document import Entity
+from backend.app.services.entities import (
+    canonical_type,
+    container_check_digit,
+    is_valid_container,
+    normalize_entity_value,
+    renormalize_values,
+)
+
+
+@pytest.mark.parametrize(
+    "code, expected",
+    [
+        # Ejemplo de la norma ISO 6346
+        ("CSQU305438", 3),
+        ("CSQU3054383", 3),
+        ("csqu 305438", 3),
+        ("MSCU123456", 6),
+        ("TGHU000000", 8),
+        ("CSQU30543", None),
+        ("CSQ1305438", None),
+        ("CSQU30543X", None),
+        ("", None),
+    ],
+)
+def test_container_check_digit(code, expected):
+    assert container_check_digit(code) == expected
+
+
+@pytest.mark.parametrize(
+    "code, expected",
+    [
+        ("CSQU3054383", True),
+        ("CSQU 305438-3", True),
+        ("MSCU1234566", True),
+        ("CSQU3054384", False),
+        # La categoría (4.ª letra) solo puede ser U, J o Z
+        ("CSQA3054383", False),
+        ("CSQU305438", False),
+    ],
+)
+def test_is_valid_container(code, expected):
+    assert is_valid_container(code) is expected
+
+
+@pytest.mark.parametrize(
+    "entity_type, value, expected",
+    [
+        ("container", "csqu 305438-3", "CSQU3054383"),
+        ("container", "CSQU-305438/3", "CSQU3054383"),
+        ("contenedor", "CSQU3054383", "CSQU3054383"),
+        # Sin dígito verificador: se calcula
+        ("container", "CSQU305438", "CSQU3054383"),
+        # Letras que el OCR confunde con dígitos, solo si el resultado es válido
+        ("container", "CSQU3O54383", "CSQU3054383"),
+        ("container", "CSQU3O54384", "CSQU3O54384"),
+        ("container", "no es un contenedor", "NOESUNCONTENEDOR"),
+        ("dus_number", "012497436-4", "124974364"),
+        ("dus", "12497436-4", "124974364"),
+        ("dus_number", "000", "000"),
+        # Las reglas por tipo no aplican a otros identificadores
+        ("bl_number", "0MSCU305438", "0MSCU305438"),
+        ("booking", "bk 00123", "BK00123"),
+        ("container", None, ""),
+    ],
+)
+def test_normalize_entity_value(entity_type, value, expected):
+    assert normalize_entity_value(entity_type, value) == expected
+
+
+@pytest.mark.parametrize(
+    "entity_type, expected",
+    [("BL", "bl_number"), (" contenedor ", "container"), ("invoice", "invoice"), (None, "")],
+)
+def test_canonical_type(entity_type, expected):
+    assert canonical_type(entity_type) == expected
+
+
+def test_renormalize_values_rekeys_legacy_rows(db, make_document):
+    doc = make_document()
+    legacy = {
+        "a": ("container", "CSQU305438", "CSQU305438"),
+        "b": ("container", "CSQU3O54383", "CSQU3O54383"),
+        "c": ("dus_number", "012497436-4", "0124974364"),
+        "d": ("bl_number", "0MSCU305438", "0MSCU305438"),
+        "e": ("container", "CSQU3054383", "CSQU3054383"),
+    }
+    db.add_all(
+        Entity(id=key, document_id=doc.id, type=kind, value=value, normalized_value=stored)
+        for key, (kind, value, stored) in legacy.items()
+    )
+    db.commit()
+
+    assert renormalize_values(db, batch_size=1) == 3
+    keys = {entity.id: entity.normalized_value for entity in db.query(Entity)}
+    assert keys == {
+        "a": "CSQU3054383",
+        "b": "CSQU3054383",
+        "c": "124974364",
+        "d": "0MSCU305438",
+        "e": "CSQU3054383",
+    }
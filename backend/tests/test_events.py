@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.app.services import events
+from backend.app.services.events import EventBroker, is_terminal, status_event
+
+
+@pytest.fixture
+def broker():
+    return EventBroker()
+
+
+def _stages(history):
+    return [event["stage"] for event in history]
+
+
+@pytest.mark.parametrize(
+    "stages, expected",
+    [
+        (["queued", "ocr", "classify", "done"], ["queued", "ocr", "classify", "done"]),
+        # Reprocesar vuelve a "queued" y descarta la corrida anterior
+        (["queued", "ocr", "failed", "queued", "ocr"], ["queued", "ocr"]),
+        (["ocr", "done"], ["ocr", "done"]),
+    ],
+)
+def test_history_per_document(broker, stages, expected):
+    for stage in stages:
+        broker.publish("doc", stage)
+    broker.publish("otro", "queued")
+    assert _stages(broker.history("doc")) == expected
+    assert broker.history("sin-eventos") == []
+
+
+def test_history_is_bounded(broker, monkeypatch):
+    monkeypatch.setattr(events, "HISTORY_PER_DOCUMENT", 3)
+    monkeypatch.setattr(events, "MAX_DOCUMENTS", 2)
+    broker.publish("a", "queued")
+    for page in range(5):
+        broker.publish("a", "ocr", page=page)
+    broker.publish("b", "queued")
+    broker.publish("a", "done")
+    broker.publish("c", "queued")
+
+    assert [event["data"].get("page") for event in broker.history("a")] == [3, 4, None]
+    # "b" es el documento con actividad más antigua
+    assert broker.history("b") == []
+    assert _stages(broker.history("c")) == ["queued"]
+
+
+def test_event_ids_are_increasing(broker):
+    ids = [broker.publish(doc, "ocr")["id"] for doc in ("a", "b", "a")]
+    assert ids == sorted(ids) and len(set(ids)) == 3
+
+
+def test_subscribers_receive_events_from_other_threads(broker):
+    async def scenario():
+        doc_sub = broker.subscribe("doc:a")
+        shipment_sub = broker.subscribe("shipment:s1")
+        worker = threading.Thread(
+            target=lambda: [
+                broker.publish("a", stage, shipment_id="s1") for stage in ("queued", "done")
+            ]
+        )
+        worker.start()
+        worker.join()
+        received = [await asyncio.wait_for(doc_sub.queue.get(), 1) for _ in range(2)]
+        shipment = [await asyncio.wait_for(shipment_sub.queue.get(), 1) for _ in range(2)]
+        broker.unsubscribe("doc:a", doc_sub)
+        broker.unsubscribe("shipment:s1", shipment_sub)
+        return received, shipment
+
+    received, shipment = asyncio.run(scenario())
+    assert _stages(received) == _stages(shipment) == ["queued", "done"]
+    assert is_terminal(received[-1])
+
+
+@pytest.mark.parametrize("status, terminal", [("done", True), ("failed", True), ("ocr", False)])
+def test_status_event(status, terminal):
+    event = status_event("doc", status, shipment_id="s1")
+    assert (event["documentId"], event["shipmentId"], event["stage"]) == ("doc", "s1", status)
+    assert is_terminal(event) is terminal
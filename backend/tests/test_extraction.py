@@ -0,0 +1,66 @@
+import pytest
+
+from backend.app.services.extraction import SchemaMatcher, parse_number, parse_weight
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("20.000", 20000.0),
+        ("1,234.56", 1234.56),
+        ("1.234,56", 1234.56),
+        ("24000", 24000.0),
+        ("1 540", 1540.0),
+        ("1.234.567", 1234567.0),
+        ("0,500", 0.5),
+        ("2,5KG", 2.5),
+        # Números contiguos no se funden por el espacio
+        ("20000 12", 20000.0),
+        ("1540 2 pallets", 1540.0),
+        # Grupo inicial de más de tres dígitos: el separador es decimal
+        ("22132.800KGS", 22132.8),
+        ("-3", -3.0),
+        ("+7", 7.0),
+        ("sin número", None),
+    ],
+)
+def test_parse_number(raw, expected):
+    assert parse_number(raw) == expected
+
+
+def test_parse_weight_units():
+    assert parse_weight("22132.800KGS") == (22132.8, "kg")
+    assert parse_weight("1,000 lbs") == (pytest.approx(453.59237), "kg")
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return SchemaMatcher(
+        "test",
+        [
+            {"name": "peso_bruto", "type": "number"},
+            {"name": "cantidad_cajas", "type": "number"},
+            {"name": "valor_total", "type": "number"},
+        ],
+    )
+
+
+def _values(matcher, text):
+    return {name: record["value"] for name, record in matcher.evaluate(text).values.items()}
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Peso bruto: 22132.800KGS", {"peso_bruto": 22132.8}),
+        ("Cantidad de cajas 1540 2 pallets", {"cantidad_cajas": 1540.0}),
+        ("Valor total: USD 12.345", {"valor_total": 12345.0}),
+        ("Peso bruto (kg): 19.080", {"peso_bruto": 19080.0}),
+        # El valor debe seguir a la etiqueta, no ser una cifra cualquiera de la línea
+        ("Peso bruto Atributo 2", {}),
+        ("Cantidad de cajas CEREZAS 5 KG", {}),
+        ("Peso bruto quantity8.", {}),
+    ],
+)
+def test_value_follows_label(matcher, text, expected):
+    assert _values(matcher, text) == expected
@@ -0,0 +1,79 @@
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from backend.app.api.routes_documents import _decode_cursor, _encode_cursor, list_documents
+
+
+def _list(db, cursor=None, limit=2, status=None):
+    return list_documents(
+        cursor=cursor,
+        limit=limit,
+        doc_type=None,
+        status=status,
+        language=None,
+        shipment_id=None,
+        created_from=None,
+        created_to=None,
+        fields=None,
+        db=db,
+    )
+
+
+@pytest.mark.parametrize(
+    "created_at, doc_id",
+    [
+        (datetime(2024, 1, 31, 23, 59, 59, 999999), "b3c1d2e4-0000-4000-8000-000000000001"),
+        (datetime(2024, 6, 1), "id con espacios/y=signos"),
+    ],
+)
+def test_cursor_round_trip(created_at, doc_id):
+    assert _decode_cursor(_encode_cursor(created_at, doc_id)) == (created_at, doc_id)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "no-es-base64!",
+        base64.urlsafe_b64encode(b"no es json").decode("ascii"),
+        base64.urlsafe_b64encode(b'["sin-fecha"]').decode("ascii"),
+        base64.urlsafe_b64encode(b'["2024-13-01", "x"]').decode("ascii"),
+        base64.urlsafe_b64encode(b"5").decode("ascii"),
+        "ñ",
+    ],
+)
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        _decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_pages_cover_every_document_once(db, make_document):
+    start = datetime(2024, 1, 1)
+    # Dos documentos con el mismo created_at: el id desempata el orden
+    docs = [make_document(created_at=start + timedelta(minutes=i // 2)) for i in range(5)]
+    db.commit()
+    expected = sorted(((d.created_at, d.id) for d in docs), reverse=True)
+
+    seen, cursor = [], None
+    while True:
+        page = _list(db, cursor=cursor)
+        seen += [(item.createdAt, item.id) for item in page.items]
+        cursor = page.nextCursor
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+def test_cursor_respects_filters(db, make_document):
+    make_document(status="done", created_at=datetime(2024, 1, 3))
+    make_document(status="failed", created_at=datetime(2024, 1, 2))
+    make_document(status="done", created_at=datetime(2024, 1, 1))
+    db.commit()
+
+    first = _list(db, limit=1, status="done")
+    second = _list(db, cursor=first.nextCursor, limit=1, status="done")
+    assert [item.status for item in first.items + second.items] == ["done", "done"]
+    assert second.nextCursor is None
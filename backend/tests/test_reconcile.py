@@ -0,0 +1,110 @@
+import uuid
+
+import pytest
+
+from backend.app.models.document import DocumentRow, ExtractedField
+from backend.app.services.reconcile import audit_shipments, reconcile_shipment
+
+pytest.importorskip("numpy")
+
+SHIPMENT = "EMB-1"
+
+
+@pytest.fixture
+def add_document(db, make_document):
+    def add(doc_type, rows=(), fields=None, shipment_id=SHIPMENT, confidence=0.9):
+        doc = make_document(
+            doc_type=doc_type, status="done", shipment_id=shipment_id, filename=f"{doc_type}.pdf"
+        )
+        for number, (pallet, boxes, net_kg) in enumerate(rows, start=1):
+            db.add(
+                DocumentRow(
+                    id=str(uuid.uuid4()), document_id=doc.id, row_number=number,
+                    pallet=pallet, boxes=boxes, net_kg=net_kg,
+                )
+            )
+        for field, value in (fields or {}).items():
+            db.add(
+                ExtractedField(
+                    id=str(uuid.uuid4()), document_id=doc.id, doc_type=doc_type, field=field,
+                    value_type="number", value_number=value, confidence=confidence,
+                )
+            )
+        db.commit()
+        return doc
+
+    return add
+
+
+@pytest.fixture
+def packing_list(add_document):
+    # 100 cajas y 500 kg netos en dos pallets
+    return add_document("packing_list", rows=[("P1", 60, 300.0), ("P2", 40, 200.0)])
+
+
+def _discrepancy(report, metric):
+    [item] = [item for item in report["discrepancies"] if item["metric"] == metric]
+    return item
+
+
+@pytest.mark.parametrize(
+    "net_kg, severity",
+    [
+        (500.0, "ok"),
+        # Sobre el 1 % de `reconcile_ratio_warning`, bajo el 2 % de error
+        (507.0, "warning"),
+        # Justo en el 2 % de `reconcile_ratio_tolerance` todavía no es error
+        (490.0, "warning"),
+        (489.0, "error"),
+        (515.0, "error"),
+    ],
+)
+def test_weight_tolerance(db, packing_list, add_document, net_kg, severity):
+    add_document("factura_comercial", fields={"peso_neto": net_kg})
+    report = reconcile_shipment(db, SHIPMENT)
+    assert report["references"]["net_kg"]["document_id"] == packing_list.id
+    assert _discrepancy(report, "net_kg")["severity"] == severity
+    assert report["status"] == severity
+
+
+@pytest.mark.parametrize(
+    "boxes, severity",
+    [(100, "ok"), (101, "warning"), (99, "warning"), (102, "error")],
+)
+def test_box_count_tolerance(db, packing_list, add_document, boxes, severity):
+    add_document("factura_comercial", fields={"cantidad_cajas": boxes})
+    item = _discrepancy(reconcile_shipment(db, SHIPMENT), "boxes")
+    assert (item["difference"], item["severity"]) == (boxes - 100, severity)
+
+
+def test_low_confidence_fields_are_ignored(db, packing_list, add_document):
+    add_document("factura_comercial", fields={"peso_neto": 900.0}, confidence=0.5)
+    report = reconcile_shipment(db, SHIPMENT)
+    assert report["discrepancies"] == []
+    assert report["status"] == "ok"
+
+
+def test_phytosanitary_total_is_not_net_weight(db, packing_list, add_document):
+    # El peso_total del certificado suele ser bruto: no se concilia contra el neto
+    add_document("certificado_fitosanitario", fields={"peso_total": 560.0, "cantidad": 100})
+    report = reconcile_shipment(db, SHIPMENT)
+    assert [item["metric"] for item in report["discrepancies"]] == ["boxes"]
+
+
+def test_lines_by_pallet(db, packing_list, add_document):
+    add_document("factura_comercial", rows=[("P1", 60, 300.0), ("P2", 45, 200.0)])
+    [lines] = reconcile_shipment(db, SHIPMENT)["lines"]
+    assert (lines["key"], lines["matched"]) == ("pallet", 1)
+    assert [(line["key"], line["severity"]) for line in lines["lines"]] == [("P2", "error")]
+
+
+def test_audit_counts_per_shipment(db, add_document):
+    add_document("packing_list", rows=[("P1", 10, 100.0)], shipment_id="A")
+    add_document("factura_comercial", fields={"peso_neto": 150.0}, shipment_id="A")
+    add_document("packing_list", rows=[("P1", 10, 100.0)], shipment_id="B")
+    add_document("factura_comercial", fields={"peso_neto": 100.0}, shipment_id="B")
+
+    audit = {row["shipment_id"]: row for row in audit_shipments(db)}
+    assert (audit["A"]["status"], audit["A"]["errors"]) == ("error", 1)
+    assert (audit["B"]["status"], audit["B"]["compared"]) == ("ok", 1)
+    assert audit["A"]["max_ratio"] == pytest.approx(50 / 150, abs=1e-5)
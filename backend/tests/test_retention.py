@@ -0,0 +1,85 @@
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select
+
+from backend.app.models.document import ProcessingLog
+from backend.app.services.compression import decompressed_reader
+from backend.app.services.retention import compact_processing_logs, superseded_log_ids
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def logs(db, make_document):
+    """Tres corridas de `ocr` y una de `classify` por documento; ids en orden de llegada."""
+    for doc_id in ("a", "b"):
+        make_document(id=doc_id)
+        for run in range(3):
+            db.add(
+                ProcessingLog(
+                    id=f"{doc_id}-ocr-{run}",
+                    document_id=doc_id,
+                    step="ocr",
+                    payload=json.dumps({"run": run}),
+                    created_at=START + timedelta(minutes=run),
+                )
+            )
+        db.add(
+            ProcessingLog(
+                id=f"{doc_id}-classify-0",
+                document_id=doc_id,
+                step="classify",
+                payload="{}",
+                created_at=START,
+            )
+        )
+    # Mismo created_at que la última corrida: desempata el id
+    db.add(
+        ProcessingLog(
+            id="b-ocr-3", document_id="b", step="ocr", payload="{}",
+            created_at=START + timedelta(minutes=2),
+        )
+    )
+    db.commit()
+
+
+def _remaining(db):
+    return set(db.execute(select(ProcessingLog.id)).scalars())
+
+
+@pytest.mark.parametrize(
+    "keep, expected",
+    [
+        (1, {"a-ocr-0", "a-ocr-1", "b-ocr-0", "b-ocr-1", "b-ocr-2"}),
+        (2, {"a-ocr-0", "b-ocr-0", "b-ocr-1"}),
+        (3, {"b-ocr-0"}),
+        (4, set()),
+    ],
+)
+def test_superseded_log_ids(db, logs, keep, expected):
+    assert set(superseded_log_ids(db, keep=keep)) == expected
+
+
+def test_superseded_log_ids_respects_limit(db, logs):
+    assert len(superseded_log_ids(db, keep=1, limit=2)) == 2
+
+
+def test_compact_without_archive_keeps_latest(db, logs):
+    result = compact_processing_logs(db, keep=1, archive_dir="")
+    assert result == {"removed": 5, "archive": None}
+    assert _remaining(db) == {"a-ocr-2", "a-classify-0", "b-ocr-3", "b-classify-0"}
+
+
+def test_compact_archives_removed_rows(db, logs, tmp_path):
+    result = compact_processing_logs(db, keep=2, archive_dir=str(tmp_path / "archive"))
+    path = Path(result["archive"])
+    with open(path, "rb") as raw, decompressed_reader(raw, path.name) as reader:
+        archived = [json.loads(line) for line in reader.read().decode("utf-8").splitlines()]
+
+    assert result["removed"] == 3
+    assert {row["id"] for row in archived} == {"a-ocr-0", "b-ocr-0", "b-ocr-1"}
+    assert {row["payload"] for row in archived if row["id"] == "a-ocr-0"} == {'{"run": 0}'}
+    assert _remaining(db).isdisjoint(row["id"] for row in archived)
@@ -0,0 +1,95 @@
+import pytest
+
+from backend.app.services.scheduler import (
+    BATCH,
+    INTERACTIVE,
+    Job,
+    ProcessingScheduler,
+    _PriorityClass,
+)
+
+
+def _job(doc_id, tenant, cost=1, priority=INTERACTIVE, enqueued_at=0.0):
+    return Job(doc_id=doc_id, priority=priority, cost=cost, tenant=tenant, enqueued_at=enqueued_at)
+
+
+def _drain(queue):
+    order = []
+    while len(queue):
+        order.append(queue.pop().doc_id)
+    return order
+
+
+@pytest.mark.parametrize(
+    "jobs, expected",
+    [
+        # Un full set grande no bloquea el documento chico de otro embarque
+        (
+            [("big1", "A", 80), ("big2", "A", 80), ("small", "B", 1)],
+            ["big1", "small", "big2"],
+        ),
+        # Costos iguales: se alterna entre embarques
+        (
+            [("a1", "A", 1), ("a2", "A", 1), ("a3", "A", 1), ("b1", "B", 1), ("b2", "B", 1)],
+            ["a1", "b1", "a2", "b2", "a3"],
+        ),
+        # Dentro de un embarque se respeta el FIFO
+        ([("x1", "A", 5), ("x2", "A", 1), ("x3", "A", 3)], ["x1", "x2", "x3"]),
+        # El de menos páginas acumuladas pasa primero
+        (
+            [("a1", "A", 10), ("b1", "B", 2), ("b2", "B", 2), ("b3", "B", 2), ("a2", "A", 1)],
+            ["a1", "b1", "b2", "b3", "a2"],
+        ),
+    ],
+)
+def test_fair_order(jobs, expected):
+    queue = _PriorityClass()
+    for index, (doc_id, tenant, cost) in enumerate(jobs):
+        queue.push(_job(doc_id, tenant, cost, enqueued_at=float(index)))
+    assert _drain(queue) == expected
+
+
+def test_new_tenant_starts_at_clock():
+    queue = _PriorityClass()
+    for index in range(3):
+        queue.push(_job(f"a{index + 1}", "A", cost=10, enqueued_at=float(index)))
+    assert [queue.pop().doc_id for _ in range(2)] == ["a1", "a2"]
+    # "B" llega tarde: entra con el reloj actual, no con tiempo virtual 0, así
+    # que no acapara los workers hasta "alcanzar" a "A"
+    queue.push(_job("b1", "B", cost=10, enqueued_at=3.0))
+    queue.push(_job("b2", "B", cost=10, enqueued_at=4.0))
+    assert _drain(queue) == ["b1", "a3", "b2"]
+
+
+def test_drained_tenants_are_forgotten():
+    queue = _PriorityClass()
+    for index in range(100):
+        # Documentos sin embarque: cada uno es su propio tenant
+        queue.push(_job(f"doc{index}", f"doc{index}", enqueued_at=float(index)))
+        queue.pop()
+    assert len(queue) == 0
+    assert queue.queues == {} and queue.virtual_time == {}
+
+
+@pytest.fixture
+def scheduler():
+    # Sin `start()`: solo se prueba el orden de despacho
+    return ProcessingScheduler(workers=1, batch_max_wait=30.0)
+
+
+def _push(scheduler, job):
+    scheduler._classes[job.priority].push(job)
+    scheduler._queued[job.doc_id] = job
+
+
+@pytest.mark.parametrize(
+    "batch_age, expected",
+    [(1.0, ["upload", "reprocess"]), (60.0, ["reprocess", "upload"])],
+)
+def test_batch_waits_behind_interactive_until_max_wait(scheduler, monkeypatch, batch_age, expected):
+    monkeypatch.setattr("backend.app.services.scheduler.time.monotonic", lambda: 1000.0)
+    _push(scheduler, _job("reprocess", "A", priority=BATCH, enqueued_at=1000.0 - batch_age))
+    _push(scheduler, _job("upload", "B", priority=INTERACTIVE, enqueued_at=999.0))
+    order = [scheduler._next_job().doc_id for _ in range(2)]
+    assert order == expected
+    assert scheduler._next_job() is None
@@ -0,0 +1,96 @@
+import pytest
+
+from backend.app.services.search import (
+    LikeSearchBackend,
+    SqliteFtsBackend,
+    ensure_search_index,
+    fts_query,
+    rebuild_search_index,
+    search_documents,
+)
+
+PAGES = {
+    "factura": ["FACTURA SA-1690 cerezas Lapins", "Total USD 12.345"],
+    "guia": ["Guía de despacho SA_1690", "Camión patente AB-1234"],
+    "certificado": ["Certificado fitosanitario", "Inspección SAG sin observaciones"],
+}
+
+
+@pytest.fixture
+def indexed(db, make_document):
+    backend = ensure_search_index(db.get_bind())
+    for name, pages in PAGES.items():
+        make_document(id=name, filename=f"{name}.pdf")
+        backend.index_document(db, name, pages)
+    db.commit()
+    return backend
+
+
+def _ids(results):
+    return [result["document_id"] for result in results]
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("MSCU-1234567", '"MSCU" AND "1234567"'),
+        ('"certificado fitosanitario"', '"certificado fitosanitario"'),
+        ("N°", '"N"'),
+        ("  ", ""),
+    ],
+)
+def test_fts_query(query, expected):
+    assert fts_query(query) == expected
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("cerezas", ["factura"]),
+        ("guia", ["guia"]),  # remove_diacritics: "guia" encuentra "Guía"
+        ("inspeccion SAG", ["certificado"]),
+        ("sag", ["certificado"]),
+        ("patente cerezas", []),
+    ],
+)
+def test_fts_search(db, indexed, query, expected):
+    assert isinstance(indexed, SqliteFtsBackend)
+    assert _ids(search_documents(db, query)) == expected
+
+
+def test_fts_hits_point_to_matching_page(db, indexed):
+    [result] = search_documents(db, "patente")
+    assert result["filename"] == "guia.pdf"
+    assert [hit["page"] for hit in result["hits"]] == [2]
+    assert "<mark>patente</mark>" in result["hits"][0]["snippet"]
+
+
+def test_rebuild_after_vacuum_keeps_pages(db, indexed):
+    # Borrar e insertar deja huecos en el rowid que VACUUM puede compactar
+    indexed.index_document(db, "factura", PAGES["factura"])
+    db.commit()
+    with db.get_bind().connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.exec_driver_sql("VACUUM")
+        assert rebuild_search_index(conn)
+    [result] = search_documents(db, "patente")
+    assert (result["document_id"], result["hits"][0]["page"]) == ("guia", 2)
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("cerezas", ["factura"]),
+        ("CEREZAS lapins", ["factura"]),
+        # `_` es literal: no debe calzar "SA-1690"
+        ("SA_1690", ["guia"]),
+        ("100%", []),
+    ],
+)
+def test_like_search(db, indexed, query, expected):
+    assert _ids(LikeSearchBackend().search(db, query)) == expected
+
+
+def test_like_snippet_marks_terms(db, indexed):
+    [result] = LikeSearchBackend().search(db, "fitosanitario")
+    assert "<mark>fitosanitario</mark>" in result["hits"][0]["snippet"]
@@ -3,6 +3,7 @@ import template from './Workflow.html?raw';
 import './Workflow.css';
 import {
   uploadDocument,
+  waitForDocument,
   getDocumentDetail,
   getDocumentEntities,
   getDocumentKeywords,
@@ -385,10 +386,12 @@ export default function Workflow({ onReset }) {
           statusMessage: 'Documento recibido. Procesando...',
         }));
 
-        // Poll for completion or just load immediately (since backend is sync for PoC)
-        // Give it a small delay to allow the "processing" animation to be seen
-        await new Promise((resolve) => setTimeout(resolve, 1000));
-        
+        // El backend procesa en segundo plano y avisa por SSE al terminar
+        const finalEvent = await waitForDocument(response.id);
+        if (finalEvent.stage === 'failed') {
+          throw new Error(finalEvent.data?.error ?? 'Falló el procesamiento del documento.');
+        }
+
         await loadDocumentData(response.id);
 
         setActiveStep('verify');
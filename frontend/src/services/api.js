@@ -17,7 +17,7 @@ async function safeParseJSON(response) {
   }
 }
 
-export async function uploadDocument(file, { docType, languageHint } = {}) {
+export async function uploadDocument(file, { docType, languageHint, shipmentId } = {}) {
   const formData = new FormData();
   formData.append('file', file);
   if (docType) {
@@ -26,13 +26,40 @@ export async function uploadDocument(file, { docType, languageHint } = {}) {
   if (languageHint) {
     formData.append('language_hint', languageHint);
   }
-  const response = await fetch(`${API_BASE_URL}/documents`, {
+  const query = shipmentId ? `?shipment_id=${encodeURIComponent(shipmentId)}` : '';
+  const response = await fetch(`${API_BASE_URL}/documents${query}`, {
     method: 'POST',
     body: formData,
   });
   return handleResponse(response);
 }
 
+export async function listDocuments({ cursor, limit, docType, status, language, fields } = {}) {
+  const params = new URLSearchParams();
+  if (cursor) params.set('cursor', cursor);
+  if (limit) params.set('limit', String(limit));
+  if (docType) params.set('doc_type', docType);
+  if (status) params.set('status', status);
+  if (language) params.set('language', language);
+  if (fields) params.set('fields', Array.isArray(fields) ? fields.join(',') : fields);
+  const response = await fetch(`${API_BASE_URL}/documents/?${params.toString()}`);
+  return handleResponse(response);
+}
+
+export async function searchDocuments(query, { limit, offset } = {}) {
+  const params = new URLSearchParams({ q: query });
+  if (limit) params.set('limit', String(limit));
+  if (offset) params.set('offset', String(offset));
+  const response = await fetch(`${API_BASE_URL}/documents/search?${params.toString()}`);
+  return handleResponse(response);
+}
+
+export async function lookupEntity(type, value) {
+  const params = new URLSearchParams({ type, value });
+  const response = await fetch(`${API_BASE_URL}/entities/lookup?${params.toString()}`);
+  return handleResponse(response);
+}
+
 export async function getDocumentDetail(docId) {
   const response = await fetch(`${API_BASE_URL}/documents/${docId}`);
   return handleResponse(response);
@@ -61,3 +88,39 @@ export async function getDocumentInsights(docId) {
 export function getDownloadUrl(docId) {
   return `${API_BASE_URL}/documents/${docId}/download`;
 }
+
+export async function reprocessDocument(docId, { priority = 'batch' } = {}) {
+  const response = await fetch(
+    `${API_BASE_URL}/documents/${docId}/reprocess?priority=${priority}`,
+    { method: 'POST' }
+  );
+  return handleResponse(response);
+}
+
+// Se resuelve con el evento final (done/failed); onEvent recibe cada etapa
+export function waitForDocument(docId, { onEvent, timeoutMs = 300000 } = {}) {
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(`${API_BASE_URL}/documents/${docId}/events`);
+    const timer = setTimeout(() => {
+      source.close();
+      reject(new Error('Tiempo de espera agotado procesando el documento.'));
+    }, timeoutMs);
+    source.onmessage = (message) => {
+      const event = JSON.parse(message.data);
+      onEvent?.(event);
+      if (event.stage === 'done' || event.stage === 'failed') {
+        clearTimeout(timer);
+        source.close();
+        resolve(event);
+      }
+    };
+  });
+}
+
+export function getShipmentEventsUrl(shipmentId) {
+  return `${API_BASE_URL.replace(/^http/, 'ws')}/shipments/${shipmentId}/events`;
+}
+
+export function getPageImageUrl(docId, page, size = 'preview') {
+  return `${API_BASE_URL}/documents/${docId}/pages/${page}.png?size=${size}`;
+}
@@ -0,0 +1,87 @@
+"""Auditoría de conciliación de pesos, cajas y montos para muchos embarques.
+
+Carga las cantidades de todos los documentos procesados del rango en arreglos
+de numpy (ver `backend/app/services/reconcile.py`) y resume por embarque la
+cantidad de diferencias sobre tolerancia. Con `--details` agrega, para los
+embarques con error, el detalle por documento y por línea.
+
+Uso:
+    python tools/audit_shipments.py --from 2024-11-01 --to 2025-03-31 --output temporada.json
+    python tools/audit_shipments.py --shipment SA1690CZ --details
+    python tools/audit_shipments.py --only-issues --csv issues.csv
+"""
+
+import argparse
+import csv
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_DIR))
+
+from sqlalchemy.orm import Session  # noqa: E402
+
+from backend.app.core.db import get_engine, init_db  # noqa: E402
+from backend.app.services.reconcile import (  # noqa: E402
+    ReconciliationUnavailable,
+    audit_shipments,
+    reconcile_shipment,
+)
+
+CSV_COLUMNS = ("shipment_id", "status", "documents", "compared", "warnings", "errors", "max_ratio")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from", dest="created_from", type=datetime.fromisoformat)
+    parser.add_argument("--to", dest="created_to", type=datetime.fromisoformat)
+    parser.add_argument("--shipment", action="append", help="repetible; por defecto todos")
+    parser.add_argument("--only-issues", action="store_true", help="omitir embarques ok")
+    parser.add_argument("--details", action="store_true", help="detalle de los embarques con error")
+    parser.add_argument("--output", help="ruta del JSON de resultados")
+    parser.add_argument("--csv", help="ruta del CSV con el resumen por embarque")
+    args = parser.parse_args(argv)
+
+    init_db()
+    with Session(get_engine()) as db:
+        try:
+            summary = audit_shipments(db, args.shipment, args.created_from, args.created_to)
+        except ReconciliationUnavailable as exc:
+            print(f"{exc}; instala las dependencias de backend/requirements.txt")
+            return 1
+        if args.only_issues:
+            summary = [item for item in summary if item["status"] != "ok"]
+        result = {
+            "shipments": len(summary),
+            "errors": sum(1 for item in summary if item["status"] == "error"),
+            "warnings": sum(1 for item in summary if item["status"] == "warning"),
+            "items": summary,
+        }
+        if args.details:
+            result["details"] = [
+                reconcile_shipment(db, item["shipment_id"])
+                for item in summary
+                if item["status"] == "error"
+            ]
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as fh:
+            writer = csv.DictWriter(fh, fieldnames=CSV_COLUMNS)
+            writer.writeheader()
+            writer.writerows({name: item[name] for name in CSV_COLUMNS} for item in summary)
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+        print(
+            f"{result['shipments']} embarques, {result['errors']} con error, "
+            f"{result['warnings']} con warning -> {args.output}"
+        )
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
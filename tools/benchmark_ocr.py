@@ -0,0 +1,171 @@
+"""Benchmark de motores OCR: páginas/segundo con y sin workers persistentes.
+
+Compara `pytesseract` (un proceso de tesseract por página, el comportamiento
+anterior), `cli` (un proceso por lote de `--batch` páginas) y `tesserocr`
+(API con el modelo cargado y reutilizado) sobre las mismas imágenes ya
+preprocesadas, para que solo varíe el costo del motor.
+
+Las páginas salen de los PDF de `docs/` rasterizados a `--dpi` (requiere
+Poppler) o, con `--synthetic N`, de N páginas A4 generadas con Pillow.
+
+Uso:
+    python tools/benchmark_ocr.py --synthetic 24 --output ocr.json
+    python tools/benchmark_ocr.py --limit 3 --dpi 150 --backends cli,tesserocr
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add repo root to path so we can import backend modules
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_DIR))
+
+from backend.app.services import processing  # noqa: E402
+from backend.app.services.ocr import MIXED_LANG, preprocess  # noqa: E402
+from backend.app.services.tesseract import build_backend  # noqa: E402
+
+DOCS_DIR = ROOT_DIR / "docs"
+BACKENDS = ("pytesseract", "cli", "tesserocr")
+SYNTHETIC_LINES = (
+    "FACTURA COMERCIAL / COMMERCIAL INVOICE N° 004512",
+    "Exportador: Frutícola del Valle S.A.  RUT 76.123.456-7",
+    "Consignatario: Shenzhen Fresh Import Co., Ltd.",
+    "Producto: Cerezas frescas variedad Lapins calibre 2J",
+    "Incoterm FOB San Antonio  -  HS CODE 080921",
+    "Contenedor MSCU1234565  Booking 987654321",
+    "Peso neto 21.600 kg  Peso bruto 23.450 kg",
+    "Total USD 184,320.00",
+)
+
+
+def _synthetic_pages(count, dpi):
+    from PIL import Image, ImageDraw, ImageFont
+
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    try:
+        font = ImageFont.load_default(size=max(12, dpi // 8))
+    except TypeError:  # Pillow < 10.1
+        font = ImageFont.load_default()
+    pages = []
+    for number in range(count):
+        page = Image.new("L", (width, height), 245)
+        draw = ImageDraw.Draw(page)
+        y = dpi // 2
+        for index in range(40):
+            line = SYNTHETIC_LINES[(index + number) % len(SYNTHETIC_LINES)]
+            draw.text((dpi // 2, y), line, fill=15, font=font)
+            y += dpi // 5
+        pages.append(page)
+    return pages
+
+
+def _pdf_pages(docs_dir, limit, dpi):
+    convert_from_path = processing._convert_from_path()
+    if convert_from_path is None:
+        raise SystemExit("pdf2image no está instalado; usa --synthetic")
+    pdfs = sorted(Path(docs_dir).glob("*.pdf"))
+    if limit:
+        pdfs = pdfs[:limit]
+    pages = []
+    for pdf in pdfs:
+        try:
+            pages += convert_from_path(str(pdf), dpi=dpi)
+        except Exception as exc:
+            raise SystemExit(f"No se pudo rasterizar {pdf.name}: {exc} (¿falta Poppler?)")
+    return pages
+
+
+def run_benchmark(args):
+    pages = (
+        _synthetic_pages(args.synthetic, args.dpi)
+        if args.synthetic
+        else _pdf_pages(args.docs_dir, args.limit, args.dpi)
+    )
+    if not pages:
+        raise SystemExit("No hay páginas para medir")
+    prepared = [preprocess(page) for page in pages]
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "pages": len(prepared),
+        "dpi": args.dpi,
+        "lang": args.lang,
+        "batch": args.batch,
+        "backends": {},
+    }
+    for name in args.backends.split(","):
+        backend = build_backend(name.strip())
+        if backend is None:
+            print(f"{name}: no disponible, se omite")
+            continue
+        # Calentamiento: la primera carga del modelo no es representativa
+        backend.recognize_batch(prepared[:1], args.lang)
+        runs = []
+        confidences = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for offset in range(0, len(prepared), args.batch):
+                for _, confidence, words, _ in backend.recognize_batch(
+                    prepared[offset : offset + args.batch], args.lang
+                ):
+                    if words:
+                        confidences.append(confidence)
+            runs.append(time.perf_counter() - start)
+        median = statistics.median(runs)
+        results["backends"][backend.name] = {
+            "seconds": round(median, 3),
+            "pages_per_second": round(len(prepared) / median, 2),
+            "ms_per_page": round(median * 1000 / len(prepared), 1),
+            "mean_confidence": round(statistics.fmean(confidences), 2) if confidences else None,
+        }
+
+    baseline = results["backends"].get("pytesseract")
+    if baseline:
+        for name, item in results["backends"].items():
+            item["speedup"] = round(item["pages_per_second"] / baseline["pages_per_second"], 2)
+    return results
+
+
+def _print_table(results):
+    print(f"{results['pages']} páginas a {results['dpi']} dpi, lang={results['lang']}")
+    print(f"{'motor':<12} {'pág/s':>8} {'ms/pág':>8} {'conf':>6} {'x':>6}")
+    for name, item in results["backends"].items():
+        print(
+            f"{name:<12} {item['pages_per_second']:>8} {item['ms_per_page']:>8} "
+            f"{item['mean_confidence'] or '-':>6} {item.get('speedup', '-'):>6}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs-dir", default=str(DOCS_DIR))
+    parser.add_argument("--limit", type=int, default=0, help="máximo de PDFs")
+    parser.add_argument("--synthetic", type=int, default=0, help="páginas sintéticas")
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("--lang", default=MIXED_LANG)
+    parser.add_argument("--batch", type=int, default=8, help="páginas por llamada al motor")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--output", help="ruta del JSON de resultados")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args)
+    if not results["backends"]:
+        print("Ningún motor OCR disponible (¿falta tesseract?)")
+        return 1
+    _print_table(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Resultados guardados en {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
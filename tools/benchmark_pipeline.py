@@ -0,0 +1,366 @@
+"""Benchmark reproducible del pipeline de procesamiento sobre el corpus de docs/.
+
+Ejecuta cada etapa de `process_document_sync` por separado (extracción nativa,
+OCR, idioma, clasificación, entidades, keywords, ortografía, schema, compliance y
+persistencia) sobre los PDF de `docs/` y sobre corpus sintéticos escalados, y
+reporta percentiles de latencia por etapa, throughput y RSS máximo en JSON.
+
+Uso:
+    python tools/benchmark_pipeline.py --repeat 3 --scales 1,4,16 --output bench.json
+    python tools/benchmark_pipeline.py --compare bench.json --threshold 0.25
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add repo root to path so we can import backend modules
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_DIR))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from backend.app.core.db import Base  # noqa: E402
+from backend.app.models.document import (  # noqa: E402
+    Document,
+    Entity,
+    Keyword,
+)
+from backend.app.services import processing  # noqa: E402
+
+DOCS_DIR = ROOT_DIR / "docs"
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (
+        rank - low
+    )
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except Exception:
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return peak / divisor
+
+
+def _git_commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=ROOT_DIR,
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except Exception:
+        return None
+
+
+class StageRecorder:
+    """Acumula latencias (ms) y bytes procesados por etapa."""
+
+    def __init__(self):
+        self.samples = {}
+        self.bytes = {}
+
+    def run(self, stage, func, *args, size=0, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.samples.setdefault(stage, []).append(elapsed_ms)
+        self.bytes[stage] = self.bytes.get(stage, 0) + size
+        return result
+
+    def summary(self):
+        stages = {}
+        for stage, values in self.samples.items():
+            ordered = sorted(values)
+            total_s = sum(ordered) / 1000
+            entry = {
+                "count": len(ordered),
+                "min_ms": round(ordered[0], 3),
+                "max_ms": round(ordered[-1], 3),
+                "mean_ms": round(statistics.fmean(ordered), 3),
+                "total_ms": round(total_s * 1000, 3),
+                "throughput_per_s": round(len(ordered) / total_s, 3)
+                if total_s
+                else None,
+                "mb_per_s": round(self.bytes.get(stage, 0) / (1024 * 1024) / total_s, 3)
+                if total_s and self.bytes.get(stage)
+                else None,
+            }
+            for pct in PERCENTILES:
+                entry[f"p{pct}_ms"] = round(_percentile(ordered, pct), 3)
+            stages[stage] = entry
+        return stages
+
+
+def _load_corpus(docs_dir, limit):
+    pdfs = sorted(docs_dir.glob("*.pdf"))
+    return pdfs[:limit] if limit else pdfs
+
+
+def _text_stages(recorder, text, prefix=""):
+    size = len(text.encode("utf-8"))
+    recorder.run(f"{prefix}language", processing._detect_language, text, size=size)
+    doc_type = recorder.run(
+        f"{prefix}classify", processing._detect_document_type, text, size=size
+    )
+    doc_type = processing._normalize_doc_type(doc_type)
+    entities = recorder.run(
+        f"{prefix}entities", processing._detect_entities, text, size=size
+    )
+    keywords = recorder.run(
+        f"{prefix}keywords", processing._extract_keywords, text, entities, size=size
+    )
+    recorder.run(
+        f"{prefix}spellcheck", processing._detect_spelling_issues, text, size=size
+    )
+    recorder.run(
+        f"{prefix}schema",
+        processing._evaluate_schema_requirements,
+        text,
+        doc_type,
+        size=size,
+    )
+    fake_doc = Document(doc_type=doc_type, filename="bench.pdf")
+    recorder.run(
+        f"{prefix}compliance",
+        processing._evaluate_cherry_compliance,
+        text,
+        entities,
+        fake_doc,
+        size=size,
+    )
+    return doc_type, entities, keywords
+
+
+def _persist(session, doc_id, text, entities, keywords):
+    """Replica la escritura de filas que hace `process_document_sync`."""
+    start = time.perf_counter()
+    processing._save_log(
+        session, doc_id, "ocr", {"text": text, "confidence": 0.9}, True, start
+    )
+    for payload in entities:
+        session.add(
+            Entity(
+                id=str(uuid.uuid4()),
+                document_id=doc_id,
+                type=payload["type"],
+                value=payload["value"],
+                confidence=payload["confidence"],
+                page=payload.get("page", 1),
+            )
+        )
+    for keyword, score in keywords:
+        session.add(
+            Keyword(
+                id=str(uuid.uuid4()),
+                document_id=doc_id,
+                keyword=keyword,
+                score=score,
+            )
+        )
+    session.commit()
+    processing._save_log(
+        session,
+        doc_id,
+        "insights",
+        {"compliance": [], "spellcheck": [], "recommendations": []},
+        True,
+        start,
+    )
+
+
+def run_benchmark(args):
+    pdfs = _load_corpus(Path(args.docs_dir), args.limit)
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    recorder = StageRecorder()
+
+    tmp_dir = tempfile.mkdtemp(prefix="inova-bench-")
+    engine = create_engine(f"sqlite:///{Path(tmp_dir) / 'bench.sqlite3'}", future=True)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False, future=True)
+
+    texts = []
+    wall_start = time.perf_counter()
+    for _ in range(args.repeat):
+        for pdf in pdfs:
+            size = pdf.stat().st_size
+            text = recorder.run(
+                "extract_native", processing.extract_text_from_pdf, pdf, size=size
+            )
+            if args.ocr and processing.TESSERACT_AVAILABLE:
+                ocr_text = recorder.run("ocr", processing.ocr_pdf, pdf, size=size)
+                text = text or ocr_text
+            if not text.strip():
+                text = processing.DEFAULT_OCR_TEXT
+            texts.append(text)
+            doc_type, entities, keywords = _text_stages(recorder, text)
+
+            with Session() as session:
+                doc = Document(
+                    id=str(uuid.uuid4()),
+                    filename=pdf.name,
+                    mime="application/pdf",
+                    size=size,
+                    doc_type=doc_type,
+                    status="processing",
+                    storage_path=str(pdf),
+                )
+                session.add(doc)
+                session.commit()
+                recorder.run(
+                    "persistence",
+                    _persist,
+                    session,
+                    doc.id,
+                    text,
+                    entities,
+                    keywords,
+                    size=len(text.encode("utf-8")),
+                )
+                if args.end_to_end:
+                    recorder.run(
+                        "process_document_sync",
+                        processing.process_document_sync,
+                        session,
+                        doc,
+                        size=size,
+                    )
+
+    # Corpus sintético: textos reales concatenados N veces para medir escalabilidad
+    base_texts = texts[: len(pdfs)] or [processing.DEFAULT_OCR_TEXT]
+    for scale in scales:
+        for text in base_texts:
+            _text_stages(recorder, "\n".join([text] * scale), prefix=f"synthetic_x{scale}.")
+
+    wall_s = time.perf_counter() - wall_start
+    engine.dispose()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "documents": len(pdfs),
+            "repeat": args.repeat,
+            "scales": scales,
+            "ocr_enabled": bool(args.ocr and processing.TESSERACT_AVAILABLE),
+            "dependencies": processing.check_system_dependencies(),
+        },
+        "totals": {
+            "wall_s": round(wall_s, 3),
+            "documents_per_s": round(len(pdfs) * args.repeat / wall_s, 3)
+            if wall_s
+            else None,
+            "peak_rss_mb": _peak_rss_mb(),
+        },
+        "stages": recorder.summary(),
+    }
+
+
+def compare_results(current, baseline, threshold, metric="p50_ms"):
+    """Devuelve las etapas cuyo `metric` empeoró más que `threshold` (ratio)."""
+    regressions = []
+    for stage, entry in current["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base or not base.get(metric):
+            continue
+        ratio = (entry[metric] - base[metric]) / base[metric]
+        if ratio > threshold:
+            regressions.append(
+                {
+                    "stage": stage,
+                    "baseline": base[metric],
+                    "current": entry[metric],
+                    "ratio": round(ratio, 3),
+                }
+            )
+    return regressions
+
+
+def _print_table(results):
+    print(f"{'stage':38} {'n':>5} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}")
+    for stage, entry in sorted(results["stages"].items()):
+        print(
+            f"{stage:38} {entry['count']:>5} {entry['p50_ms']:>10.2f} "
+            f"{entry['p95_ms']:>10.2f} {entry['p99_ms']:>10.2f} {entry['max_ms']:>10.2f}"
+        )
+    totals = results["totals"]
+    print(
+        f"\nwall={totals['wall_s']}s docs/s={totals['documents_per_s']} "
+        f"peak_rss={totals['peak_rss_mb']} MB"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs-dir", default=str(DOCS_DIR))
+    parser.add_argument("--limit", type=int, default=0, help="máximo de PDFs")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--scales", default="1,4,16")
+    parser.add_argument("--ocr", action="store_true", help="forzar etapa OCR")
+    parser.add_argument(
+        "--end-to-end",
+        action="store_true",
+        help="medir también process_document_sync completo",
+    )
+    parser.add_argument("--output", help="ruta del JSON de resultados")
+    parser.add_argument("--compare", help="JSON base para detectar regresiones")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args)
+    _print_table(results)
+
+    regressions = []
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare_results(results, baseline, args.threshold)
+        results["regressions"] = regressions
+        for item in regressions:
+            print(
+                f"REGRESIÓN {item['stage']}: {item['baseline']}ms -> "
+                f"{item['current']}ms (+{item['ratio'] * 100:.0f}%)"
+            )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Resultados guardados en {args.output}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""Compara el chequeo de presencia original del schema contra el matcher compilado.
+
+La versión original recorre cada campo requerido y hace un `in` por pista sobre
+el texto completo. Se mide contra la presencia precompilada de la KB (pistas
+deduplicadas, corte temprano) y contra el `SchemaMatcher`, que además extrae
+valores tipados de todos los campos del schema.
+
+Uso:
+    python tools/benchmark_schema.py --repeat 50 --output schema_bench.json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_DIR))
+
+from backend.app.services import processing  # noqa: E402
+from backend.app.services.extraction import get_schema_matcher  # noqa: E402
+from backend.app.services.knowledge import FIELD_HINTS, get_knowledge_base  # noqa: E402
+
+DOCS_DIR = ROOT_DIR / "docs"
+
+
+def legacy_field_in_text(normalized_text, field_name):
+    """Chequeo de presencia previo al matcher: un `in` por pista sobre el texto."""
+    if not normalized_text or not field_name:
+        return False
+    hints = FIELD_HINTS.get(field_name, [])
+    if not hints:
+        hints = [field_name.replace("_", " ")]
+    for hint in hints:
+        if not hint:
+            continue
+        if hint.casefold() in normalized_text:
+            return True
+    return False
+
+
+def legacy_missing_fields(text, schema):
+    """Implementación previa de `_evaluate_schema_requirements` (solo presencia)."""
+    normalized_text = text.casefold()
+    missing = []
+    for field in schema.get("fields", []):
+        if not field.get("required"):
+            continue
+        field_name = field.get("name", "")
+        if not field_name or legacy_field_in_text(normalized_text, field_name):
+            continue
+        missing.append(field_name)
+    return missing
+
+
+def _time(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    return result, samples
+
+
+def run(args):
+    kb = get_knowledge_base()
+    texts = [
+        processing.extract_text_from_pdf(path)
+        for path in sorted(Path(args.docs_dir).glob("*.pdf"))
+    ]
+    texts = [t for t in texts if t] * args.scale or [processing.DEFAULT_OCR_TEXT]
+
+    legacy_us, presence_us, compiled_us = [], [], []
+    mismatches = 0
+    extracted = 0
+    for text in texts:
+        for doc_type, schema in kb.schemas.items():
+            matcher = get_schema_matcher(doc_type, kb)
+            expected, legacy = _time(
+                lambda: legacy_missing_fields(text, schema), args.repeat
+            )
+            _, presence = _time(
+                lambda: kb.missing_required_fields(text.casefold(), doc_type),
+                args.repeat,
+            )
+            result, compiled = _time(lambda: matcher.evaluate(text), args.repeat)
+            legacy_us.extend(legacy)
+            presence_us.extend(presence)
+            compiled_us.extend(compiled)
+            extracted += len(result.values)
+            if expected != result.missing:
+                mismatches += 1
+
+    def stats(values):
+        ordered = sorted(values)
+        return {
+            "mean_us": round(statistics.fmean(ordered), 2),
+            "p50_us": round(ordered[len(ordered) // 2], 2),
+            "p95_us": round(ordered[int((len(ordered) - 1) * 0.95)], 2),
+        }
+
+    legacy_stats, compiled_stats = stats(legacy_us), stats(compiled_us)
+    presence_stats = stats(presence_us)
+    return {
+        "texts": len(texts),
+        "doc_types": len(kb.schemas),
+        "repeat": args.repeat,
+        "legacy_presence": legacy_stats,
+        "compiled_presence": presence_stats,
+        "compiled_matcher": compiled_stats,
+        "presence_speedup_p50": round(legacy_stats["p50_us"] / presence_stats["p50_us"], 3)
+        if presence_stats["p50_us"]
+        else None,
+        "speedup_p50": round(legacy_stats["p50_us"] / compiled_stats["p50_us"], 3)
+        if compiled_stats["p50_us"]
+        else None,
+        "values_extracted": extracted,
+        "presence_mismatches": mismatches,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs-dir", default=str(DOCS_DIR))
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--scale", type=int, default=1, help="replicar el corpus N veces")
+    parser.add_argument("--output", help="ruta del JSON de resultados")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    # Diferencias de presencia indican que el matcher cambió la semántica
+    return 1 if results["presence_mismatches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Perfil de tiempo de importación (cold start) del API y de las herramientas.
+
+Lanza intérpretes nuevos con `python -X importtime` para medir cuánto tarda en
+importarse cada módulo de entrada, lista los imports más costosos y verifica que
+las librerías pesadas de PDF/OCR no se carguen al arrancar.
+
+Uso:
+    python tools/benchmark_startup.py --runs 5 --output startup.json
+    python tools/benchmark_startup.py --strict   # código 1 si se cargan libs pesadas
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+ENTRYPOINTS = {
+    "api": "backend.app.main",
+    "routes_documents": "backend.app.api.routes_documents",
+    "processing": "backend.app.services.processing",
+    "models": "backend.app.models.document",
+}
+
+# Módulos que no deberían importarse hasta procesar el primer documento
+HEAVY_MODULES = ("PyPDF2", "pdfminer", "PIL", "pytesseract", "pdf2image")
+
+
+def _parse_importtime(stderr):
+    """Devuelve {módulo: (self_us, cumulative_us)} a partir de `-X importtime`."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            _, self_us, cumulative_us, name = [p.strip() for p in line.split("|", 3)]
+            modules[name.strip()] = (int(self_us.split()[-1]), int(cumulative_us))
+        except ValueError:
+            continue
+    return modules
+
+
+def _run_once(module):
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = (time.perf_counter() - start) * 1000\n"
+        f"heavy = sorted({{m.split('.')[0] for m in sys.modules}} & set({HEAVY_MODULES!r}))\n"
+        "print(json.dumps({'elapsed_ms': elapsed, 'heavy': heavy, "
+        "'modules': len(sys.modules)}))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["importtime"] = _parse_importtime(proc.stderr)
+    return result
+
+
+def profile(runs, top):
+    report = {}
+    for label, module in ENTRYPOINTS.items():
+        samples = [_run_once(module) for _ in range(runs)]
+        elapsed = sorted(s["elapsed_ms"] for s in samples)
+        last = samples[-1]
+        slowest = sorted(
+            last["importtime"].items(), key=lambda item: item[1][0], reverse=True
+        )[:top]
+        report[label] = {
+            "module": module,
+            "runs": runs,
+            "median_ms": round(statistics.median(elapsed), 2),
+            "min_ms": round(elapsed[0], 2),
+            "max_ms": round(elapsed[-1], 2),
+            "modules_loaded": last["modules"],
+            "heavy_modules_loaded": last["heavy"],
+            "top_self_us": [
+                {"module": name, "self_us": self_us, "cumulative_us": cumulative}
+                for name, (self_us, cumulative) in slowest
+            ],
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", help="ruta del JSON de resultados")
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="falla si algún entrypoint carga librerías de PDF/OCR",
+    )
+    args = parser.parse_args(argv)
+
+    report = profile(args.runs, args.top)
+    for label, entry in report.items():
+        heavy = ", ".join(entry["heavy_modules_loaded"]) or "-"
+        print(
+            f"{label:18} median={entry['median_ms']:8.1f}ms "
+            f"modules={entry['modules_loaded']:5} heavy={heavy}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Resultados guardados en {args.output}")
+
+    if args.strict and any(e["heavy_modules_loaded"] for e in report.values()):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""Compacta `processing_logs`: conserva el último resultado por paso y archiva el resto.
+
+Las filas reemplazadas se escriben como JSONL comprimido (zstd si está instalado,
+si no gzip) en `log_archive_dir` y luego se recupera el espacio de SQLite.
+
+Uso:
+    python tools/compact_logs.py --keep 1
+    python tools/compact_logs.py --dry-run
+    python tools/compact_logs.py --no-archive --vacuum
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_DIR))
+
+from sqlalchemy import func, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from backend.app.core.db import get_engine, init_db  # noqa: E402
+from backend.app.models.document import ProcessingLog  # noqa: E402
+from backend.app.services.retention import (  # noqa: E402
+    compact_processing_logs,
+    reclaim_space,
+    superseded_log_ids,
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keep", type=int, help="resultados por documento y paso")
+    parser.add_argument("--archive-dir", help="carpeta de archivos fríos")
+    parser.add_argument("--no-archive", action="store_true", help="borrar sin archivar")
+    parser.add_argument("--dry-run", action="store_true", help="solo contar filas")
+    parser.add_argument(
+        "--vacuum", action="store_true", help="recuperar espacio aunque no se borre nada"
+    )
+    args = parser.parse_args(argv)
+
+    init_db()
+    engine = get_engine()
+    with Session(engine) as db:
+        total = db.execute(select(func.count()).select_from(ProcessingLog)).scalar()
+        if args.dry_run:
+            pending = len(superseded_log_ids(db, keep=args.keep or 1, limit=total or 1))
+            print(json.dumps({"rows": total, "superseded": pending}, indent=2))
+            return 0
+        result = compact_processing_logs(
+            db,
+            keep=args.keep,
+            archive_dir="" if args.no_archive else args.archive_dir,
+        )
+    if result["removed"] or args.vacuum:
+        result["vacuum"] = reclaim_space(engine)
+    result["rows_before"] = total
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())